@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
+import tempfile
 from pathlib import Path
 from decouple import config
 from datetime import timedelta
@@ -60,13 +61,121 @@ REST_FRAMEWORK = {
         'rest_framework.permissions.IsAuthenticated',
     ],
     'DEFAULT_RENDERER_CLASSES': (
-        'rest_framework.renderers.JSONRenderer',
+        'engineering_app.json_encoding.FastJSONRenderer',
     ),
     'DEFAULT_PARSER_CLASSES': (
         'rest_framework.parsers.JSONParser',
     ),
 }
 
+# Encoder of the JSON responses (engineering_app/json_encoding.py): "orjson",
+# or "stdlib" for DjangoJSONEncoder / DRF's encoder.
+JSON_ENCODER = "orjson"
+
+# Serve the async variants of the views that have one (run under dashboard_api.asgi).
+DASHBOARD_ASYNC_VIEWS = config("DASHBOARD_ASYNC_VIEWS", default=False, cast=bool)
+
+# psycopg 3 connection pool the async views query through (engineering_app/async_db.py).
+ASYNC_DB_POOL = {
+    "MIN_SIZE": 1,
+    "MAX_SIZE": 10,
+}
+
+# Thread pool size of /api/bundle/, i.e. how many panels run at once.
+BUNDLE_MAX_WORKERS = 5
+
+# Refresh wo_weekly_status_rollup when an ingest job sends data_ingested for main_data.
+WO_ROLLUP_REFRESH_ON_INGEST = True
+
+# Refresh energy_daily_fact when an ingest job sends data_ingested for
+# water_daily, cng_daily or electricity_daily.
+ENERGY_FACT_REFRESH_ON_INGEST = True
+
+# Checks of the bulk meter reading endpoint (engineering_app/energy_bulk.py).
+ENERGY_INPUT_BULK = {
+    "MAX_ROWS": 10000,
+    "HISTORY_DAYS": 90,  # stored readings around the batch the checks compare with
+    "MIN_HISTORY": 5,  # stored consumption rates a meter needs before outliers are flagged
+    "OUTLIER_MADS": 6,  # width of the accepted consumption band, in scaled MADs
+}
+
+# Meter readings summed into water_daily / cng_daily / electricity_daily
+# (engineering_app/energy_aggregation.py).
+ENERGY_INPUT_AGGREGATION = {
+    "ON_SAVE": True,  # aggregate after each saved reading / bulk batch; else run aggregate_energy_inputs
+    "OVERLAP_SECONDS": 300,  # readings created this long before the watermark are read again
+    "SCALE": {"air": 0.01, "cng": 1, "listrik": 1},  # reading units -> daily table units
+}
+
+# Meter photo uploads and their thumbnails (engineering_app/energy_photos.py).
+ENERGY_PHOTOS = {
+    "MAX_UPLOAD_BYTES": 10 * 1024 * 1024,
+    "THUMBNAIL_SIZE": 320,  # longest side, in pixels
+    "THUMBNAIL_QUALITY": 80,
+    "THUMBNAIL_WORKERS": 2,
+}
+
+# Result cache for the analytics endpoints (engineering_app/result_cache.py).
+# The file backend is shared by every worker on one host; point
+# ANALYTICS_CACHE_BACKEND at django.core.cache.backends.redis.RedisCache (or
+# memcached) with ANALYTICS_CACHE_LOCATION to share it across hosts.
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+    },
+    "analytics": {
+        "BACKEND": config("ANALYTICS_CACHE_BACKEND", default="django.core.cache.backends.filebased.FileBasedCache"),
+        "LOCATION": config("ANALYTICS_CACHE_LOCATION", default=str(Path(tempfile.gettempdir()) / "engineering_dashboard_cache")),
+        "TIMEOUT": None,
+    },
+}
+
+ANALYTICS_CACHE = {
+    "ALIAS": "analytics",
+    "TTL": 3600,                    # seconds an entry stays fresh while the data version is unchanged
+    "STALE_WHILE_REVALIDATE": 300,  # seconds past the TTL a stale entry is served during a background refresh
+    "ENDPOINT_TTLS": {},            # per-endpoint TTL overrides, e.g. {"weekly_downtime": 600}
+}
+
+# manage.py benchmark_endpoints (engineering_app/benchmarks.py): where the runs
+# are kept and how much slower than the baseline an endpoint may get.
+ENDPOINT_BENCHMARKS = {
+    "RESULTS_DIR": BASE_DIR / "benchmarks",
+    "THRESHOLD": 0.20,  # fraction of the baseline latency
+    "MIN_DELTA_MS": 5.0,  # smaller slowdowns are ignored as noise
+}
+
+# manage.py check_query_plans (engineering_app/plans.py): where the baseline of
+# the endpoint query plans is kept and what counts as a plan regression.
+QUERY_PLANS = {
+    "BASELINE": BASE_DIR / "benchmarks" / "query_plans.json",
+    "BUFFER_TOLERANCE": 0.25,  # fraction of the baseline's shared buffers
+    "MIN_BUFFER_DELTA": 100,  # smaller growths are ignored as noise
+    "SEQ_SCAN_TABLES": ("main_data",),  # tables a new Seq Scan on is a regression
+}
+
+# ?from= on the analytics endpoints still reads failures this many days earlier,
+# so the first failure in the range has a predecessor for MTBF.
+MTBF_LOOKBACK_DAYS = 90
+
+# In-process NumPy copy of main_data serving the MTTR/MTBF endpoints
+# (engineering_app/reliability.py). Disable to run their SQL instead.
+RELIABILITY_ENGINE = {
+    "ENABLED": config("RELIABILITY_ENGINE", default=True, cast=bool),
+    "FULL_RELOAD_INTERVAL": 6 * 3600,  # seconds between full reloads; changes in between are applied per day
+}
+
+# Monthly partitions of main_data (engineering_app/partitions.py,
+# `manage.py main_data_partitions`).
+MAIN_DATA_PARTITIONS = {
+    "MONTHS_AHEAD": 3,  # empty months kept ready after the current one
+    "ENSURE_ON_INGEST": True,  # create missing months after each data_ingested
+    # days between a work order's creation and its failure / start / completion
+    # dates, e.g. 366; bounds wo_created_date for partition pruning. Opt-in:
+    # rows outside the window would drop out of the filtered results
+    "EVENT_WINDOW_DAYS": None,
+}
+
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
 CORS_ALLOW_ALL_ORIGINS = True
@@ -129,6 +238,14 @@ DATABASES = {
         'PASSWORD': config('DB_PASSWORD'),
         'HOST': config('DB_HOST'),
         'PORT': config('DB_PORT'),
+        # keep connections open between requests so the bundle endpoint's worker
+        # threads reuse theirs instead of reconnecting per panel
+        'CONN_MAX_AGE': config('DB_CONN_MAX_AGE', default=60, cast=int),
+        'CONN_HEALTH_CHECKS': True,
+        # the test database is built from the models, not the migrations: two
+        # 0005 migrations both create engineering_app_unrealesed_work_orders.
+        # Unmanaged tables such as main_data are created by the tests using them.
+        'TEST': {'MIGRATE': False},
     }
 }
 
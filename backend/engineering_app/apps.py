@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class EngineeringAppConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "engineering_app"
+
+    def ready(self):
+        # connect the data_ingested receivers and the EnergyInput post_save hooks
+        from . import dataversion, energy_aggregation, energy_fact, energy_photos, partitions, rollups  # noqa: F401
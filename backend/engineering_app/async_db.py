@@ -0,0 +1,58 @@
+import asyncio
+
+from django.conf import settings
+from django.db import connection
+
+from .timings import timed
+
+# One psycopg 3 AsyncConnectionPool per event loop, opened on first use. Only the
+# async views (DASHBOARD_ASYNC_VIEWS) use it; everything else goes through the
+# Django connection as usual.
+_pools = {}
+
+
+def _conninfo():
+    from psycopg.conninfo import make_conninfo
+
+    db = settings.DATABASES["default"]
+    return make_conninfo(
+        dbname=db["NAME"],
+        user=db.get("USER") or None,
+        password=db.get("PASSWORD") or None,
+        host=db.get("HOST") or None,
+        port=db.get("PORT") or None,
+        # same session time zone Django uses, so EXTRACT/DATE_TRUNC agree with the sync views
+        options=f"-c TimeZone={connection.timezone_name}",
+    )
+
+
+async def _open_pool():
+    from psycopg_pool import AsyncConnectionPool
+
+    options = getattr(settings, "ASYNC_DB_POOL", {})
+    pool = AsyncConnectionPool(
+        _conninfo(),
+        min_size=options.get("MIN_SIZE", 1),
+        max_size=options.get("MAX_SIZE", 10),
+        kwargs={"autocommit": True},
+        open=False,
+    )
+    await pool.open()
+    return pool
+
+
+async def get_pool():
+    loop = asyncio.get_running_loop()
+    for other in [l for l in _pools if l.is_closed()]:
+        del _pools[other]
+    if loop not in _pools:
+        _pools[loop] = asyncio.ensure_future(_open_pool())
+    return await _pools[loop]
+
+
+@timed("sql")
+async def fetch_all(sql, params=None):
+    pool = await get_pool()
+    async with pool.connection() as conn:
+        cursor = await conn.execute(sql, params)
+        return await cursor.fetchall()
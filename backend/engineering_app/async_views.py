@@ -0,0 +1,125 @@
+from . import queries, reliability
+from .async_db import fetch_all
+from .columnar import InvalidFormat, columnar_response, columns_from_dicts, columns_from_rows, response_format
+from .conditional import conditional_on
+from .filters import InvalidFilter, parse_energy_rollup, parse_filters
+from .json_encoding import JsonResponse
+from .result_cache import cached_result
+
+# Async variants of the raw-SQL dashboard views in views.py, routed instead of
+# them when DASHBOARD_ASYNC_VIEWS is on. The queries run on the psycopg 3 async
+# pool, so a request waiting on postgres does not hold a worker thread.
+
+
+@conditional_on("water_daily", "cng_daily", "electricity_daily", "energy_daily_fact")
+async def energy(request):
+    try:
+        columnar = response_format(request)
+    except InvalidFormat as exc:
+        return JsonResponse({"error": str(exc)}, status=400)
+
+    rows = await fetch_all(queries.ENERGY_SQL)
+    if columnar:
+        return columnar_response(columnar, queries.ENERGY_FIELDS, columns_from_rows(queries.ENERGY_FIELDS, rows))
+    return JsonResponse(queries.energy_result(rows), safe=False)
+
+@conditional_on("water_daily", "cng_daily", "electricity_daily", "energy_daily_fact")
+async def energyTrend(request):
+    rows = await fetch_all(queries.ENERGY_TREND_SQL)
+    return JsonResponse(queries.energy_trend_result(rows), safe=False)
+
+@conditional_on("water_daily", "cng_daily", "electricity_daily", "energy_rollup")
+async def energy_rollup(request):
+    try:
+        filters = parse_energy_rollup(request)
+    except InvalidFilter as exc:
+        return JsonResponse({"error": str(exc)}, status=400)
+
+    rows = await fetch_all(*queries.energy_rollup_query(filters))
+    return JsonResponse(queries.energy_rollup_result(rows), safe=False)
+
+@conditional_on("main_data")
+@cached_result("analytic")
+async def analytic(request):
+    try:
+        filters = parse_filters(request)
+        columnar = response_format(request)
+    except (InvalidFilter, InvalidFormat) as exc:
+        return JsonResponse({"error": str(exc)}, status=400)
+
+    if reliability.engine_enabled():
+        frame = await reliability.async_request_frame(request)
+        result = reliability.analytic_result(frame, filters)
+        if columnar:
+            return columnar_response(columnar, queries.ANALYTIC_FIELDS, columns_from_dicts(queries.ANALYTIC_FIELDS, result))
+        return JsonResponse(result, safe=False)
+
+    rows = await fetch_all(*queries.analytic_query(filters))
+    if columnar:
+        return columnar_response(columnar, queries.ANALYTIC_FIELDS, queries.analytic_columns(rows))
+    return JsonResponse(queries.analytic_result(rows), safe=False)
+
+@conditional_on("main_data")
+@cached_result("category_analytics")
+async def category_analytics(request):
+    try:
+        filters = parse_filters(request)
+    except InvalidFilter as exc:
+        return JsonResponse({"error": str(exc)}, status=400)
+
+    if reliability.engine_enabled():
+        frame = await reliability.async_request_frame(request)
+        return JsonResponse(reliability.category_analytics_result(frame, filters), safe=False)
+
+    rows = await fetch_all(*queries.category_analytics_query(filters))
+    return JsonResponse(queries.category_analytics_result(rows), safe=False)
+
+@conditional_on("main_data")
+@cached_result("equipment_analytics")
+async def equipment_analytics(request):
+    try:
+        filters = parse_filters(request)
+    except InvalidFilter as exc:
+        return JsonResponse({"error": str(exc)}, status=400)
+
+    if reliability.engine_enabled():
+        frame = await reliability.async_request_frame(request)
+        return JsonResponse(reliability.equipment_analytics_result(frame, filters), safe=False)
+
+    rows = await fetch_all(*queries.equipment_analytics_query(filters))
+    return JsonResponse(queries.equipment_analytics_result(rows), safe=False)
+
+@conditional_on("main_data")
+@cached_result("monthly_trend")
+async def monthly_trend(request):
+    try:
+        filters = parse_filters(request)
+    except InvalidFilter as exc:
+        return JsonResponse({"error": str(exc)}, status=400)
+
+    if reliability.engine_enabled():
+        frame = await reliability.async_request_frame(request)
+        return JsonResponse(reliability.monthly_trend_result(frame, filters), safe=False)
+
+    rows = await fetch_all(*queries.monthly_trend_query(filters))
+    return JsonResponse(queries.monthly_trend_result(rows), safe=False)
+
+@conditional_on("main_data")
+@cached_result("weekly_downtime")
+async def weekly_downtime(request):
+    try:
+        filters = parse_filters(request)
+    except InvalidFilter as exc:
+        return JsonResponse({"error": str(exc)}, status=400)
+
+    if reliability.engine_enabled():
+        frame = await reliability.async_request_frame(request)
+        return JsonResponse(reliability.weekly_downtime_result(frame, filters), safe=False)
+
+    rows = await fetch_all(*queries.weekly_downtime_query(filters))
+    return JsonResponse(queries.weekly_downtime_result(rows), safe=False)
+
+@conditional_on("water_daily", "cng_daily", "electricity_daily", "energy_daily_fact")
+async def energydaily(request):
+    rows = await fetch_all(queries.ENERGY_DAILY_SQL)
+    return JsonResponse(queries.energy_daily_result(rows), safe=False)
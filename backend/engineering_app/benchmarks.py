@@ -0,0 +1,284 @@
+import json
+import math
+import platform
+import subprocess
+import sys
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from pathlib import Path
+from urllib.error import HTTPError
+from urllib.request import Request, urlopen
+
+from django.conf import settings
+from django.db import connection
+from django.urls import URLResolver, get_resolver
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken
+
+from . import timings
+from .json_encoding import encoder_name
+
+try:
+    import resource
+except ImportError:  # not on Windows; peak RSS is left out there
+    resource = None
+
+# Latency benchmark of the API endpoints (manage.py benchmark_endpoints). Each
+# endpoint is requested a number of times from a pool of threads, either
+# in-process through the test client or over HTTP against a running server,
+# and summarised as latency percentiles, throughput and, in-process, the time
+# spent in SQL and in JSON encoding per request. Results are written as JSON
+# into RESULTS_DIR, one file per run, and compared with a baseline run.
+
+DEFAULTS = {
+    "RESULTS_DIR": None,  # BASE_DIR / "benchmarks"
+    "THRESHOLD": 0.20,  # allowed slowdown against the baseline, as a fraction
+    "MIN_DELTA_MS": 5.0,  # slowdowns smaller than this are noise, whatever the fraction
+}
+
+LATENCY_METRICS = ("p50_ms", "p95_ms", "p99_ms", "mean_ms")
+
+URLCONF = "engineering_app.urls"
+
+
+def benchmark_setting(name):
+    value = getattr(settings, "ENDPOINT_BENCHMARKS", {}).get(name, DEFAULTS[name])
+    if name == "RESULTS_DIR" and value is None:
+        value = Path(settings.BASE_DIR) / "benchmarks"
+    return value
+
+
+def endpoint_paths():
+    """
+    Paths of the engineering_app URLs that answer GET and take no path
+    parameters, as they are served (/api/...), in urls.py order.
+    """
+    paths = []
+
+    def walk(patterns, prefix, inside):
+        for pattern in patterns:
+            route = prefix + str(pattern.pattern)
+            if isinstance(pattern, URLResolver):
+                name = getattr(pattern.urlconf_name, "__name__", pattern.urlconf_name)
+                walk(pattern.url_patterns, route, inside or name == URLCONF)
+                continue
+            if not inside or "<" in route:
+                continue
+            # class-based and @api_view views list their methods; plain
+            # function views answer anything
+            view_class = getattr(pattern.callback, "view_class", None) or getattr(pattern.callback, "cls", None)
+            if view_class is not None and not hasattr(view_class, "get"):
+                continue
+            path = "/" + route
+            if path not in paths:
+                paths.append(path)
+
+    walk(get_resolver().url_patterns, "", False)
+    return paths
+
+
+def _time_sql(execute, sql, params, many, context):
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        timings.add("sql", time.perf_counter() - started)
+
+
+class ClientDriver:
+    """Requests through the test client, authenticated as `user`, in this process."""
+
+    mode = "client"
+    target = "test client"
+    measures_time = True
+
+    def __init__(self, user):
+        self.user = user
+        self.local = threading.local()
+
+    def get(self, path):
+        client = getattr(self.local, "client", None)
+        if client is None:
+            client = self.local.client = APIClient(SERVER_NAME="localhost")
+            client.force_authenticate(self.user)
+        with timings.collect() as spent, connection.execute_wrapper(_time_sql):
+            started = time.perf_counter()
+            response = client.get(path)
+            body = b"".join(response.streaming_content) if response.streaming else response.content
+            elapsed = time.perf_counter() - started
+        return response.status_code, len(body), elapsed, spent
+
+    def close(self):
+        # each worker thread has its own connection
+        connection.close()
+
+
+class ServerDriver:
+    """Requests over HTTP to a running server at `base_url`, with a JWT for `user`."""
+
+    mode = "server"
+    measures_time = False
+
+    def __init__(self, base_url, user, timeout=60):
+        self.target = base_url.rstrip("/")
+        self.token = str(AccessToken.for_user(user))
+        self.timeout = timeout
+
+    def get(self, path):
+        request = Request(self.target + path, headers={"Authorization": f"Bearer {self.token}"})
+        started = time.perf_counter()
+        try:
+            with urlopen(request, timeout=self.timeout) as response:
+                status, body = response.status, response.read()
+        except HTTPError as exc:
+            status, body = exc.code, exc.read()
+        return status, len(body), time.perf_counter() - started, {}
+
+    def close(self):
+        pass
+
+
+def percentile(ordered, fraction):
+    # nearest rank of an ascending list
+    if not ordered:
+        return None
+    return ordered[min(len(ordered) - 1, max(0, math.ceil(fraction * len(ordered)) - 1))]
+
+
+def peak_rss_mb(pid=None):
+    """High-water mark of the resident set of process `pid` (default: this one), in MiB."""
+    if pid is not None:
+        try:
+            with open(f"/proc/{pid}/status") as status:
+                for line in status:
+                    if line.startswith("VmHWM:"):
+                        return round(int(line.split()[1]) / 1024, 1)
+        except OSError:
+            pass
+        return None
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on Linux, bytes on macOS
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+def _ms(seconds):
+    return None if seconds is None else round(seconds * 1000, 2)
+
+
+def benchmark_endpoint(driver, path, requests, concurrency=1, warmup=1, pid=None):
+    for _ in range(warmup):
+        driver.get(path)
+
+    def worker(count):
+        try:
+            return [driver.get(path) for _ in range(count)]
+        finally:
+            driver.close()
+
+    shares = [requests // concurrency + (i < requests % concurrency) for i in range(concurrency)]
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="benchmark") as executor:
+        futures = [executor.submit(worker, count) for count in shares if count]
+        samples = [sample for future in futures for sample in future.result()]
+    wall = time.perf_counter() - started
+
+    latencies = sorted(sample[2] for sample in samples)
+    result = {
+        "status": Counter(sample[0] for sample in samples).most_common(1)[0][0],
+        "requests": len(samples),
+        "errors": sum(sample[0] >= 400 for sample in samples),
+        "bytes": round(sum(sample[1] for sample in samples) / len(samples)),
+        "p50_ms": _ms(percentile(latencies, 0.50)),
+        "p95_ms": _ms(percentile(latencies, 0.95)),
+        "p99_ms": _ms(percentile(latencies, 0.99)),
+        "mean_ms": _ms(sum(latencies) / len(latencies)),
+        "max_ms": _ms(latencies[-1]),
+        "throughput_rps": round(len(samples) / wall, 2),
+        "sql_ms": None,
+        "serialize_ms": None,
+        "peak_rss_mb": peak_rss_mb(pid),
+    }
+    if driver.measures_time:
+        for kind in ("sql", "serialize"):
+            result[f"{kind}_ms"] = _ms(sum(sample[3].get(kind, 0.0) for sample in samples) / len(samples))
+    return result
+
+
+def git_commit():
+    try:
+        done = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=settings.BASE_DIR, capture_output=True, text=True,
+        )
+    except OSError:
+        return None
+    return done.stdout.strip() or None
+
+
+def run_benchmarks(driver, paths, requests, concurrency=1, warmup=1, pid=None, progress=None):
+    """Benchmarks each of `paths` in turn; returns the run as a JSON-ready dict."""
+    run = {
+        "started_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "mode": driver.mode,
+        "target": driver.target,
+        "requests": requests,
+        "concurrency": concurrency,
+        "warmup": warmup,
+        "environment": {
+            "git_commit": git_commit(),
+            "python": platform.python_version(),
+            "database": settings.DATABASES["default"]["NAME"],
+            "async_views": settings.DASHBOARD_ASYNC_VIEWS,
+            "json_encoder": encoder_name(),
+        },
+        "endpoints": {},
+    }
+    for path in paths:
+        run["endpoints"][path] = benchmark_endpoint(driver, path, requests, concurrency, warmup, pid)
+        if progress:
+            progress(path, run["endpoints"][path])
+    return run
+
+
+def save_run(run, path=None):
+    """Writes `run` to `path` (default: a timestamped file in RESULTS_DIR) and returns the path."""
+    if path is None:
+        stamp = run["started_at"].replace(":", "").replace("-", "").replace("+0000", "")
+        path = Path(benchmark_setting("RESULTS_DIR")) / f"endpoints-{stamp}.json"
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(json.dumps(run, indent=2) + "\n")
+    return path
+
+
+def load_run(path):
+    return json.loads(Path(path).read_text())
+
+
+def compare_runs(run, baseline, metric="p95_ms", threshold=None, min_delta_ms=None):
+    """
+    One row per endpoint found in both runs: (path, baseline value, current
+    value, regressed). An endpoint regresses when `metric` grew by more than
+    `threshold` and by at least `min_delta_ms`, or when it started failing.
+    """
+    if threshold is None:
+        threshold = benchmark_setting("THRESHOLD")
+    if min_delta_ms is None:
+        min_delta_ms = benchmark_setting("MIN_DELTA_MS")
+    rows = []
+    for path, current in run["endpoints"].items():
+        before = baseline.get("endpoints", {}).get(path)
+        if before is None:
+            continue
+        old, new = before.get(metric), current.get(metric)
+        slower = (
+            old is not None and new is not None
+            and new > old * (1 + threshold) and new - old >= min_delta_ms
+        )
+        failing = current["errors"] > 0 and not before.get("errors")
+        rows.append((path, old, new, slower or failing))
+    return rows
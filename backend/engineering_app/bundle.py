@@ -0,0 +1,121 @@
+import asyncio
+import copy
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import close_old_connections
+from django.http import HttpResponse
+from django.urls import reverse
+
+from . import views
+from .json_encoding import JsonResponse
+
+logger = logging.getLogger(__name__)
+
+# Panels a page can ask for in one round trip, keyed by the name used in
+# ?parts=, with the name of the panel's own URL
+BUNDLE_PARTS = {
+    "monthly_trend": (views.monthly_trend, "monthly-trend"),
+    "energydaily": (views.energydaily, "energydaily"),
+    "energy": (views.energy, "energy"),
+    "energy_monthly": (views.energyTrend, "energy-monthly"),
+    "energy_rollup": (views.energy_rollup, "energy-rollup"),
+    "active_work_orders": (views.active_work_orders, "active-work-orders"),
+    "unreleased_work_orders": (views.unreleased_work_orders, "unreleased-work-orders"),
+    "work_order_counts": (views.work_order_status_counts, "work-order-counts"),
+    "work_order_list": (views.work_order_list, "work-order-list"),
+    "work_request_list": (views.work_request_list, "work-request-list"),
+    "analytics": (views.analytic, "analytics"),
+    "category_analytics": (views.category_analytics, "category-analytics"),
+    "equipment_analytics": (views.equipment_analytics, "equipment-analytics"),
+    "downtime": (views.weekly_downtime, "downtime"),
+}
+
+# Each worker thread keeps its own database connection between bundles
+# (subject to CONN_MAX_AGE), so the panels of one bundle run on separate connections.
+executor = ThreadPoolExecutor(
+    max_workers=getattr(settings, "BUNDLE_MAX_WORKERS", 5),
+    thread_name_prefix="bundle",
+)
+
+
+def parse_parts(request):
+    names = [name.strip() for name in request.GET.get("parts", "").split(",") if name.strip()]
+    names = list(dict.fromkeys(names))
+    if not names:
+        return None, JsonResponse({"error": "parts is required"}, status=400)
+    # the panels' bodies are spliced into one JSON document
+    if request.GET.get("format", "json") not in ("", "json"):
+        return None, JsonResponse({"error": "The bundle is only available as JSON"}, status=400)
+    unknown = [name for name in names if name not in BUNDLE_PARTS]
+    if unknown:
+        return None, JsonResponse({"error": f"Unknown part(s): {', '.join(unknown)}"}, status=400)
+    return names, None
+
+
+def part_request(request, name):
+    """
+    The request `name` is run with: the bundle's query string minus ?parts=
+    and the other panels' ?<part>.cursor=, with its own ?<name>.cursor= as
+    ?cursor=, on the panel's own path so that its page links and ETag are
+    those of the panel. The bundle's conditional headers do not apply to the
+    individual panels.
+    """
+    sub = copy.copy(request)
+    sub.META = {k: v for k, v in request.META.items() if k not in ("HTTP_IF_NONE_MATCH", "HTTP_IF_MODIFIED_SINCE")}
+    sub.GET = request.GET.copy()
+    for key in ("parts", "stream", "format", "cursor"):
+        sub.GET.pop(key, None)
+    for key in [key for key in sub.GET if key.endswith(".cursor")]:
+        cursor = sub.GET.pop(key)[-1]
+        if key == f"{name}.cursor":
+            sub.GET["cursor"] = cursor
+    sub.path = sub.path_info = reverse(BUNDLE_PARTS[name][1])
+    sub.META["PATH_INFO"] = sub.path_info
+    sub.META["QUERY_STRING"] = sub.GET.urlencode()
+    return sub
+
+
+def run_part(name, request):
+    started = time.perf_counter()
+    try:
+        response = BUNDLE_PARTS[name][0](request)
+        if response.status_code == 200:
+            body = response.content
+        else:
+            body = b'{"error": "part failed", "status": %d}' % response.status_code
+    except Exception:
+        logger.exception("Bundle part %s failed", name)
+        body = b'{"error": "part failed", "status": 500}'
+    finally:
+        close_old_connections()
+    return name, body, (time.perf_counter() - started) * 1000
+
+
+def bundle_response(results):
+    # The panels' bodies are already JSON, so they are spliced in as they are.
+    body = b"{" + b", ".join(b'"%s": %s' % (name.encode(), part) for name, part, _ in results) + b"}"
+    response = HttpResponse(body, content_type="application/json")
+    response["Server-Timing"] = ", ".join(f"{name};dur={ms:.1f}" for name, _, ms in results)
+    return response
+
+
+def bundle(request):
+    names, error = parse_parts(request)
+    if error:
+        return error
+    results = list(executor.map(lambda name: run_part(name, part_request(request, name)), names))
+    return bundle_response(results)
+
+
+async def bundle_async(request):
+    names, error = parse_parts(request)
+    if error:
+        return error
+    results = await asyncio.gather(*(
+        sync_to_async(run_part, thread_sensitive=False)(name, part_request(request, name)) for name in names
+    ))
+    return bundle_response(results)
@@ -0,0 +1,89 @@
+from decimal import Decimal
+
+from django.http import HttpResponse
+
+from .json_encoding import JsonResponse
+from .streaming import iter_batches
+from .timings import timed
+
+try:
+    import pyarrow as pa
+except ImportError:  # ?format=arrow is refused without it
+    pa = None
+
+# Column-oriented bodies for the large list / time-series endpoints, asked for
+# with ?format=:
+#
+#   columnar  {"columns": [names], "data": {name: [values]}}, the values encoded
+#             as in the row format
+#   arrow     an Arrow IPC stream (application/vnd.apache.arrow.stream), one
+#             record batch per ARROW_BATCH_SIZE rows; numeric columns are float64
+#
+# Query results are transposed a cursor batch at a time, without a dict per row.
+
+FORMATS = ("columnar", "arrow")
+
+ARROW_CONTENT_TYPE = "application/vnd.apache.arrow.stream"
+
+ARROW_BATCH_SIZE = 65536
+
+
+class InvalidFormat(ValueError):
+    pass
+
+
+def response_format(request):
+    """'columnar', 'arrow' or None for the usual array of objects."""
+    value = (request.GET.get("format") or "").lower()
+    if value in ("", "json"):
+        return None
+    if value not in FORMATS:
+        raise InvalidFormat(f"format must be one of: json, {', '.join(FORMATS)}")
+    if value == "arrow" and pa is None:
+        raise InvalidFormat("format=arrow needs pyarrow, which is not installed")
+    return value
+
+
+def columns_from_rows(fields, rows, columns=None):
+    # appends the tuples in `rows` to `columns` (field -> list)
+    if columns is None:
+        columns = {field: [] for field in fields}
+    if rows:
+        for field, values in zip(fields, zip(*rows)):
+            columns[field].extend(values)
+    return columns
+
+
+def columns_from_dicts(fields, rows):
+    return {field: [row[field] for row in rows] for field in fields}
+
+
+def _arrow_array(values):
+    # Decimal columns (postgres numeric) become float64, which the charts read
+    # directly; the decimal128 pyarrow would infer cannot hold every numeric
+    if any(isinstance(value, Decimal) for value in values):
+        return pa.array([None if value is None else float(value) for value in values], type=pa.float64())
+    return pa.array(values)
+
+
+@timed("serialize")
+def arrow_stream(fields, columns):
+    table = pa.table({field: _arrow_array(columns[field]) for field in fields})
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        for batch in table.to_batches(max_chunksize=ARROW_BATCH_SIZE):
+            writer.write_batch(batch)
+    return sink.getvalue().to_pybytes()
+
+
+def columnar_response(fmt, fields, columns):
+    if fmt == "arrow":
+        return HttpResponse(arrow_stream(fields, columns), content_type=ARROW_CONTENT_TYPE)
+    return JsonResponse({"columns": list(fields), "data": columns})
+
+
+def columnar_query_response(fmt, sql, fields, params=None):
+    columns = {field: [] for field in fields}
+    for rows in iter_batches(sql, params):
+        columns_from_rows(fields, rows, columns)
+    return columnar_response(fmt, fields, columns)
@@ -0,0 +1,55 @@
+import hashlib
+from functools import wraps
+
+from asgiref.sync import iscoroutinefunction
+from django.views.decorators.cache import cache_control
+from django.utils.http import http_date, quote_etag
+from django.views.decorators.http import condition
+
+from .dataversion import async_request_data_version, data_version_modified, request_data_version
+
+
+def version_etag(request, version):
+    return hashlib.sha1(f"{request.get_full_path()}|{version}".encode()).hexdigest()
+
+
+def stamp_version(response, request, version):
+    """
+    ETag and Last-Modified of a body computed from data version `version`,
+    for bodies served from a cache that may predate the current version;
+    conditional_on() keeps headers that are already set.
+    """
+    response["ETag"] = quote_etag(version_etag(request, version))
+    response["Last-Modified"] = http_date(data_version_modified(version).timestamp())
+    return response
+
+
+def conditional_on(*tables):
+    """
+    Conditional GET for a view whose body depends only on its query string and
+    on `tables`: a strong ETag and Last-Modified derived from the tables' data
+    version, plus Cache-Control: no-cache so browsers revalidate every time.
+    A matching If-None-Match / If-Modified-Since is answered with 304 before
+    the view runs, so no query is executed and nothing is serialised.
+    """
+    def etag(request, *args, **kwargs):
+        return version_etag(request, request_data_version(request, *tables))
+
+    def last_modified(request, *args, **kwargs):
+        return data_version_modified(request_data_version(request, *tables))
+
+    def decorator(view):
+        conditioned = cache_control(no_cache=True)(condition(etag_func=etag, last_modified_func=last_modified)(view))
+        if not iscoroutinefunction(view):
+            return conditioned
+
+        @wraps(view)
+        async def async_wrapper(request, *args, **kwargs):
+            # condition() calls the etag/last_modified functions synchronously;
+            # filling the memo first keeps the version lookup on the async driver
+            await async_request_data_version(request, *tables)
+            return await conditioned(request, *args, **kwargs)
+
+        return async_wrapper
+
+    return decorator
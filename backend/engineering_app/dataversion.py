@@ -0,0 +1,108 @@
+import hashlib
+import time
+from datetime import datetime, timezone
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import connection
+from django.dispatch import receiver
+
+from .async_db import fetch_all
+from .ingest import data_ingested
+
+
+# Write counters postgres keeps per table. Reading them is a catalog lookup, so
+# checking the version never touches the data itself. A partitioned table
+# (main_data) counts nothing itself; its partitions' counters are summed.
+TABLE_WRITES_SQL = """
+    SELECT t.name, SUM(s.n_tup_ins + s.n_tup_upd + s.n_tup_del)::bigint
+    FROM unnest(%s::text[]) AS t(name)
+    CROSS JOIN LATERAL (
+        SELECT to_regclass(t.name) AS relid
+        UNION
+        SELECT relid FROM pg_partition_tree(to_regclass(t.name))
+    ) AS p
+    JOIN pg_stat_user_tables s ON s.relid = p.relid
+    GROUP BY t.name
+    ORDER BY t.name
+"""
+
+
+def _version_cache():
+    # shares the analytics cache so every worker sees the same generation
+    return caches[getattr(settings, "ANALYTICS_CACHE", {}).get("ALIAS", "analytics")]
+
+
+def _generation_key(table):
+    return f"dataversion:generation:{table}"
+
+
+def data_version(*tables):
+    """
+    Token that changes whenever one of `tables` is written to: the table's
+    insert/update/delete counters plus a generation bumped by data_ingested.
+    The statistics collector can lag a write by a moment, the generation
+    covers ingests that announce themselves.
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(TABLE_WRITES_SQL, [list(tables)])
+        writes = dict(cursor.fetchall())
+    generations = _version_cache().get_many([_generation_key(t) for t in tables])
+    return _version_token(tables, writes, generations)
+
+
+async def async_data_version(*tables):
+    # same token as data_version(), read through the async driver
+    rows = await fetch_all(TABLE_WRITES_SQL, [list(tables)])
+    generations = await _version_cache().aget_many([_generation_key(t) for t in tables])
+    return _version_token(tables, dict(rows), generations)
+
+
+def _version_token(tables, writes, generations):
+    return "-".join(
+        f"{table}.{writes.get(table, 0)}.{generations.get(_generation_key(table), 0)}"
+        for table in sorted(tables)
+    )
+
+
+def request_data_version(request, *tables):
+    # memoised per request so the ETag, Last-Modified and result cache checks
+    # share one lookup
+    memo = request.__dict__.setdefault("_data_versions", {})
+    key = tuple(sorted(tables))
+    if key not in memo:
+        memo[key] = data_version(*tables)
+    return memo[key]
+
+
+async def async_request_data_version(request, *tables):
+    memo = request.__dict__.setdefault("_data_versions", {})
+    key = tuple(sorted(tables))
+    if key not in memo:
+        memo[key] = await async_data_version(*tables)
+    return memo[key]
+
+
+def data_version_modified(version):
+    # when this process first saw `version`; stands in for the data's modification time
+    cache = _version_cache()
+    key = "dataversion:seen:" + hashlib.md5(version.encode()).hexdigest()
+    cache.add(key, time.time(), timeout=None)
+    return datetime.fromtimestamp(cache.get(key, time.time()), tz=timezone.utc)
+
+
+def bump_data_version(*tables):
+    cache = _version_cache()
+    for table in tables:
+        key = _generation_key(table)
+        # seed with a timestamp so a restarted locmem cache never reuses an old token
+        if not cache.add(key, int(time.time()), timeout=None):
+            try:
+                cache.incr(key)
+            except ValueError:
+                cache.set(key, int(time.time()), timeout=None)
+
+
+@receiver(data_ingested)
+def bump_version_after_ingest(sender, tables=None, **kwargs):
+    bump_data_version(*(tables or ["main_data"]))
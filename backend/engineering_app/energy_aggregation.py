@@ -0,0 +1,235 @@
+from datetime import timedelta
+from decimal import Decimal
+from functools import partial
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .ingest import data_ingested
+from .models import EnergyInput
+
+# Manual meter readings (EnergyInput) into the daily tables the energy views
+# read. The readings are cumulative, so a meter's consumption between two of
+# them is their difference, spread evenly over the days in between; it is kept
+# per meter and day in energy_meter_daily and summed per type into
+# water_daily / cng_daily / electricity_daily. Each run picks up the readings
+# created since the last watermark, recomputes only the days around them and
+# upserts the dates it touched, whose statement triggers mark them dirty for
+# energy_daily_fact.
+
+# Serialises runs (management command vs. post-save batches).
+AGGREGATION_LOCK_ID = 4_210_005
+
+WATERMARK = "energy_input"
+
+DAILY_TABLES = {
+    "air": "water_daily",
+    "cng": "cng_daily",
+    "listrik": "electricity_daily",
+}
+
+DEFAULTS = {
+    "ON_SAVE": True,
+    # readings created this long before the watermark are read again, in case
+    # their transaction committed after a later one
+    "OVERLAP_SECONDS": 300,
+    # factor from reading units to the daily table's units; water_daily is
+    # kept in hundreds of m3 (the energy views multiply it by 100)
+    "SCALE": {"air": 0.01, "cng": 1, "listrik": 1},
+}
+
+# (type, meter_number, first, last) reading dates to recompute: the readings
+# created since the watermark plus the ones given explicitly
+TOUCHED_METERS_SQL = """
+    SELECT type, meter_number, MIN(date), MAX(date)
+    FROM (
+        SELECT type, meter_number, date
+        FROM engineering_app_energyinput
+        WHERE %(since)s::timestamptz IS NULL OR created_at > %(since)s
+        UNION ALL
+        SELECT * FROM unnest(%(types)s::text[], %(meters)s::text[], %(dates)s::date[])
+    ) AS t
+    GROUP BY type, meter_number
+"""
+
+# A meter's consumption on a day depends on its readings on either side, so
+# each touched meter is recomputed from its last reading before the first
+# touched one to its first reading after the last. Without a reading on one
+# side, the span reaches to the end of what is stored for the meter, which is
+# stale once the readings it came from are deleted.
+SPANS_SQL = """
+    SELECT
+        t.type, t.meter_number,
+        COALESCE(
+            (
+                SELECT MAX(e.date) FROM engineering_app_energyinput e
+                WHERE e.meter_number = t.meter_number AND e.type = t.type AND e.date < t.first
+            ),
+            LEAST(t.first, (
+                SELECT MIN(m.date) - 1 FROM energy_meter_daily m
+                WHERE m.type = t.type AND m.meter_number = t.meter_number
+            ))
+        ),
+        COALESCE(
+            (
+                SELECT MIN(e.date) FROM engineering_app_energyinput e
+                WHERE e.meter_number = t.meter_number AND e.type = t.type AND e.date > t.last
+            ),
+            GREATEST(t.last, (
+                SELECT MAX(m.date) FROM energy_meter_daily m
+                WHERE m.type = t.type AND m.meter_number = t.meter_number
+            ))
+        )
+    FROM unnest(%s::text[], %s::text[], %s::date[], %s::date[]) AS t(type, meter_number, first, last)
+"""
+
+SPANS = "unnest(%(types)s::text[], %(meters)s::text[], %(lo)s::date[], %(hi)s::date[]) AS s(type, meter_number, lo, hi)"
+
+DELETE_METER_DAYS_SQL = f"""
+    DELETE FROM energy_meter_daily d
+    USING {SPANS}
+    WHERE d.type = s.type AND d.meter_number = s.meter_number AND d.date > s.lo AND d.date <= s.hi
+    RETURNING d.type, d.date
+"""
+
+# several readings of a meter on one day count as the highest of them;
+# a reading lower than the one before (a meter replaced or reset) leaves the
+# days in between out
+INSERT_METER_DAYS_SQL = f"""
+    WITH readings AS (
+        SELECT e.type, e.meter_number, e.date, MAX(e.value) AS value
+        FROM {SPANS}
+        JOIN engineering_app_energyinput e
+          ON e.type = s.type AND e.meter_number = s.meter_number AND e.date BETWEEN s.lo AND s.hi
+        GROUP BY e.type, e.meter_number, e.date
+    ),
+    steps AS (
+        SELECT
+            type, meter_number, date, value,
+            LAG(date) OVER w AS prev_date,
+            LAG(value) OVER w AS prev_value
+        FROM readings
+        WINDOW w AS (PARTITION BY type, meter_number ORDER BY date)
+    )
+    INSERT INTO energy_meter_daily (type, meter_number, date, consumption)
+    SELECT type, meter_number, d::date, (value - prev_value) / (date - prev_date)
+    FROM steps
+    CROSS JOIN LATERAL generate_series(prev_date + 1, date, INTERVAL '1 day') AS d
+    WHERE prev_date IS NOT NULL AND value >= prev_value
+    RETURNING type, date
+"""
+
+# Dates no meter has consumption for any more are left as they are: the daily
+# tables are also written by the import jobs. They are created outside Django
+# and need not have a unique index on date, so this is an UPDATE of the dates
+# that exist and an INSERT of the rest rather than ON CONFLICT; the advisory
+# lock keeps two runs from inserting the same date. Returns the dates written.
+UPSERT_DAILY_SQL = """
+    WITH totals AS (
+        SELECT date, SUM(consumption) * %s AS daily_consumption
+        FROM energy_meter_daily
+        WHERE type = %s AND date = ANY(%s::date[])
+        GROUP BY date
+    ),
+    updated AS (
+        UPDATE {table} d
+        SET daily_consumption = t.daily_consumption
+        FROM totals t
+        WHERE d.date = t.date AND d.daily_consumption IS DISTINCT FROM t.daily_consumption
+        RETURNING d.date
+    ),
+    inserted AS (
+        INSERT INTO {table} (date, daily_consumption)
+        SELECT t.date, t.daily_consumption
+        FROM totals t
+        WHERE NOT EXISTS (SELECT 1 FROM {table} d WHERE d.date = t.date)
+        RETURNING date
+    )
+    SELECT (SELECT COUNT(DISTINCT date) FROM updated) + (SELECT COUNT(*) FROM inserted)
+"""
+
+
+def aggregation_setting(name):
+    return getattr(settings, "ENERGY_INPUT_AGGREGATION", {}).get(name, DEFAULTS[name])
+
+
+def _columns(rows, count):
+    return [list(column) for column in zip(*rows)] if rows else [[] for _ in range(count)]
+
+
+def aggregate_energy_inputs(full=False, readings=()):
+    """
+    Brings energy_meter_daily and the daily tables up to date with the
+    EnergyInput rows created since the last run, plus `readings` given as
+    (type, meter_number, date) of rows changed or deleted in place. Returns
+    {daily table: number of dates written}. A full run recomputes every
+    meter and upserts every date it has consumption for.
+    """
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute("SELECT pg_advisory_xact_lock(%s)", [AGGREGATION_LOCK_ID])
+        cursor.execute("SELECT value FROM aggregation_watermark WHERE name = %s", [WATERMARK])
+        row = cursor.fetchone()
+        since = None
+        if row is not None and not full:
+            since = row[0] - timedelta(seconds=aggregation_setting("OVERLAP_SECONDS"))
+        cursor.execute("SELECT MAX(created_at) FROM engineering_app_energyinput")
+        watermark = cursor.fetchone()[0]
+
+        changed = []
+        if full:
+            cursor.execute("DELETE FROM energy_meter_daily RETURNING type, date")
+            changed += cursor.fetchall()
+        types, meters, dates = _columns(list(readings), 3)
+        cursor.execute(TOUCHED_METERS_SQL, {"since": since, "types": types, "meters": meters, "dates": dates})
+        touched = cursor.fetchall()
+        if touched:
+            cursor.execute(SPANS_SQL, _columns(touched, 4))
+            types, meters, lo, hi = _columns(cursor.fetchall(), 4)
+            spans = {"types": types, "meters": meters, "lo": lo, "hi": hi}
+            if not full:
+                cursor.execute(DELETE_METER_DAYS_SQL, spans)
+                changed += cursor.fetchall()
+            cursor.execute(INSERT_METER_DAYS_SQL, spans)
+            changed += cursor.fetchall()
+
+        written = {}
+        scale = aggregation_setting("SCALE")
+        for kind, table in DAILY_TABLES.items():
+            days = sorted({day for changed_kind, day in changed if changed_kind == kind})
+            if days:
+                cursor.execute(UPSERT_DAILY_SQL.format(table=table), [Decimal(str(scale.get(kind, 1))), kind, days])
+                count = cursor.fetchone()[0]
+                if count:
+                    written[table] = count
+
+        if watermark is not None:
+            cursor.execute(
+                "INSERT INTO aggregation_watermark (name, value) VALUES (%s, %s) "
+                "ON CONFLICT (name) DO UPDATE SET value = GREATEST(aggregation_watermark.value, EXCLUDED.value)",
+                [WATERMARK, watermark],
+            )
+    if written:
+        data_ingested.send(sender=aggregate_energy_inputs, tables=list(written))
+    return written
+
+
+def schedule_aggregation(readings=()):
+    # runs once the saving transaction commits; a failure is logged rather
+    # than turned into an error for a reading that was stored
+    if aggregation_setting("ON_SAVE"):
+        transaction.on_commit(partial(aggregate_energy_inputs, readings=readings), robust=True)
+
+
+@receiver(post_save, sender=EnergyInput)
+def aggregate_after_save(sender, instance, created, update_fields=None, **kwargs):
+    if update_fields is not None and not {"type", "meter_number", "date", "value"} & set(update_fields):
+        return
+    # new rows are found through the watermark, edited ones are named
+    schedule_aggregation(() if created else [(instance.type, instance.meter_number, instance.date)])
+
+
+@receiver(post_delete, sender=EnergyInput)
+def aggregate_after_delete(sender, instance, **kwargs):
+    schedule_aggregation([(instance.type, instance.meter_number, instance.date)])
@@ -0,0 +1,222 @@
+import csv
+import io
+from datetime import timedelta
+from decimal import Decimal, InvalidOperation
+
+import numpy as np
+from django.conf import settings
+from django.utils.dateparse import parse_date
+
+from .models import EnergyInput
+
+# Batch entry of meter readings (POST /energy-input/bulk/). Every row is parsed
+# on its own, then the batch is checked as a whole with NumPy against the
+# readings already stored for its meters: duplicate meter + date, readings
+# lower than an earlier one (the meters are cumulative) and consumption far
+# outside the meter's recent history.
+
+# Serialises bulk imports, so two batches cannot both pass the duplicate check.
+BULK_LOCK_ID = 4_210_004
+
+BULK_FIELDS = ("date", "type", "value", "meter_number")
+
+DEFAULTS = {
+    "MAX_ROWS": 10000,
+    # days of stored readings before / after the batch the checks look at
+    "HISTORY_DAYS": 90,
+    # a meter needs this many stored consumption rates before outliers are judged
+    "MIN_HISTORY": 5,
+    # a rate is an outlier beyond median +- OUTLIER_MADS scaled MADs of the history
+    "OUTLIER_MADS": 6,
+}
+
+ENERGY_TYPES = dict(EnergyInput.ENERGY_TYPES)
+VALUE_LIMIT = Decimal(10) ** 8  # max_digits=10, decimal_places=2
+
+
+class InvalidBatch(ValueError):
+    pass
+
+
+def bulk_setting(name):
+    return getattr(settings, "ENERGY_INPUT_BULK", {}).get(name, DEFAULTS[name])
+
+
+def read_rows(request):
+    """
+    The readings of a bulk request as a list of dicts: a JSON array (or
+    {"readings": [...]}) body, or a CSV upload in the `file` field with a
+    header row naming BULK_FIELDS.
+    """
+    upload = request.FILES.get("file")
+    if upload is not None:
+        try:
+            text = upload.read().decode("utf-8-sig")
+        except UnicodeDecodeError:
+            raise InvalidBatch("file must be UTF-8 encoded CSV") from None
+        reader = csv.DictReader(io.StringIO(text))
+        missing = [name for name in BULK_FIELDS if name not in (reader.fieldnames or [])]
+        if missing:
+            raise InvalidBatch(f"CSV header is missing: {', '.join(missing)}")
+        rows = list(reader)
+    else:
+        rows = request.data.get("readings") if isinstance(request.data, dict) else request.data
+        if not isinstance(rows, list) or not all(isinstance(row, dict) for row in rows):
+            raise InvalidBatch("Expected a JSON array of readings or a CSV file")
+    if not rows:
+        raise InvalidBatch("No readings given")
+    if len(rows) > bulk_setting("MAX_ROWS"):
+        raise InvalidBatch(f"At most {bulk_setting('MAX_ROWS')} readings per request")
+    return rows
+
+
+def _parse_row(row):
+    errors = {}
+    raw_date = str(row.get("date") or "").strip()
+    try:
+        day = parse_date(raw_date)
+    except ValueError:
+        day = None
+    if day is None:
+        errors["date"] = ["Enter a valid date (YYYY-MM-DD)."]
+
+    kind = str(row.get("type") or "").strip()
+    if kind not in ENERGY_TYPES:
+        errors["type"] = [f"Must be one of: {', '.join(ENERGY_TYPES)}."]
+
+    try:
+        value = Decimal(str(row.get("value")).strip()).quantize(Decimal("0.01"))
+    except (InvalidOperation, ValueError):
+        value = None
+    if value is None or not value.is_finite():
+        errors["value"] = ["Enter a number."]
+    elif value < 0 or value >= VALUE_LIMIT:
+        errors["value"] = [f"Must be between 0 and {VALUE_LIMIT - Decimal('0.01')}."]
+
+    meter = str(row.get("meter_number") or "").strip()
+    if not meter:
+        errors["meter_number"] = ["This field is required."]
+    elif len(meter) > 100:
+        errors["meter_number"] = ["Ensure this field has no more than 100 characters."]
+
+    return {"date": day, "type": kind, "value": value, "meter_number": meter}, errors
+
+
+def _add_error(errors, index, field, message):
+    errors.setdefault(index, {}).setdefault(field, []).append(message)
+
+
+def validate_readings(rows):
+    """
+    (parsed readings that passed, {row index: {field: [messages]}}). Row
+    indexes are 0-based positions in `rows`.
+    """
+    parsed, errors = [], {}
+    for index, row in enumerate(rows):
+        reading, row_errors = _parse_row(row)
+        parsed.append(reading)
+        if row_errors:
+            errors[index] = row_errors
+
+    candidates = [index for index in range(len(rows)) if index not in errors]
+    if candidates:
+        _check_batch(parsed, candidates, errors)
+    return [(index, parsed[index]) for index in range(len(rows)) if index not in errors], errors
+
+
+def _check_batch(parsed, candidates, errors):
+    history_days = timedelta(days=bulk_setting("HISTORY_DAYS"))
+    meters = sorted({parsed[i]["meter_number"] for i in candidates})
+    first = min(parsed[i]["date"] for i in candidates) - history_days
+    last = max(parsed[i]["date"] for i in candidates) + history_days
+    stored = list(
+        EnergyInput.objects
+        .filter(meter_number__in=meters, date__gte=first, date__lte=last)
+        .values_list("meter_number", "date", "value")
+    )
+
+    # one array per column over stored readings followed by the batch rows;
+    # `row` is the batch index, -1 for stored readings
+    meter_codes = {meter: code for code, meter in enumerate(meters)}
+    meter = np.array(
+        [meter_codes[m] for m, _, _ in stored] + [meter_codes[parsed[i]["meter_number"]] for i in candidates],
+        dtype=np.int64,
+    )
+    day = np.array(
+        [d.toordinal() for _, d, _ in stored] + [parsed[i]["date"].toordinal() for i in candidates],
+        dtype=np.int64,
+    )
+    value = np.array(
+        [float(v) for _, _, v in stored] + [float(parsed[i]["value"]) for i in candidates],
+        dtype=np.float64,
+    )
+    row = np.array([-1] * len(stored) + candidates, dtype=np.int64)
+    is_batch = row >= 0
+
+    # duplicate meter + date, in the batch or against what is stored: every
+    # batch row of a (meter, date) key that occurs more than once
+    key = meter * 10_000_000 + day
+    _, inverse, counts = np.unique(key, return_inverse=True, return_counts=True)
+    duplicated = is_batch & (counts[inverse] > 1)
+    stored_keys = set(key[~is_batch].tolist())
+    for index, k in zip(row[duplicated].tolist(), key[duplicated].tolist()):
+        where = "already stored" if k in stored_keys else "repeated in this batch"
+        _add_error(errors, index, "date", f"A reading for this meter and date is {where}.")
+
+    # the remaining readings per meter in date order
+    keep = ~duplicated
+    meter, day, value, row = meter[keep], day[keep], value[keep], row[keep]
+    order = np.lexsort((day, meter))
+    meter, day, value, row = meter[order], day[order], value[order], row[order]
+    same_meter = meter[1:] == meter[:-1]
+
+    # cumulative readings must not go down; a fall between two stored
+    # readings (the single-entry form does not check) is not the batch's
+    falls = same_meter & (value[1:] < value[:-1])
+    for position in np.flatnonzero(falls).tolist():
+        later, earlier = int(row[position + 1]), int(row[position])
+        if later >= 0:
+            _add_error(errors, later, "value", f"Lower than the earlier reading {value[position]:.2f}.")
+        elif earlier >= 0:
+            _add_error(errors, earlier, "value", f"Higher than the later reading {value[position + 1]:.2f}.")
+
+    # consumption per day between consecutive readings, judged against the
+    # meter's stored history with a median / MAD band
+    gap = day[1:] - day[:-1]
+    pairs = same_meter & (gap > 0) & ~falls
+    rate = np.zeros(len(gap))
+    rate[pairs] = (value[1:] - value[:-1])[pairs] / gap[pairs]
+    historical = pairs & (row[1:] < 0) & (row[:-1] < 0)
+    judged = pairs & (row[1:] >= 0)
+    min_history = bulk_setting("MIN_HISTORY")
+    mads = bulk_setting("OUTLIER_MADS")
+    for code in np.unique(meter[1:][judged]).tolist():
+        history = rate[historical & (meter[1:] == code)]
+        if len(history) < min_history:
+            continue
+        median = np.median(history)
+        deviation = np.abs(history - median)
+        # scaled MAD, or the scaled mean absolute deviation when over half the
+        # rates are identical
+        spread = 1.4826 * np.median(deviation) or 1.2533 * np.mean(deviation)
+        if spread == 0:
+            continue
+        outside = judged & (meter[1:] == code) & (np.abs(rate - median) > mads * spread)
+        for position in np.flatnonzero(outside).tolist():
+            _add_error(
+                errors, int(row[position + 1]), "value",
+                f"Consumption of {rate[position]:.2f}/day is outside this meter's usual "
+                f"{max(median - mads * spread, 0):.2f}-{median + mads * spread:.2f}/day.",
+            )
+
+
+def error_report(rows, errors):
+    return [
+        {
+            "row": index + 1,
+            "meter_number": rows[index].get("meter_number"),
+            "date": rows[index].get("date"),
+            "errors": errors[index],
+        }
+        for index in sorted(errors)
+    ]
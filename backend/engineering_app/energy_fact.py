@@ -0,0 +1,224 @@
+from django.conf import settings
+from django.db import connection, transaction
+from django.dispatch import receiver
+
+from .filters import ENERGY_GRAINS
+from .ingest import data_ingested
+
+# Serialises concurrent refreshes (management command vs. ingest hook).
+ENERGY_FACT_LOCK_ID = 4_210_003
+
+ENERGY_TABLES = ("water_daily", "cng_daily", "electricity_daily")
+
+# The join the energy views used to run per request, once per date. Rows follow
+# water_daily; cng / electricity days without a water reading are not shown.
+FACT_SELECT_SQL = """
+    SELECT
+        a.date,
+        a.daily_consumption * 100,
+        b.daily_consumption,
+        c.daily_consumption,
+        EXTRACT(YEAR FROM a.date),
+        EXTRACT(MONTH FROM a.date),
+        FLOOR((EXTRACT(DAY FROM a.date) - 1) / 7) + 1,
+        EXTRACT(DAY FROM a.date),
+        TO_CHAR(a.date, 'FMMonth'),
+        CASE TO_CHAR(a.date, 'DY')
+            WHEN 'MON' THEN 'Sen'
+            WHEN 'TUE' THEN 'Sel'
+            WHEN 'WED' THEN 'Rab'
+            WHEN 'THU' THEN 'Kam'
+            WHEN 'FRI' THEN 'Jum'
+            WHEN 'SAT' THEN 'Sab'
+            WHEN 'SUN' THEN 'Min'
+            ELSE TO_CHAR(a.date, 'DY')
+        END
+    FROM water_daily a
+    LEFT JOIN cng_daily b ON a.date = b.date
+    LEFT JOIN electricity_daily c ON a.date = c.date
+"""
+
+# Statement triggers on the *_daily tables log the dates they write into
+# energy_fact_dirty_day. Migration 0016 installs them if the tables exist at
+# migrate time; they are created outside Django, so a full refresh installs
+# (or replaces) them as well.
+DIRTY_FUNCTION_SQL = """
+    CREATE OR REPLACE FUNCTION energy_fact_mark_dirty() RETURNS trigger AS $$
+    BEGIN
+        IF TG_OP IN ('INSERT', 'UPDATE') THEN
+            INSERT INTO energy_fact_dirty_day (date)
+            SELECT DISTINCT date FROM new_rows
+            ON CONFLICT DO NOTHING;
+        END IF;
+        IF TG_OP IN ('UPDATE', 'DELETE') THEN
+            INSERT INTO energy_fact_dirty_day (date)
+            SELECT DISTINCT date FROM old_rows
+            ON CONFLICT DO NOTHING;
+        END IF;
+        RETURN NULL;
+    END;
+    $$ LANGUAGE plpgsql
+"""
+
+# trigger name suffix -> CREATE OR REPLACE TRIGGER of it on {table}
+DIRTY_TRIGGERS = {
+    "fact_insert": """
+        CREATE OR REPLACE TRIGGER {table}_fact_insert AFTER INSERT ON {table}
+        REFERENCING NEW TABLE AS new_rows
+        FOR EACH STATEMENT EXECUTE FUNCTION energy_fact_mark_dirty()
+    """,
+    "fact_update": """
+        CREATE OR REPLACE TRIGGER {table}_fact_update AFTER UPDATE ON {table}
+        REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+        FOR EACH STATEMENT EXECUTE FUNCTION energy_fact_mark_dirty()
+    """,
+    "fact_delete": """
+        CREATE OR REPLACE TRIGGER {table}_fact_delete AFTER DELETE ON {table}
+        REFERENCING OLD TABLE AS old_rows
+        FOR EACH STATEMENT EXECUTE FUNCTION energy_fact_mark_dirty()
+    """,
+}
+
+INSTALLED_TRIGGERS_SQL = """
+    SELECT c.relname || '_' || s.suffix
+    FROM unnest(%s::text[]) AS t(name)
+    JOIN pg_class c ON c.oid = to_regclass(t.name)
+    CROSS JOIN unnest(%s::text[]) AS s(suffix)
+    JOIN pg_trigger g ON g.tgrelid = c.oid AND g.tgname = c.relname || '_' || s.suffix
+"""
+
+DELETE_DIRTY_SQL = "DELETE FROM energy_daily_fact WHERE date = ANY(%s::date[])"
+
+INSERT_DIRTY_SQL = """
+    INSERT INTO energy_daily_fact
+    {select}
+    WHERE a.date = ANY(%s::date[])
+""".format(select=FACT_SELECT_SQL)
+
+INSERT_ALL_SQL = "INSERT INTO energy_daily_fact {select}".format(select=FACT_SELECT_SQL)
+
+# energy_rollup: sum / avg / min / max / count of each utility per day, ISO
+# week (starting Monday), month and year of energy_daily_fact. A refresh
+# recomputes every period that contains one of the given dates, each through
+# a date range on the fact table's primary key.
+ROLLUP_PERIODS_SQL = """
+    periods AS (
+        SELECT DISTINCT
+            g.grain,
+            date_trunc(g.grain, d.date::timestamp)::date AS period_start
+        FROM ({dates}) AS d(date)
+        CROSS JOIN unnest(%s::text[]) AS g(grain)
+    )
+"""
+
+DELETE_ROLLUP_SQL = """
+    WITH {periods}
+    DELETE FROM energy_rollup r
+    USING periods p
+    WHERE r.grain = p.grain AND r.period_start = p.period_start
+"""
+
+INSERT_ROLLUP_SQL = """
+    WITH {periods}
+    INSERT INTO energy_rollup (grain, period_start, utility, total, average, minimum, maximum, days)
+    SELECT p.grain, p.period_start, u.utility, SUM(u.value), AVG(u.value), MIN(u.value), MAX(u.value), COUNT(u.value)
+    FROM periods p
+    JOIN energy_daily_fact f
+      ON f.date >= p.period_start
+     AND f.date < p.period_start + ('1 ' || p.grain)::interval
+    CROSS JOIN LATERAL (
+        VALUES
+            ('water', f.water_consumption),
+            ('cng', f.cng_consumption),
+            ('electricity', f.electricity_consumption)
+    ) AS u(utility, value)
+    GROUP BY p.grain, p.period_start, u.utility
+    HAVING COUNT(u.value) > 0
+"""
+
+DIRTY_DATES_SQL = "SELECT unnest(%s::date[])"
+ALL_DATES_SQL = "SELECT date FROM energy_daily_fact"
+
+
+def _rollup_sql(template, dates_sql):
+    return template.format(periods=ROLLUP_PERIODS_SQL.format(dates=dates_sql))
+
+
+class EnergyTablesMissing(RuntimeError):
+    pass
+
+
+def missing_energy_tables(cursor):
+    cursor.execute(
+        "SELECT name FROM unnest(%s::text[]) AS t(name) WHERE to_regclass(name) IS NULL", [list(ENERGY_TABLES)]
+    )
+    return [row[0] for row in cursor.fetchall()]
+
+
+def untracked_energy_tables():
+    """The *_daily tables missing, or missing one of the triggers that mark their dates dirty."""
+    with connection.cursor() as cursor:
+        cursor.execute(INSTALLED_TRIGGERS_SQL, [list(ENERGY_TABLES), list(DIRTY_TRIGGERS)])
+        installed = {row[0] for row in cursor.fetchall()}
+    return [
+        table for table in ENERGY_TABLES
+        if any(f"{table}_{suffix}" not in installed for suffix in DIRTY_TRIGGERS)
+    ]
+
+
+def install_dirty_triggers(cursor):
+    cursor.execute(DIRTY_FUNCTION_SQL)
+    for table in ENERGY_TABLES:
+        for sql in DIRTY_TRIGGERS.values():
+            cursor.execute(sql.format(table=table))
+
+
+def refresh_energy_rollup(cursor, dates=None):
+    # called inside the fact refresh, after energy_daily_fact has been updated
+    grains = list(ENERGY_GRAINS)
+    if dates is None:
+        cursor.execute("DELETE FROM energy_rollup")
+        cursor.execute(_rollup_sql(INSERT_ROLLUP_SQL, ALL_DATES_SQL), [grains])
+        return
+    cursor.execute(_rollup_sql(DELETE_ROLLUP_SQL, DIRTY_DATES_SQL), [dates, grains])
+    cursor.execute(_rollup_sql(INSERT_ROLLUP_SQL, DIRTY_DATES_SQL), [dates, grains])
+
+
+def refresh_energy_daily_fact(full=False):
+    """
+    Brings energy_daily_fact and energy_rollup up to date with the *_daily
+    tables and returns the number of dirty dates consumed (or None for a full
+    rebuild). Each dirty date is rebuilt through the primary keys of the three
+    tables, then the rollup periods containing it. A full rebuild also
+    installs the dirty-day triggers, and raises EnergyTablesMissing if one of
+    the tables does not exist.
+    """
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute("SELECT pg_advisory_xact_lock(%s)", [ENERGY_FACT_LOCK_ID])
+        if full:
+            missing = missing_energy_tables(cursor)
+            if missing:
+                raise EnergyTablesMissing(f"{', '.join(missing)} does not exist")
+            install_dirty_triggers(cursor)
+            cursor.execute("DELETE FROM energy_fact_dirty_day")
+            cursor.execute("DELETE FROM energy_daily_fact")
+            cursor.execute(INSERT_ALL_SQL)
+            refresh_energy_rollup(cursor)
+            return None
+
+        cursor.execute("DELETE FROM energy_fact_dirty_day RETURNING date")
+        dates = [row[0] for row in cursor.fetchall()]
+        if not dates:
+            return 0
+        cursor.execute(DELETE_DIRTY_SQL, [dates])
+        cursor.execute(INSERT_DIRTY_SQL, [dates])
+        refresh_energy_rollup(cursor, dates)
+        return len(dates)
+
+
+@receiver(data_ingested)
+def refresh_energy_fact_after_ingest(sender, tables=None, **kwargs):
+    if not getattr(settings, "ENERGY_FACT_REFRESH_ON_INGEST", True):
+        return
+    if tables is None or set(tables) & set(ENERGY_TABLES):
+        refresh_energy_daily_fact()
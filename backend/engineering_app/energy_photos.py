@@ -0,0 +1,121 @@
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.files.uploadhandler import SkipFile, TemporaryFileUploadHandler
+from django.db import close_old_connections, transaction
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+from PIL import Image, ImageOps
+
+from .models import EnergyInput
+
+logger = logging.getLogger(__name__)
+
+# Meter photos of EnergyInput. Uploads are streamed to a temporary file in
+# chunks and dropped once they pass MAX_UPLOAD_BYTES, so a large photo is never
+# held in memory. After the row is committed a small JPEG is made from the photo
+# in a background pool and stored next to it (energy_photos/<name>.thumb.jpg);
+# the list endpoints return its URL in `thumbnail`.
+
+DEFAULTS = {
+    "MAX_UPLOAD_BYTES": 10 * 1024 * 1024,
+    "THUMBNAIL_SIZE": 320,
+    "THUMBNAIL_QUALITY": 80,
+    "THUMBNAIL_WORKERS": 2,
+}
+
+THUMBNAIL_SUFFIX = ".thumb.jpg"
+
+
+def photo_setting(name):
+    return getattr(settings, "ENERGY_PHOTOS", {}).get(name, DEFAULTS[name])
+
+
+class CappedUploadHandler(TemporaryFileUploadHandler):
+    """
+    Writes each uploaded file to a temporary file chunk by chunk and skips the
+    ones larger than `max_bytes`; their field names are kept in `too_large`.
+    """
+
+    def __init__(self, request=None, max_bytes=None):
+        super().__init__(request)
+        self.max_bytes = photo_setting("MAX_UPLOAD_BYTES") if max_bytes is None else max_bytes
+        self.too_large = []
+        self.received = 0
+
+    def new_file(self, *args, **kwargs):
+        super().new_file(*args, **kwargs)
+        self.received = 0
+
+    def receive_data_chunk(self, raw_data, start):
+        self.received += len(raw_data)
+        if self.received > self.max_bytes:
+            self.too_large.append(self.field_name)
+            raise SkipFile()
+        return super().receive_data_chunk(raw_data, start)
+
+
+def thumbnail_name(photo_name):
+    return os.path.splitext(photo_name)[0] + THUMBNAIL_SUFFIX
+
+
+def make_thumbnail(pk):
+    """
+    Stores the thumbnail of an EnergyInput's photo and returns its name, or
+    None when the row or its photo is gone.
+    """
+    entry = EnergyInput.objects.filter(pk=pk).only("photo").first()
+    if entry is None or not entry.photo:
+        return None
+    size = (photo_setting("THUMBNAIL_SIZE"),) * 2
+    with entry.photo.open("rb") as photo, Image.open(photo) as image:
+        # JPEGs are decoded straight at a fraction of their size
+        image.draft("RGB", size)
+        image = ImageOps.exif_transpose(image)
+        image.thumbnail(size)
+        buffer = BytesIO()
+        image.convert("RGB").save(buffer, "JPEG", quality=photo_setting("THUMBNAIL_QUALITY"), optimize=True)
+
+    name = thumbnail_name(entry.photo.name)
+    if default_storage.exists(name):
+        default_storage.delete(name)
+    name = default_storage.save(name, ContentFile(buffer.getvalue()))
+    # only if the photo was not replaced in the meantime
+    EnergyInput.objects.filter(pk=pk, photo=entry.photo.name).update(thumbnail=name)
+    return name
+
+
+def _run(pk):
+    try:
+        make_thumbnail(pk)
+    except (OSError, Image.DecompressionBombError):
+        logger.warning("Could not make a thumbnail for energy input %s", pk, exc_info=True)
+    except Exception:
+        logger.exception("Thumbnail for energy input %s failed", pk)
+    finally:
+        close_old_connections()
+
+
+executor = ThreadPoolExecutor(
+    max_workers=photo_setting("THUMBNAIL_WORKERS"),
+    thread_name_prefix="thumbnail",
+)
+
+
+def schedule_thumbnail(pk):
+    return executor.submit(_run, pk)
+
+
+@receiver(post_save, sender=EnergyInput)
+def thumbnail_after_save(sender, instance, update_fields=None, **kwargs):
+    if not instance.photo:
+        return
+    if update_fields is not None and "photo" not in update_fields:
+        return
+    transaction.on_commit(partial(schedule_thumbnail, instance.pk))
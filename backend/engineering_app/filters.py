@@ -0,0 +1,203 @@
+from collections import namedtuple
+from datetime import datetime, time, timedelta
+
+from django.conf import settings
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+
+from .models import EnergyInput
+
+# ?from=&to=&resource=&asset_group=&department= of the analytics endpoints.
+# from / to are inclusive dates; date_to is kept as the exclusive midnight
+# after `to`. The dimension filters are tuples and may be repeated.
+AnalyticsFilters = namedtuple(
+    "AnalyticsFilters",
+    ["date_from", "date_to", "resource", "asset_group", "department"],
+)
+
+NO_FILTERS = AnalyticsFilters(None, None, (), (), ())
+
+DIMENSIONS = ("resource", "asset_group", "department")
+
+# how far before `from` failures are still read, so the first failure in the
+# range gets its predecessor for MTBF
+DEFAULT_MTBF_LOOKBACK_DAYS = 90
+
+# main_data is partitioned by month of wo_created_date. With a number of days
+# set, a work order's failure, start and completion dates are taken to lie
+# within that many days of its creation, so a range on any of them also bounds
+# wo_created_date and lets postgres skip the other months. Off by default: a
+# row outside the window drops out of the results, so it is only safe where
+# the data is known to respect it.
+DEFAULT_EVENT_WINDOW_DAYS = None
+
+
+class InvalidFilter(ValueError):
+    pass
+
+
+def _parse_date(request, name):
+    raw = request.GET.get(name)
+    if raw in (None, ""):
+        return None
+    try:
+        day = parse_date(raw)
+    except ValueError:
+        day = None
+    if day is None:
+        raise InvalidFilter(f"Invalid {name} value")
+    return day
+
+
+def _values(request, name):
+    # a repeatable parameter, without empty or repeated values
+    return tuple(dict.fromkeys(value for value in request.GET.getlist(name) if value))
+
+
+def _parse_day(request, name):
+    day = _parse_date(request, name)
+    if day is None:
+        return None
+    return timezone.make_aware(datetime.combine(day, time.min))
+
+
+def parse_filters(request):
+    date_from = _parse_day(request, "from")
+    date_to = _parse_day(request, "to")
+    if date_to is not None:
+        date_to += timedelta(days=1)
+    if date_from is not None and date_to is not None and date_from >= date_to:
+        raise InvalidFilter("from must not be after to")
+    dimensions = [_values(request, name) for name in DIMENSIONS]
+    return AnalyticsFilters(date_from, date_to, *dimensions)
+
+
+def lookback_from(filters):
+    if filters.date_from is None:
+        return None
+    days = getattr(settings, "MTBF_LOOKBACK_DAYS", DEFAULT_MTBF_LOOKBACK_DAYS)
+    return filters.date_from - timedelta(days=days)
+
+
+def event_window():
+    partitions = getattr(settings, "MAIN_DATA_PARTITIONS", {})
+    days = partitions.get("EVENT_WINDOW_DAYS", DEFAULT_EVENT_WINDOW_DAYS)
+    return None if days is None else timedelta(days=days)
+
+
+def created_range(filters, lookback=False):
+    """
+    (from, to) on wo_created_date implied by the date range through
+    event_window(); either end is None when unbounded. None without a window.
+    """
+    window = event_window()
+    date_from = lookback_from(filters) if lookback else filters.date_from
+    if window is None or (date_from is None and filters.date_to is None):
+        return None
+    return (
+        None if date_from is None else date_from - window,
+        None if filters.date_to is None else filters.date_to + window,
+    )
+
+
+def filter_sql(filters, time_column, lookback=False):
+    """
+    `AND ...` conditions restricting main_data rows to `filters`, with
+    `time_column` in the date range (widened by the MTBF look-back if asked).
+    Placeholders are named, see filter_params().
+    """
+    conditions = []
+    date_from = "lookback_from" if lookback else "date_from"
+    if filters.date_from is not None:
+        conditions.append(f"{time_column} >= %({date_from})s")
+    if filters.date_to is not None:
+        conditions.append(f"{time_column} < %(date_to)s")
+    created = created_range(filters, lookback) if time_column != "wo_created_date" else None
+    if created is not None:
+        bounds = []
+        if created[0] is not None:
+            bounds.append(f"wo_created_date >= %(created_{date_from})s")
+        if created[1] is not None:
+            bounds.append("wo_created_date < %(created_date_to)s")
+        # NULL creation dates live in the DEFAULT partition, which is always read
+        conditions.append(f"({' AND '.join(bounds)} OR wo_created_date IS NULL)")
+    for name in DIMENSIONS:
+        if getattr(filters, name):
+            conditions.append(f"{name} = ANY(%({name})s)")
+    return "".join(f"\n          AND {condition}" for condition in conditions)
+
+
+def since_sql(filters, time_column):
+    # drops the look-back rows again once their LAG has been taken
+    if filters.date_from is None:
+        return ""
+    return f"\n          AND {time_column} >= %(date_from)s"
+
+
+def filter_params(filters):
+    if filters == NO_FILTERS:
+        return None
+    params = {name: list(getattr(filters, name)) for name in DIMENSIONS}
+    params.update(date_from=filters.date_from, date_to=filters.date_to, lookback_from=lookback_from(filters))
+    created, created_lookback = created_range(filters), created_range(filters, lookback=True)
+    params.update(
+        created_date_from=created and created[0],
+        created_date_to=created and created[1],
+        created_lookback_from=created_lookback and created_lookback[0],
+    )
+    return params
+
+
+# ?grain=&from=&to= of /energy/rollup/. from / to are inclusive dates; a period
+# is returned when it overlaps them.
+EnergyRollupFilters = namedtuple("EnergyRollupFilters", ["grain", "date_from", "date_to"])
+
+ENERGY_GRAINS = ("day", "week", "month", "year")
+
+
+def parse_energy_rollup(request):
+    grain = request.GET.get("grain") or "month"
+    if grain not in ENERGY_GRAINS:
+        raise InvalidFilter(f"grain must be one of: {', '.join(ENERGY_GRAINS)}")
+    date_from = _parse_date(request, "from")
+    date_to = _parse_date(request, "to")
+    if date_from is not None and date_to is not None and date_from > date_to:
+        raise InvalidFilter("from must not be after to")
+    return EnergyRollupFilters(grain, date_from, date_to)
+
+
+# ?type=&meter_number=&user=&from=&to= of the EnergyInput lists. from / to are
+# inclusive reading dates; type, meter_number and user (an id) may be repeated.
+EnergyInputFilters = namedtuple("EnergyInputFilters", ["type", "meter_number", "user", "date_from", "date_to"])
+
+ENERGY_INPUT_TYPES = tuple(dict(EnergyInput.ENERGY_TYPES))
+
+
+def parse_energy_input_filters(request):
+    types = _values(request, "type")
+    unknown = [value for value in types if value not in ENERGY_INPUT_TYPES]
+    if unknown:
+        raise InvalidFilter(f"type must be one of: {', '.join(ENERGY_INPUT_TYPES)}")
+    try:
+        users = tuple(int(value) for value in _values(request, "user"))
+    except ValueError:
+        raise InvalidFilter("Invalid user value") from None
+    date_from = _parse_date(request, "from")
+    date_to = _parse_date(request, "to")
+    if date_from is not None and date_to is not None and date_from > date_to:
+        raise InvalidFilter("from must not be after to")
+    return EnergyInputFilters(types, _values(request, "meter_number"), users, date_from, date_to)
+
+
+def filter_energy_inputs(queryset, filters):
+    if filters.type:
+        queryset = queryset.filter(type__in=filters.type)
+    if filters.meter_number:
+        queryset = queryset.filter(meter_number__in=filters.meter_number)
+    if filters.user:
+        queryset = queryset.filter(user_id__in=filters.user)
+    if filters.date_from is not None:
+        queryset = queryset.filter(date__gte=filters.date_from)
+    if filters.date_to is not None:
+        queryset = queryset.filter(date__lte=filters.date_to)
+    return queryset
@@ -0,0 +1,117 @@
+from django.db import connection
+
+from .partitions import list_partitions, main_data_kind
+
+# main_data is unmanaged, so Meta.indexes / AddIndex would be no-ops; the index
+# set is created with raw SQL instead. Each index follows the access path of
+# the queries noted next to it (see `manage.py main_data_index_usage`).
+# Migration 0013 creates them if main_data exists at migrate time, `manage.py
+# main_data_indexes` once it does (or after the ingest recreated the table).
+MAIN_DATA_INDEXES = [
+    # work-order-list: ORDER BY wo_created_date DESC with the (wo_created_date, no)
+    # keyset; rollup refresh: wo_created_date ranges of the touched weeks
+    ("main_data_wo_created_no_idx",
+     "(wo_created_date, no)"),
+    # work-order-counts?source=live: wo_status = ANY(...) per week of wo_created_date
+    ("main_data_status_created_idx",
+     "(wo_status, wo_created_date) WHERE wo_created_date IS NOT NULL"),
+    # work-request list: ORDER BY wr_request_by_date DESC with the (wr_request_by_date, no) keyset
+    ("main_data_wr_request_by_no_idx",
+     "(wr_request_by_date, no) WHERE wr_request_by_date IS NOT NULL"),
+    # analytics and monthly-trend MTBF: failures in actual_failure_date order,
+    # analytics also groups them per asset
+    ("main_data_failure_date_idx",
+     "(actual_failure_date) INCLUDE (no_asset_of_wo) WHERE actual_failure_date IS NOT NULL"),
+    # category-analytics MTBF: LAG(...) OVER (PARTITION BY resource ORDER BY actual_failure_date)
+    ("main_data_resource_failure_idx",
+     "(resource, actual_failure_date) WHERE actual_failure_date IS NOT NULL"),
+    # equipment-analytics MTBF and failure counts: the same window per asset_group
+    ("main_data_asset_group_failure_idx",
+     "(asset_group, actual_failure_date) WHERE actual_failure_date IS NOT NULL"),
+    # monthly-trend, category- and equipment-analytics MTTR: completed work orders,
+    # index-only with the grouping columns included
+    ("main_data_actual_start_idx",
+     "(wo_actual_start_date) INCLUDE (wo_actual_completion_date, resource, asset_group) "
+     "WHERE wo_actual_start_date IS NOT NULL AND wo_actual_completion_date IS NOT NULL"),
+    # analytics MTTR: scheduled duration per day
+    ("main_data_scheduled_start_idx",
+     "(wo_scheduled_start_date) INCLUDE (wo_scheduled_completion_date) "
+     "WHERE wo_scheduled_start_date IS NOT NULL AND wo_scheduled_completion_date IS NOT NULL"),
+    # category-analytics work order count per resource
+    ("main_data_resource_idx",
+     "(resource)"),
+]
+
+# Indexes of the set that have been replaced, dropped where they are left over
+RETIRED_MAIN_DATA_INDEXES = [
+    # the (wr_request_by_date, wr_number) keyset of the work-request list (0023)
+    "main_data_wr_request_by_idx",
+]
+
+# name -> valid, for the indexes of `table`
+TABLE_INDEXES_SQL = """
+    SELECT c.relname, i.indisvalid
+    FROM pg_index i
+    JOIN pg_class c ON c.oid = i.indexrelid
+    WHERE i.indrelid = to_regclass(%s)
+"""
+
+
+class MainDataMissing(RuntimeError):
+    pass
+
+
+def _table_indexes(cursor, table):
+    cursor.execute(TABLE_INDEXES_SQL, [table])
+    return dict(cursor.fetchall())
+
+
+def _create_concurrently(cursor, name, table, definition, existing):
+    # a CONCURRENTLY build that failed leaves an invalid index behind
+    if existing.get(name) is False:
+        cursor.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {name}")
+    cursor.execute(f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {name} ON {table} {definition}")
+
+
+def missing_main_data_indexes():
+    """The MAIN_DATA_INDEXES names that do not exist, or are not valid yet, on main_data."""
+    with connection.cursor() as cursor:
+        existing = _table_indexes(cursor, "main_data")
+    return [name for name, _ in MAIN_DATA_INDEXES if not existing.get(name)]
+
+
+def create_main_data_indexes():
+    """
+    Creates the MAIN_DATA_INDEXES missing on main_data and returns their names.
+    The indexes build CONCURRENTLY, so main_data stays writable and this must
+    run outside a transaction. On a partitioned main_data CONCURRENTLY only
+    works per partition: the index is created ON ONLY the parent, built on
+    every partition and attached there, and becomes valid once all are.
+    Drops the RETIRED_MAIN_DATA_INDEXES left on main_data.
+    Raises MainDataMissing if main_data does not exist.
+    """
+    with connection.cursor() as cursor:
+        kind = main_data_kind(cursor)
+        if kind is None:
+            raise MainDataMissing("main_data does not exist")
+        existing = _table_indexes(cursor, "main_data")
+        missing = [(name, definition) for name, definition in MAIN_DATA_INDEXES if not existing.get(name)]
+        if kind == "p":
+            months, default = list_partitions(cursor)
+            partitions = [name for _, name in months] + ([default] if default else [])
+        for name, definition in missing:
+            if kind != "p":
+                _create_concurrently(cursor, name, "main_data", definition, existing)
+                continue
+            cursor.execute(f"CREATE INDEX IF NOT EXISTS {name} ON ONLY main_data {definition}")
+            for partition in partitions:
+                child = f"{partition}_{name.removeprefix('main_data_')}"
+                _create_concurrently(cursor, child, partition, definition, _table_indexes(cursor, partition))
+                cursor.execute(f"ALTER INDEX {name} ATTACH PARTITION {child}")
+        for name in RETIRED_MAIN_DATA_INDEXES:
+            if name in existing:
+                # a partitioned index cannot be dropped CONCURRENTLY
+                cursor.execute(f"DROP INDEX {'' if kind == 'p' else 'CONCURRENTLY '}IF EXISTS {name}")
+        if missing:
+            cursor.execute("ANALYZE main_data")
+    return [name for name, _ in missing]
@@ -0,0 +1,9 @@
+from django.dispatch import Signal
+
+# Sent by ingest jobs once they have written to the tables the dashboard reads
+# (main_data, water_daily, ...). Receivers refresh whatever derived data they keep.
+#
+#     data_ingested.send(sender=None, tables=["main_data"])
+#
+# `tables` may be omitted when the caller does not know what changed.
+data_ingested = Signal()
@@ -0,0 +1,116 @@
+import json
+from datetime import timedelta
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import HttpResponse
+from django.utils.duration import duration_iso_string
+from django.utils.functional import Promise
+from rest_framework.renderers import JSONRenderer
+from rest_framework.utils import encoders
+
+from .timings import timed
+
+try:
+    import orjson
+except ImportError:  # the stdlib encoder is used instead
+    orjson = None
+
+# One JSON encoder for the function views (JsonResponse below) and the DRF
+# views (FastJSONRenderer). With orjson installed rows are encoded in C; the
+# types it has no native form for are written the way the stdlib encoder of
+# each kind of view writes them. For JsonResponse that is DjangoJSONEncoder:
+# Decimal as a string, timedelta as an ISO 8601 duration. Datetimes in
+# UTC end in Z as before; the only difference is that sub-second parts keep
+# their microseconds instead of being cut to milliseconds. FastJSONRenderer
+# writes what DRF's JSONRenderer writes, byte for byte, except that a NaN or
+# infinite float is null where JSONRenderer raises under STRICT_JSON.
+#
+# JSON_ENCODER = "stdlib" in the settings switches back to DjangoJSONEncoder
+# and DRF's own encoder.
+
+ORJSON_OPTIONS = (
+    orjson.OPT_UTC_Z | orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY
+    if orjson is not None else 0
+)
+
+
+def _default(obj):
+    # called by orjson for what it cannot encode itself
+    if isinstance(obj, Decimal):
+        return str(obj)
+    if isinstance(obj, timedelta):
+        return duration_iso_string(obj)
+    if isinstance(obj, Promise):
+        return str(obj)
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+# DRF's encoder has the forms of everything orjson hands to the renderer's
+# default: a Decimal is a number (serializer DecimalFields are strings already
+# under COERCE_DECIMAL_TO_STRING, before rendering), a timedelta its seconds
+# as str(total_seconds()), numpy values their tolist(). Numpy is not encoded
+# natively, as orjson writes a float32 differently from the float tolist() gives.
+DRF_ORJSON_OPTIONS = ORJSON_OPTIONS & ~orjson.OPT_SERIALIZE_NUMPY if orjson is not None else 0
+
+_drf_default = encoders.JSONEncoder().default
+
+
+def encoder_name():
+    name = getattr(settings, "JSON_ENCODER", "orjson")
+    return "orjson" if name == "orjson" and orjson is not None else "stdlib"
+
+
+@timed("serialize")
+def dumps(data):
+    """
+    `data` as UTF-8 encoded JSON bytes. What orjson cannot encode goes through
+    DjangoJSONEncoder, which raises as it always did.
+    """
+    if encoder_name() == "orjson":
+        try:
+            return orjson.dumps(data, default=_default, option=ORJSON_OPTIONS)
+        except orjson.JSONEncodeError:
+            pass
+    return json.dumps(data, cls=DjangoJSONEncoder).encode()
+
+
+class JsonResponse(HttpResponse):
+    """
+    django.http.JsonResponse encoded by dumps(). Passing `encoder` or
+    `json_dumps_params` falls back to the stdlib encoder with them.
+    """
+
+    def __init__(self, data, encoder=None, safe=True, json_dumps_params=None, **kwargs):
+        if safe and not isinstance(data, dict):
+            raise TypeError(
+                "In order to allow non-dict objects to be serialized set the safe parameter to False."
+            )
+        kwargs.setdefault("content_type", "application/json")
+        if encoder is None and json_dumps_params is None:
+            content = dumps(data)
+        else:
+            content = json.dumps(data, cls=encoder or DjangoJSONEncoder, **(json_dumps_params or {}))
+        super().__init__(content=content, **kwargs)
+
+
+class FastJSONRenderer(JSONRenderer):
+    # DRF's JSONRenderer through orjson; an indent asked for in the Accept
+    # header, the non-default UNICODE_JSON and COMPACT_JSON settings, and
+    # anything orjson cannot encode go through DRF's own encoder
+    @timed("serialize")
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b""
+        if (
+            self.get_indent(accepted_media_type, renderer_context or {})
+            or self.ensure_ascii or not self.compact or encoder_name() != "orjson"
+        ):
+            return super().render(data, accepted_media_type, renderer_context)
+        try:
+            content = orjson.dumps(data, default=_drf_default, option=DRF_ORJSON_OPTIONS)
+        except orjson.JSONEncodeError:
+            return super().render(data, accepted_media_type, renderer_context)
+        # as JSONRenderer does, for the JSON embedded in a <script>
+        return content.replace(b"\xe2\x80\xa8", b"\\u2028").replace(b"\xe2\x80\xa9", b"\\u2029")
@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand
+
+from engineering_app.energy_aggregation import aggregate_energy_inputs
+
+
+class Command(BaseCommand):
+    help = "Sum the EnergyInput meter readings created since the last run into the daily energy tables."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--full",
+            action="store_true",
+            help="Recompute every meter instead of only the readings since the watermark "
+                 "(needed after readings were moved to another date or meter).",
+        )
+
+    def handle(self, *args, **options):
+        written = aggregate_energy_inputs(full=options["full"])
+        if not written:
+            self.stdout.write(self.style.SUCCESS("The daily energy tables are up to date."))
+            return
+        self.stdout.write(self.style.SUCCESS(f"Wrote {sum(written.values())} daily row(s)."))
+        for table, count in sorted(written.items()):
+            self.stdout.write(f"  {table}: {count}")
@@ -0,0 +1,145 @@
+from pathlib import Path
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.test.utils import override_settings
+
+from engineering_app.benchmarks import (
+    LATENCY_METRICS,
+    ClientDriver,
+    ServerDriver,
+    benchmark_setting,
+    compare_runs,
+    endpoint_paths,
+    load_run,
+    run_benchmarks,
+    save_run,
+)
+
+
+def _value(value, unit=""):
+    return "-" if value is None else f"{value:.1f}{unit}"
+
+
+class Command(BaseCommand):
+    help = "Benchmark the API endpoints and compare the latencies with a baseline run."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--requests", type=int, default=20, help="Measured requests per endpoint (default: 20).")
+        parser.add_argument("--concurrency", type=int, default=1, help="Requests in flight at once (default: 1).")
+        parser.add_argument("--warmup", type=int, default=1, help="Unmeasured requests per endpoint first (default: 1).")
+        parser.add_argument(
+            "--path",
+            action="append",
+            dest="paths",
+            help="Benchmark this path (with its query string) instead of every GET endpoint; repeatable.",
+        )
+        parser.add_argument(
+            "--exclude",
+            action="append",
+            default=[],
+            help="Skip the endpoints whose path contains this text; repeatable.",
+        )
+        parser.add_argument("--user", help="Username to request as (default: the first active superuser).")
+        parser.add_argument(
+            "--base-url",
+            help="Request a running server, e.g. http://127.0.0.1:8000, instead of the test client. "
+                 "SQL and serialization time are only measured in-process.",
+        )
+        parser.add_argument("--server-pid", type=int, help="Report the peak RSS of this server process.")
+        parser.add_argument(
+            "--no-cache",
+            action="store_true",
+            help="Compute the cached analytics results on every request (test client only).",
+        )
+        parser.add_argument("--output", help="Results file (default: a timestamped file in the results directory).")
+        parser.add_argument(
+            "--baseline",
+            help="Run to compare with (default: baseline.json in the results directory, if there is one).",
+        )
+        parser.add_argument("--save-baseline", action="store_true", help="Also store this run as the baseline.")
+        parser.add_argument("--metric", choices=LATENCY_METRICS, default="p95_ms", help="Compared latency (default: p95_ms).")
+        parser.add_argument(
+            "--threshold",
+            type=float,
+            default=None,
+            help="Allowed slowdown as a fraction, e.g. 0.2 (default: ENDPOINT_BENCHMARKS['THRESHOLD']).",
+        )
+
+    def handle(self, *args, **options):
+        if options["requests"] < 1 or options["concurrency"] < 1 or options["warmup"] < 0:
+            raise CommandError("--requests and --concurrency must be at least 1, --warmup at least 0.")
+        user = self._user(options["user"])
+        if options["base_url"]:
+            if options["no_cache"]:
+                raise CommandError("--no-cache only applies to the test client.")
+            driver = ServerDriver(options["base_url"], user)
+        else:
+            driver = ClientDriver(user)
+
+        paths = options["paths"] or endpoint_paths()
+        paths = [path for path in paths if not any(text in path for text in options["exclude"])]
+        if not paths:
+            raise CommandError("No endpoints to benchmark.")
+
+        self.stdout.write(self.style.MIGRATE_HEADING(
+            f"{len(paths)} endpoint(s) via {driver.target}: {options['requests']} request(s) each, "
+            f"concurrency {options['concurrency']}"
+        ))
+        self.stdout.write(
+            f"  {'path':<36} {'status':>6} {'p50':>9} {'p95':>9} {'p99':>9} {'req/s':>8} {'sql':>9} {'json':>9} {'rss':>9}"
+        )
+
+        def progress(path, result):
+            self.stdout.write(
+                f"  {path:<36} {result['status']:>6} {_value(result['p50_ms'], 'ms'):>9} "
+                f"{_value(result['p95_ms'], 'ms'):>9} {_value(result['p99_ms'], 'ms'):>9} "
+                f"{_value(result['throughput_rps']):>8} {_value(result['sql_ms'], 'ms'):>9} "
+                f"{_value(result['serialize_ms'], 'ms'):>9} {_value(result['peak_rss_mb'], 'M'):>9}"
+            )
+
+        arguments = (driver, paths, options["requests"], options["concurrency"], options["warmup"], options["server_pid"])
+        if options["no_cache"]:
+            # entries are stale as soon as they are stored, and never served stale
+            uncached = {**getattr(settings, "ANALYTICS_CACHE", {}), "TTL": 0, "STALE_WHILE_REVALIDATE": 0, "ENDPOINT_TTLS": {}}
+            with override_settings(ANALYTICS_CACHE=uncached):
+                run = run_benchmarks(*arguments, progress=progress)
+        else:
+            run = run_benchmarks(*arguments, progress=progress)
+
+        saved = save_run(run, options["output"])
+        self.stdout.write(self.style.SUCCESS(f"Results written to {saved}"))
+        self._compare(run, options)
+        if options["save_baseline"]:
+            baseline = save_run(run, Path(benchmark_setting("RESULTS_DIR")) / "baseline.json")
+            self.stdout.write(self.style.SUCCESS(f"Stored as the baseline in {baseline}"))
+
+    def _user(self, username):
+        if username:
+            try:
+                return User.objects.get(username=username)
+            except User.DoesNotExist:
+                raise CommandError(f"No user {username!r}.") from None
+        user = User.objects.filter(is_active=True).order_by("-is_superuser", "id").first()
+        if user is None:
+            raise CommandError("There are no users to request as; create one or pass --user.")
+        return user
+
+    def _compare(self, run, options):
+        path = options["baseline"] or Path(benchmark_setting("RESULTS_DIR")) / "baseline.json"
+        if not Path(path).exists():
+            if options["baseline"]:
+                raise CommandError(f"Baseline {path} does not exist.")
+            return
+        metric = options["metric"]
+        rows = compare_runs(run, load_run(path), metric, options["threshold"])
+        self.stdout.write(self.style.MIGRATE_HEADING(f"{metric} against {path}"))
+        for endpoint, old, new, regressed in rows:
+            change = f"{(new - old) / old * 100:+.0f}%" if old and new is not None else ""
+            line = f"  {endpoint:<36} {_value(old, 'ms'):>9} -> {_value(new, 'ms'):>9} {change:>6}"
+            self.stdout.write(self.style.ERROR(line + "  REGRESSED") if regressed else line)
+        regressions = sum(row[3] for row in rows)
+        if regressions:
+            raise CommandError(f"{regressions} endpoint(s) regressed against the baseline.")
+        self.stdout.write(self.style.SUCCESS(f"No regressions in {len(rows)} endpoint(s)."))
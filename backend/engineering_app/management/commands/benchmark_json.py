@@ -0,0 +1,92 @@
+import statistics
+import time
+from datetime import datetime, timedelta, timezone
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.http import JsonResponse as DjangoJsonResponse
+from rest_framework.renderers import JSONRenderer
+
+from engineering_app.json_encoding import FastJSONRenderer, JsonResponse, encoder_name
+from engineering_app.views import WORK_ORDER_LIST_FIELDS, WORK_ORDER_LIST_SQL
+
+
+def _database_rows(count):
+    with connection.cursor() as cursor:
+        cursor.execute(f"{WORK_ORDER_LIST_SQL} LIMIT %s", [count])
+        return [dict(zip(WORK_ORDER_LIST_FIELDS, row)) for row in cursor.fetchall()]
+
+
+def _synthetic_rows(count):
+    # work_order_list rows with the value types of a real export, actual_duration
+    # as a timedelta
+    start = datetime(2024, 1, 1, tzinfo=timezone.utc)
+    rows = []
+    for i in range(count):
+        created = start + timedelta(minutes=37 * i)
+        rows.append({
+            "no": f"WO{100000 + i}",
+            "title": f"Pump {i % 40} bearing noise",
+            "wo_created_date": created,
+            "wo_status": ("Released", "Completed", "Closed")[i % 3],
+            "resource": ("MTC", "ELC", "UTL")[i % 3],
+            "wo_description": "Inspect and replace the bearing, check the alignment",
+            "wo_type": ("CM", "PM")[i % 2],
+            "wr_requestor": f"user{i % 25}",
+            "wo_actual_completion_date": created + timedelta(hours=3),
+            "actual_duration": timedelta(minutes=30 + i % 300),
+            "year": Decimal(created.year),
+            "month": Decimal(created.month),
+            "week_of_month": Decimal((created.day - 1) // 7 + 1),
+        })
+    return rows
+
+
+def _time(function, repeat):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        size = len(function())
+        timings.append(time.perf_counter() - started)
+    return size, timings
+
+
+class Command(BaseCommand):
+    help = "Time the stock and the fast JSON encoding of a work_order_list payload."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rows", type=int, default=5000, help="Rows in the payload (default: 5000).")
+        parser.add_argument("--repeat", type=int, default=20, help="Encodings timed per path (default: 20).")
+        parser.add_argument(
+            "--synthetic",
+            action="store_true",
+            help="Use generated rows instead of reading main_data.",
+        )
+
+    def handle(self, *args, **options):
+        rows = None if options["synthetic"] else _database_rows(options["rows"])
+        source = "main_data"
+        if not rows:
+            rows, source = _synthetic_rows(options["rows"]), "synthetic"
+        repeat = options["repeat"]
+
+        paths = [
+            ("JsonResponse (DjangoJSONEncoder)", lambda: DjangoJsonResponse(rows, safe=False).content),
+            (f"JsonResponse ({encoder_name()})", lambda: JsonResponse(rows, safe=False).content),
+            ("DRF JSONRenderer", lambda: JSONRenderer().render(rows)),
+            (f"FastJSONRenderer ({encoder_name()})", lambda: FastJSONRenderer().render(rows)),
+        ]
+        self.stdout.write(self.style.MIGRATE_HEADING(
+            f"{len(rows)} {source} row(s), best / median of {repeat} encoding(s)"
+        ))
+        baseline = {}
+        for index, (name, function) in enumerate(paths):
+            size, timings = _time(function, repeat)
+            best, median = min(timings), statistics.median(timings)
+            line = f"  {name:<36} {best * 1000:8.2f} ms {median * 1000:8.2f} ms {size / 1024:9.1f} KiB"
+            if index % 2 == 0:
+                baseline = median
+            else:
+                line += f"  x{baseline / median:.1f}"
+            self.stdout.write(line)
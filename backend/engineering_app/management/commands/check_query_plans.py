@@ -0,0 +1,122 @@
+import difflib
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+
+from engineering_app.plans import (
+    collect_plans,
+    compare_plans,
+    endpoint_queries,
+    load_plans,
+    plan_setting,
+    save_plans,
+)
+
+
+def _value(value, unit=""):
+    return "-" if value is None else f"{value:.1f}{unit}"
+
+
+def _tables(counts):
+    return ", ".join(f"{table} ({count})" if count > 1 else table for table, count in counts.items()) or "-"
+
+
+class Command(BaseCommand):
+    help = "EXPLAIN ANALYZE the dashboard endpoint queries and compare their plans with a stored baseline."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "query",
+            nargs="*",
+            help="Only check these endpoint queries (default: all).",
+        )
+        parser.add_argument(
+            "--baseline",
+            help="Baseline file (default: QUERY_PLANS['BASELINE']). Stored from this run if it does not exist.",
+        )
+        parser.add_argument(
+            "--update",
+            action="store_true",
+            help="Store this run as the baseline instead of comparing; with queries named, only those are replaced.",
+        )
+        parser.add_argument(
+            "--tolerance",
+            type=float,
+            default=None,
+            help="Allowed growth of the buffers touched as a fraction, e.g. 0.25 "
+                 "(default: QUERY_PLANS['BUFFER_TOLERANCE']).",
+        )
+        parser.add_argument(
+            "--strict",
+            action="store_true",
+            help="Also fail when a plan changed shape without regressing.",
+        )
+
+    def handle(self, *args, **options):
+        endpoints = endpoint_queries()
+        unknown = [name for name in options["query"] if name not in endpoints]
+        if unknown:
+            raise CommandError(f"Unknown query(s): {', '.join(unknown)}. Known: {', '.join(endpoints)}")
+        path = Path(options["baseline"] or plan_setting("BASELINE"))
+
+        self.stdout.write(self.style.MIGRATE_HEADING("EXPLAIN (ANALYZE, BUFFERS)"))
+        self.stdout.write(f"  {'query':<40} {'time':>10} {'buffers':>9} {'temp':>7}  seq scans")
+
+        def progress(name, result):
+            if "error" in result:
+                self.stdout.write(self.style.ERROR(f"  {name:<40} {result['error']}"))
+                return
+            metrics = result["metrics"]
+            self.stdout.write(
+                f"  {name:<40} {_value(metrics['execution_ms'], 'ms'):>10} {metrics['shared_blocks']:>9} "
+                f"{metrics['temp_blocks']:>7}  {_tables(metrics['seq_scans'])}"
+            )
+
+        run = collect_plans(options["query"], progress=progress)
+
+        if options["update"] or not path.exists():
+            saved = save_plans(run, path, merge=bool(options["query"]))
+            self.stdout.write(self.style.SUCCESS(f"Stored as the baseline in {saved}"))
+            return
+        self._compare(run, load_plans(path), path, options)
+
+    def _compare(self, run, baseline, path, options):
+        rows_then = baseline.get("environment", {}).get("main_data_rows")
+        rows_now = run["environment"]["main_data_rows"]
+        if rows_then and abs(rows_now - rows_then) > rows_then * plan_setting("BUFFER_TOLERANCE"):
+            self.stdout.write(self.style.WARNING(
+                f"main_data has ~{rows_now} rows, the baseline was taken with ~{rows_then}; "
+                "buffer counts are not comparable."
+            ))
+
+        self.stdout.write(self.style.MIGRATE_HEADING(f"Plans against {path}"))
+        rows = compare_plans(run, baseline, options["tolerance"])
+        changed = 0
+        for name, regressions, shape_changed in rows:
+            if regressions:
+                self.stdout.write(self.style.ERROR(f"  {name}: REGRESSED"))
+                for regression in regressions:
+                    self.stdout.write(self.style.ERROR(f"    {regression}"))
+            elif shape_changed:
+                self.stdout.write(self.style.WARNING(f"  {name}: plan changed"))
+            else:
+                self.stdout.write(f"  {name}: ok")
+            if shape_changed:
+                changed += 1
+                if options["verbosity"] > 1:
+                    before = baseline["queries"][name].get("shape", [])
+                    after = run["queries"][name].get("shape", [])
+                    for line in difflib.unified_diff(before, after, "baseline", "current", lineterm="", n=1):
+                        self.stdout.write(f"    {line}")
+        missing = [name for name in run["queries"] if name not in baseline.get("queries", {})]
+        if missing:
+            self.stdout.write(self.style.WARNING(
+                f"Not in the baseline: {', '.join(missing)} (store them with --update {' '.join(missing)})"
+            ))
+
+        regressions = sum(bool(row[1]) for row in rows)
+        if regressions:
+            raise CommandError(f"{regressions} query plan(s) regressed against the baseline.")
+        if changed and options["strict"]:
+            raise CommandError(f"{changed} query plan(s) changed shape; rerun with -v 2 for the differences.")
+        self.stdout.write(self.style.SUCCESS(f"No regressions in {len(rows)} query plan(s)."))
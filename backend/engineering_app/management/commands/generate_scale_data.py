@@ -0,0 +1,93 @@
+import argparse
+import time
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+
+from engineering_app.scale_data import clear_scale_data, generate_scale_data, main_data_has_rows, parse_count
+
+
+def _count(value):
+    try:
+        return parse_count(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"invalid count {value!r}, expected e.g. 5000000, 250k or 5M") from None
+
+
+def _date(value):
+    try:
+        return date.fromisoformat(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"invalid date {value!r}, expected YYYY-MM-DD") from None
+
+
+class Command(BaseCommand):
+    help = "Load deterministic synthetic main_data, work requests and meter readings for benchmarking."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--work-orders", type=_count, default=1_000_000, help="main_data rows (default: 1M).")
+        parser.add_argument("--years", type=int, default=10, help="Years of history up to --end (default: 10).")
+        parser.add_argument("--assets", type=_count, default=2000, help="Distinct assets (default: 2000).")
+        parser.add_argument(
+            "--work-requests",
+            type=_count,
+            default=None,
+            help="WorkRequest rows (default: 1 per 50 work orders).",
+        )
+        parser.add_argument("--meters", type=int, default=4, help="Meters per energy type (default: 4).")
+        parser.add_argument("--users", type=int, default=50, help="Generated requesters (default: 50).")
+        parser.add_argument(
+            "--skew",
+            type=float,
+            default=1.0,
+            help="Zipf exponent of the failures per asset; 0 spreads them evenly (default: 1.0).",
+        )
+        parser.add_argument("--seed", type=int, default=42, help="Random seed (default: 42).")
+        parser.add_argument(
+            "--end",
+            type=_date,
+            default=None,
+            help="Last day of the history, YYYY-MM-DD (default: today). Fix it to reproduce the same rows later.",
+        )
+        parser.add_argument(
+            "--replace",
+            action="store_true",
+            help="Empty main_data and the daily tables and drop earlier generated rows first.",
+        )
+
+    def handle(self, *args, **options):
+        if options["years"] < 1 or options["assets"] < 1 or options["meters"] < 1 or options["users"] < 1:
+            raise CommandError("--years, --assets, --meters and --users must be at least 1.")
+        if options["replace"]:
+            clear_scale_data()
+        elif main_data_has_rows():
+            raise CommandError("main_data already has rows; pass --replace to empty it first.")
+
+        work_orders = options["work_orders"]
+        work_requests = options["work_requests"]
+        if work_requests is None:
+            work_requests = work_orders // 50
+
+        def progress(table, rows):
+            self.stdout.write(f"  {table}: {rows}/{work_orders}", ending="\r")
+            self.stdout.flush()
+
+        started = time.perf_counter()
+        written = generate_scale_data(
+            work_orders=work_orders,
+            years=options["years"],
+            assets=options["assets"],
+            work_requests=work_requests,
+            meters=options["meters"],
+            users=options["users"],
+            skew=options["skew"],
+            seed=options["seed"],
+            end=options["end"],
+            progress=progress,
+        )
+        self.stdout.write("")
+        self.stdout.write(self.style.SUCCESS(
+            f"Generated scale data (seed {options['seed']}) in {time.perf_counter() - started:.1f} s."
+        ))
+        for table, count in written.items():
+            self.stdout.write(f"  {table}: {count}")
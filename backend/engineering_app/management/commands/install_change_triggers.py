@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+
+from engineering_app.reliability import install_change_triggers
+
+
+class Command(BaseCommand):
+    help = (
+        "Install (or replace) the main_data triggers that log the changed days into main_data_change, "
+        "which the reliability engine reloads incrementally from."
+    )
+
+    def handle(self, *args, **options):
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.execute("SELECT to_regclass('main_data') IS NULL")
+            if cursor.fetchone()[0]:
+                raise CommandError("Cannot install the change triggers: main_data does not exist.")
+            install_change_triggers(cursor)
+        self.stdout.write(self.style.SUCCESS("Installed the main_data_change triggers on main_data."))
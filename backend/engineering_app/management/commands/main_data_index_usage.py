@@ -0,0 +1,93 @@
+from collections import Counter
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from engineering_app.indexes import missing_main_data_indexes
+from engineering_app.plans import analyze_setup, endpoint_queries, explain, plan_root_names, plan_scans
+
+# On a partitioned main_data every index has one child per partition; scans
+# are counted on the children and summed per main_data index.
+MAIN_DATA_INDEXES_SQL = """
+    SELECT c.relname, COALESCE(SUM(s.idx_scan), 0)::bigint
+    FROM pg_index i
+    JOIN pg_class c ON c.oid = i.indexrelid
+    CROSS JOIN LATERAL (
+        SELECT i.indexrelid AS relid
+        UNION
+        SELECT relid FROM pg_partition_tree(i.indexrelid)
+    ) AS t
+    LEFT JOIN pg_stat_user_indexes s ON s.indexrelid = t.relid
+    WHERE i.indrelid = 'main_data'::regclass
+    GROUP BY c.relname
+    ORDER BY c.relname
+"""
+
+
+class Command(BaseCommand):
+    help = "Report which main_data indexes the plan of each dashboard endpoint uses."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "endpoint",
+            nargs="*",
+            help="Only report these endpoints (default: all).",
+        )
+        parser.add_argument(
+            "--analyze",
+            action="store_true",
+            help="Run EXPLAIN ANALYZE instead of EXPLAIN (executes each query).",
+        )
+
+    def handle(self, *args, **options):
+        endpoints = endpoint_queries()
+        names = options["endpoint"] or list(endpoints)
+        unknown = [name for name in names if name not in endpoints]
+        if unknown:
+            self.stderr.write(self.style.ERROR(f"Unknown endpoint(s): {', '.join(unknown)}"))
+            self.stderr.write(f"Known: {', '.join(endpoints)}")
+            return
+
+        setup = analyze_setup() if options["analyze"] else {}
+        used = set()
+        for name in names:
+            sql, params = endpoints[name]
+            plan = explain(sql, params, analyze=options["analyze"], setup=setup.get(name, ()))
+            cost = f"cost={plan['Total Cost']}"
+            if options["analyze"]:
+                cost += f" time={plan['Actual Total Time']}ms"
+            self.stdout.write(self.style.MIGRATE_HEADING(f"{name}  ({cost})"))
+            scans = plan_scans(plan)
+            roots = plan_root_names(plan)
+            # one line per main_data index however many partitions it was scanned in
+            partitions = Counter(
+                (node_type, roots.get(relation, relation), roots.get(index, index))
+                for node_type, relation, index in scans
+            )
+            for (node_type, relation, index), count in partitions.items():
+                if relation not in (None, "main_data") and index is None:
+                    continue
+                used.add(index)
+                where = f" in {count} partitions" if count > 1 else ""
+                if index:
+                    self.stdout.write(
+                        f"  {node_type} using {index}" + (f" on {relation}" if relation else "") + where
+                    )
+                else:
+                    self.stdout.write(self.style.WARNING(f"  {node_type} on {relation}{where}"))
+
+        with connection.cursor() as cursor:
+            cursor.execute(MAIN_DATA_INDEXES_SQL)
+            indexes = cursor.fetchall()
+        if not indexes:
+            self.stdout.write(self.style.WARNING("main_data has no indexes; run `manage.py main_data_indexes`."))
+            return
+        self.stdout.write(self.style.MIGRATE_HEADING("main_data indexes"))
+        for index, scans in indexes:
+            note = "" if index in used else "  (not used by the plans above)"
+            self.stdout.write(f"  {index}: {scans} scans since stats reset{note}")
+        missing = missing_main_data_indexes()
+        if missing:
+            self.stdout.write(self.style.WARNING(
+                f"  missing or not valid yet: {', '.join(missing)}; run `manage.py main_data_indexes`."
+            ))
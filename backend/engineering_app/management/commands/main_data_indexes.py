@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from engineering_app.indexes import MainDataMissing, create_main_data_indexes, missing_main_data_indexes
+
+
+class Command(BaseCommand):
+    help = "Create the main_data indexes the dashboard queries rely on that do not exist yet (CONCURRENTLY)."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--check",
+            action="store_true",
+            help="Only list the missing indexes; exit with an error if there are any.",
+        )
+
+    def handle(self, *args, **options):
+        if options["check"]:
+            missing = missing_main_data_indexes()
+            if missing:
+                raise CommandError(f"main_data is missing {', '.join(missing)}; run `manage.py main_data_indexes`.")
+            self.stdout.write(self.style.SUCCESS("main_data has all its indexes."))
+            return
+        try:
+            created = create_main_data_indexes()
+        except MainDataMissing as exc:
+            raise CommandError(f"Cannot create the main_data indexes: {exc}.") from None
+        self.stdout.write(self.style.SUCCESS(f"Created {len(created)} main_data index(es)."))
+        for name in created:
+            self.stdout.write(f"  {name}")
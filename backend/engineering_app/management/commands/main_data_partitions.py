@@ -0,0 +1,132 @@
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.utils import timezone
+
+from engineering_app.partitions import (
+    UnsupportedUniqueIndex,
+    add_months,
+    convert_main_data,
+    detach_partitions,
+    ensure_partitions,
+    list_partitions,
+    main_data_kind,
+    month_of,
+)
+
+PARTITION_ROWS_SQL = """
+    SELECT c.relname, c.reltuples::bigint
+    FROM pg_inherits i
+    JOIN pg_class c ON c.oid = i.inhrelid
+    WHERE i.inhparent = 'main_data'::regclass
+"""
+
+
+def _month(value):
+    try:
+        year, month = value.split("-")
+        return date(int(year), int(month), 1)
+    except ValueError:
+        raise CommandError(f"Invalid month {value!r}, expected YYYY-MM") from None
+
+
+class Command(BaseCommand):
+    help = "Convert main_data to monthly partitions, create upcoming months and detach old ones."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--convert",
+            action="store_true",
+            help="Rebuild a plain main_data as a partitioned table (locks it while the rows are copied).",
+        )
+        parser.add_argument(
+            "--ensure",
+            action="store_true",
+            help="Create the missing partitions up to --months-ahead and empty the DEFAULT partition.",
+        )
+        parser.add_argument(
+            "--months-ahead",
+            type=int,
+            default=None,
+            help="Months to keep ready after the current one (default: MAIN_DATA_PARTITIONS['MONTHS_AHEAD']).",
+        )
+        detach = parser.add_mutually_exclusive_group()
+        detach.add_argument(
+            "--detach-before",
+            metavar="YYYY-MM",
+            help="Detach the partitions of the months before this one.",
+        )
+        detach.add_argument(
+            "--retain-months",
+            type=int,
+            help="Detach all but the last N months (the current month included).",
+        )
+        parser.add_argument(
+            "--archive-schema",
+            help="Move detached partitions into this schema instead of leaving them next to main_data.",
+        )
+
+    def handle(self, *args, **options):
+        if options["convert"]:
+            try:
+                converted = convert_main_data(options["months_ahead"])
+            except UnsupportedUniqueIndex as exc:
+                raise CommandError(f"Cannot convert main_data: {exc}.") from None
+            if converted is None:
+                self.stdout.write("main_data is missing or already partitioned.")
+            else:
+                count, rekeyed = converted
+                self.stdout.write(self.style.SUCCESS(f"Converted main_data into {count} monthly partitions."))
+                for name in rekeyed:
+                    self.stdout.write(self.style.WARNING(
+                        f"  unique key {name} now includes wo_created_date (required on a partitioned table)"
+                    ))
+
+        if options["ensure"]:
+            ensured = ensure_partitions(options["months_ahead"])
+            if ensured is None:
+                raise CommandError("main_data is not partitioned; run with --convert first.")
+            created, moved = ensured
+            self.stdout.write(self.style.SUCCESS(
+                f"Created {len(created)} partition(s), moved {moved} row(s) out of DEFAULT."
+            ))
+            for name in created:
+                self.stdout.write(f"  {name}")
+
+        before = None
+        if options["detach_before"]:
+            before = _month(options["detach_before"])
+        elif options["retain_months"] is not None:
+            if options["retain_months"] < 1:
+                raise CommandError("--retain-months must be at least 1.")
+            before = add_months(month_of(timezone.now()), 1 - options["retain_months"])
+        if before is not None:
+            detached = detach_partitions(before, options["archive_schema"])
+            where = f" into schema {options['archive_schema']}" if options["archive_schema"] else ""
+            self.stdout.write(self.style.SUCCESS(f"Detached {len(detached)} partition(s){where}."))
+            for name in detached:
+                self.stdout.write(f"  {name}")
+
+        self._report()
+
+    def _report(self):
+        with connection.cursor() as cursor:
+            kind = main_data_kind(cursor)
+            if kind != "p":
+                self.stdout.write(self.style.WARNING(
+                    "main_data does not exist." if kind is None else "main_data is not partitioned."
+                ))
+                return
+            months, default = list_partitions(cursor)
+            cursor.execute(PARTITION_ROWS_SQL)
+            rows = dict(cursor.fetchall())
+        self.stdout.write(self.style.MIGRATE_HEADING("main_data partitions (estimated rows)"))
+        if months:
+            self.stdout.write(f"  {months[0][0]:%Y-%m} .. {months[-1][0]:%Y-%m}: {len(months)} months")
+        for month, name in months:
+            self.stdout.write(f"  {name}: {max(rows.get(name, 0), 0)}")
+        if default is None:
+            self.stdout.write(self.style.WARNING("  no DEFAULT partition; run with --ensure"))
+        else:
+            self.stdout.write(f"  {default} (DEFAULT): {max(rows.get(default, 0), 0)}")
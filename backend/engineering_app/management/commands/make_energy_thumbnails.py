@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand
+
+from engineering_app.energy_photos import executor, schedule_thumbnail
+from engineering_app.models import EnergyInput
+
+
+class Command(BaseCommand):
+    help = "Make the thumbnails of EnergyInput photos that do not have one yet."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--all",
+            action="store_true",
+            help="Remake every thumbnail, not only the missing ones.",
+        )
+
+    def handle(self, *args, **options):
+        entries = EnergyInput.objects.exclude(photo="").exclude(photo__isnull=True)
+        if not options["all"]:
+            entries = entries.filter(thumbnail__isnull=True)
+        pks = list(entries.values_list("pk", flat=True))
+        for future in [schedule_thumbnail(pk) for pk in pks]:
+            future.result()
+        executor.shutdown()
+        made = EnergyInput.objects.filter(pk__in=pks, thumbnail__isnull=False).count()
+        self.stdout.write(self.style.SUCCESS(f"Made {made} of {len(pks)} thumbnail(s)."))
+        if made < len(pks):
+            self.stdout.write(self.style.WARNING(f"  {len(pks) - made} photo(s) could not be read; see the log."))
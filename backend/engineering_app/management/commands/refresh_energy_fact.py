@@ -0,0 +1,33 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from engineering_app.energy_fact import EnergyTablesMissing, refresh_energy_daily_fact, untracked_energy_tables
+
+
+class Command(BaseCommand):
+    help = "Refresh energy_daily_fact for the dates written to the *_daily tables since the last refresh."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--full",
+            action="store_true",
+            help="Rebuild the whole fact table instead of only the dirty dates, "
+                 "installing the triggers that mark them dirty.",
+        )
+
+    def handle(self, *args, **options):
+        try:
+            dates = refresh_energy_daily_fact(full=options["full"])
+        except EnergyTablesMissing as exc:
+            raise CommandError(f"Cannot rebuild energy_daily_fact: {exc}.") from None
+        if dates is None:
+            self.stdout.write(self.style.SUCCESS(
+                "Rebuilt energy_daily_fact from the *_daily tables and installed their dirty-day triggers."
+            ))
+            return
+        self.stdout.write(self.style.SUCCESS(f"Refreshed {dates} dirty date(s)."))
+        untracked = untracked_energy_tables()
+        if untracked:
+            self.stdout.write(self.style.WARNING(
+                f"energy_daily_fact does not follow {', '.join(untracked)}: the table or its dirty-day triggers "
+                "are missing. Create the tables and run `manage.py refresh_energy_fact --full`."
+            ))
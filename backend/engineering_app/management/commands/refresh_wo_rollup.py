@@ -0,0 +1,33 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from engineering_app.rollups import MainDataMissing, missing_rollup_triggers, refresh_weekly_status_rollup
+
+
+class Command(BaseCommand):
+    help = "Refresh wo_weekly_status_rollup for the weeks touched in main_data since the last refresh."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--full",
+            action="store_true",
+            help="Rebuild the whole rollup from main_data instead of only the dirty weeks, "
+                 "installing the triggers that mark them dirty.",
+        )
+
+    def handle(self, *args, **options):
+        try:
+            days = refresh_weekly_status_rollup(full=options["full"])
+        except MainDataMissing as exc:
+            raise CommandError(f"Cannot rebuild wo_weekly_status_rollup: {exc}.") from None
+        if days is None:
+            self.stdout.write(self.style.SUCCESS(
+                "Rebuilt wo_weekly_status_rollup from main_data and installed its dirty-day triggers."
+            ))
+            return
+        self.stdout.write(self.style.SUCCESS(f"Refreshed weeks for {days} dirty day(s)."))
+        missing = missing_rollup_triggers()
+        if missing:
+            self.stdout.write(self.style.WARNING(
+                f"wo_weekly_status_rollup does not follow main_data: {', '.join(missing)} missing. "
+                "Run `manage.py refresh_wo_rollup --full` to install them."
+            ))
@@ -0,0 +1,100 @@
+# Generated by Django 5.2.4 on 2026-10-18 19:30
+
+from django.db import migrations, models
+
+
+# main_data is loaded by the CMMS ingest, not by Django, so the triggers and the
+# initial backfill are only installed when the table is already there; otherwise
+# `manage.py refresh_wo_rollup --full` installs them once it exists.
+INSTALL_DIRTY_TRIGGERS = """
+CREATE OR REPLACE FUNCTION wo_rollup_mark_dirty() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+        INSERT INTO wo_rollup_dirty_day (day)
+        SELECT DISTINCT wo_created_date::date FROM new_rows WHERE wo_created_date IS NOT NULL
+        ON CONFLICT DO NOTHING;
+    END IF;
+    IF TG_OP IN ('UPDATE', 'DELETE') THEN
+        INSERT INTO wo_rollup_dirty_day (day)
+        SELECT DISTINCT wo_created_date::date FROM old_rows WHERE wo_created_date IS NOT NULL
+        ON CONFLICT DO NOTHING;
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DO $$
+BEGIN
+    IF to_regclass('main_data') IS NOT NULL THEN
+        CREATE OR REPLACE TRIGGER main_data_rollup_insert AFTER INSERT ON main_data
+            REFERENCING NEW TABLE AS new_rows
+            FOR EACH STATEMENT EXECUTE FUNCTION wo_rollup_mark_dirty();
+        CREATE OR REPLACE TRIGGER main_data_rollup_update AFTER UPDATE ON main_data
+            REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+            FOR EACH STATEMENT EXECUTE FUNCTION wo_rollup_mark_dirty();
+        CREATE OR REPLACE TRIGGER main_data_rollup_delete AFTER DELETE ON main_data
+            REFERENCING OLD TABLE AS old_rows
+            FOR EACH STATEMENT EXECUTE FUNCTION wo_rollup_mark_dirty();
+
+        INSERT INTO wo_weekly_status_rollup (year, month, week_of_month, wo_status, wo_count)
+        SELECT
+            EXTRACT(YEAR FROM wo_created_date)::INT,
+            EXTRACT(MONTH FROM wo_created_date)::INT,
+            (FLOOR((EXTRACT(DAY FROM wo_created_date) - 1) / 7) + 1)::INT,
+            wo_status,
+            COUNT(*)
+        FROM main_data
+        WHERE wo_created_date IS NOT NULL AND wo_status IS NOT NULL
+        GROUP BY 1, 2, 3, 4;
+    END IF;
+END;
+$$;
+"""
+
+DROP_DIRTY_TRIGGERS = """
+DO $$
+BEGIN
+    IF to_regclass('main_data') IS NOT NULL THEN
+        DROP TRIGGER IF EXISTS main_data_rollup_insert ON main_data;
+        DROP TRIGGER IF EXISTS main_data_rollup_update ON main_data;
+        DROP TRIGGER IF EXISTS main_data_rollup_delete ON main_data;
+    END IF;
+END;
+$$;
+DROP FUNCTION IF EXISTS wo_rollup_mark_dirty();
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('engineering_app', '0010_remove_document_status'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='WoRollupDirtyDay',
+            fields=[
+                ('day', models.DateField(primary_key=True, serialize=False)),
+            ],
+            options={
+                'db_table': 'wo_rollup_dirty_day',
+            },
+        ),
+        migrations.CreateModel(
+            name='WoWeeklyStatusRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('year', models.IntegerField()),
+                ('month', models.IntegerField()),
+                ('week_of_month', models.IntegerField()),
+                ('wo_status', models.CharField(max_length=50)),
+                ('wo_count', models.IntegerField()),
+            ],
+            options={
+                'db_table': 'wo_weekly_status_rollup',
+                'constraints': [models.UniqueConstraint(fields=('year', 'month', 'week_of_month', 'wo_status'), name='wo_weekly_status_rollup_key')],
+            },
+        ),
+        migrations.RunSQL(INSTALL_DIRTY_TRIGGERS, DROP_DIRTY_TRIGGERS),
+    ]
@@ -0,0 +1,42 @@
+# Generated by Django 5.2.4 on 2026-10-18 19:39
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('engineering_app', '0011_wo_weekly_status_rollup'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MainData',
+            fields=[
+                ('no', models.IntegerField(primary_key=True, serialize=False)),
+                ('title', models.CharField(max_length=255, null=True)),
+                ('wo_description', models.TextField(null=True)),
+                ('wo_status', models.CharField(max_length=50, null=True)),
+                ('wo_type', models.CharField(max_length=50, null=True)),
+                ('resource', models.CharField(max_length=100, null=True)),
+                ('wr_number', models.CharField(max_length=50, null=True)),
+                ('wr_type', models.CharField(max_length=50, null=True)),
+                ('wr_requestor', models.CharField(max_length=100, null=True)),
+                ('wr_request_by_date', models.DateTimeField(null=True)),
+                ('wo_created_date', models.DateTimeField(null=True)),
+                ('wo_scheduled_start_date', models.DateTimeField(null=True)),
+                ('wo_scheduled_completion_date', models.DateTimeField(null=True)),
+                ('wo_actual_start_date', models.DateTimeField(null=True)),
+                ('wo_actual_completion_date', models.DateTimeField(null=True)),
+                ('actual_failure_date', models.DateTimeField(null=True)),
+                ('actual_duration', models.DurationField(null=True)),
+                ('no_asset_of_wo', models.CharField(max_length=100, null=True)),
+                ('asset_group', models.CharField(max_length=100, null=True)),
+                ('department', models.CharField(max_length=100, null=True)),
+            ],
+            options={
+                'db_table': 'main_data',
+                'managed': False,
+            },
+        ),
+    ]
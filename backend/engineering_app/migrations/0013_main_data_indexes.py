@@ -0,0 +1,82 @@
+# Generated by Django 5.2.4 on 2026-10-18 19:45
+
+from django.db import migrations
+
+
+# main_data is unmanaged, so Meta.indexes / AddIndex would be no-ops; the index
+# set is created here with raw SQL instead. Each index follows the access path
+# of the queries noted next to it (see `manage.py main_data_index_usage`).
+# Nothing is created when main_data does not exist yet: `manage.py
+# main_data_indexes` creates the set (kept in engineering_app.indexes) once
+# the ingest has loaded it.
+MAIN_DATA_INDEXES = [
+    # work-order-list: ORDER BY wo_created_date DESC with the (wo_created_date, no)
+    # keyset; rollup refresh: wo_created_date ranges of the touched weeks
+    ("main_data_wo_created_no_idx",
+     "(wo_created_date, no)"),
+    # work-order-counts?source=live: wo_status = ANY(...) per week of wo_created_date
+    ("main_data_status_created_idx",
+     "(wo_status, wo_created_date) WHERE wo_created_date IS NOT NULL"),
+    # work-request list: ORDER BY wr_request_by_date DESC with the (wr_request_by_date, wr_number) keyset
+    ("main_data_wr_request_by_idx",
+     "(wr_request_by_date, wr_number) WHERE wr_request_by_date IS NOT NULL"),
+    # analytics and monthly-trend MTBF: failures in actual_failure_date order,
+    # analytics also groups them per asset
+    ("main_data_failure_date_idx",
+     "(actual_failure_date) INCLUDE (no_asset_of_wo) WHERE actual_failure_date IS NOT NULL"),
+    # category-analytics MTBF: LAG(...) OVER (PARTITION BY resource ORDER BY actual_failure_date)
+    ("main_data_resource_failure_idx",
+     "(resource, actual_failure_date) WHERE actual_failure_date IS NOT NULL"),
+    # equipment-analytics MTBF and failure counts: the same window per asset_group
+    ("main_data_asset_group_failure_idx",
+     "(asset_group, actual_failure_date) WHERE actual_failure_date IS NOT NULL"),
+    # monthly-trend, category- and equipment-analytics MTTR: completed work orders,
+    # index-only with the grouping columns included
+    ("main_data_actual_start_idx",
+     "(wo_actual_start_date) INCLUDE (wo_actual_completion_date, resource, asset_group) "
+     "WHERE wo_actual_start_date IS NOT NULL AND wo_actual_completion_date IS NOT NULL"),
+    # analytics MTTR: scheduled duration per day
+    ("main_data_scheduled_start_idx",
+     "(wo_scheduled_start_date) INCLUDE (wo_scheduled_completion_date) "
+     "WHERE wo_scheduled_start_date IS NOT NULL AND wo_scheduled_completion_date IS NOT NULL"),
+    # category-analytics work order count per resource
+    ("main_data_resource_idx",
+     "(resource)"),
+]
+
+
+def main_data_exists(connection):
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT to_regclass('main_data') IS NOT NULL")
+        return cursor.fetchone()[0]
+
+
+def create_indexes(apps, schema_editor):
+    # CONCURRENTLY keeps main_data writable while the indexes build; that is
+    # why this migration is not atomic.
+    connection = schema_editor.connection
+    if not main_data_exists(connection):
+        return
+    with connection.cursor() as cursor:
+        for name, definition in MAIN_DATA_INDEXES:
+            cursor.execute(f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {name} ON main_data {definition}")
+        cursor.execute("ANALYZE main_data")
+
+
+def drop_indexes(apps, schema_editor):
+    with schema_editor.connection.cursor() as cursor:
+        for name, _ in MAIN_DATA_INDEXES:
+            cursor.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {name}")
+
+
+class Migration(migrations.Migration):
+
+    atomic = False
+
+    dependencies = [
+        ('engineering_app', '0012_maindata'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_indexes, drop_indexes),
+    ]
@@ -0,0 +1,83 @@
+# Generated by Django 5.2.4 on 2026-10-18 20:05
+
+from django.db import migrations, models
+
+
+# Like the rollup triggers of 0011, only installed when main_data exists;
+# otherwise `manage.py install_change_triggers` installs them once it does.
+# TRUNCATE has no transition table and logs a NULL day (full reload).
+INSTALL_CHANGE_TRIGGERS = """
+CREATE OR REPLACE FUNCTION main_data_log_change() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP = 'TRUNCATE' THEN
+        INSERT INTO main_data_change (xid, day, changed_at)
+        VALUES (pg_current_xact_id()::text::bigint, NULL, now());
+        RETURN NULL;
+    END IF;
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+        INSERT INTO main_data_change (xid, day, changed_at)
+        SELECT DISTINCT pg_current_xact_id()::text::bigint, wo_created_date::date, now() FROM new_rows;
+    END IF;
+    IF TG_OP IN ('UPDATE', 'DELETE') THEN
+        INSERT INTO main_data_change (xid, day, changed_at)
+        SELECT DISTINCT pg_current_xact_id()::text::bigint, wo_created_date::date, now() FROM old_rows;
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DO $$
+BEGIN
+    IF to_regclass('main_data') IS NOT NULL THEN
+        CREATE OR REPLACE TRIGGER main_data_change_insert AFTER INSERT ON main_data
+            REFERENCING NEW TABLE AS new_rows
+            FOR EACH STATEMENT EXECUTE FUNCTION main_data_log_change();
+        CREATE OR REPLACE TRIGGER main_data_change_update AFTER UPDATE ON main_data
+            REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+            FOR EACH STATEMENT EXECUTE FUNCTION main_data_log_change();
+        CREATE OR REPLACE TRIGGER main_data_change_delete AFTER DELETE ON main_data
+            REFERENCING OLD TABLE AS old_rows
+            FOR EACH STATEMENT EXECUTE FUNCTION main_data_log_change();
+        CREATE OR REPLACE TRIGGER main_data_change_truncate AFTER TRUNCATE ON main_data
+            FOR EACH STATEMENT EXECUTE FUNCTION main_data_log_change();
+    END IF;
+END;
+$$;
+"""
+
+DROP_CHANGE_TRIGGERS = """
+DO $$
+BEGIN
+    IF to_regclass('main_data') IS NOT NULL THEN
+        DROP TRIGGER IF EXISTS main_data_change_insert ON main_data;
+        DROP TRIGGER IF EXISTS main_data_change_update ON main_data;
+        DROP TRIGGER IF EXISTS main_data_change_delete ON main_data;
+        DROP TRIGGER IF EXISTS main_data_change_truncate ON main_data;
+    END IF;
+END;
+$$;
+DROP FUNCTION IF EXISTS main_data_log_change();
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('engineering_app', '0013_main_data_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MainDataChange',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('xid', models.BigIntegerField(db_index=True)),
+                ('day', models.DateField(null=True)),
+                ('changed_at', models.DateTimeField(db_index=True)),
+            ],
+            options={
+                'db_table': 'main_data_change',
+            },
+        ),
+        migrations.RunSQL(INSTALL_CHANGE_TRIGGERS, DROP_CHANGE_TRIGGERS),
+    ]
@@ -0,0 +1,157 @@
+# Generated by Django 5.2.4 on 2026-10-18 21:10
+
+from datetime import date, datetime, timezone
+
+from django.db import migrations
+
+
+# main_data becomes range-partitioned by month of wo_created_date, one
+# partition per month named main_data_pYYYY_MM plus a DEFAULT partition (see
+# engineering_app.partitions). The SQL is kept here so the migration does not
+# change with that module. Only an empty main_data is converted: copying the
+# rows locks the table for as long as it takes, so a loaded one has to be
+# converted with `manage.py main_data_partitions --convert` beforehand.
+MONTHS_AHEAD = 3
+
+RELKIND_SQL = "SELECT relkind FROM pg_class WHERE oid = to_regclass('main_data')"
+
+INDEX_DEFINITIONS_SQL = """
+    SELECT c.relname, pg_get_indexdef(i.indexrelid), i.indisunique
+    FROM pg_index i
+    JOIN pg_class c ON c.oid = i.indexrelid
+    WHERE i.indrelid = 'main_data'::regclass
+    ORDER BY c.relname
+"""
+
+UNIQUE_INDEXES_SQL = """
+    SELECT
+        c.relname,
+        con.contype,
+        i.indexprs IS NOT NULL OR i.indpred IS NOT NULL,
+        ARRAY(
+            SELECT a.attname FROM unnest(i.indkey::int2[]) WITH ORDINALITY AS k(attnum, n)
+            JOIN pg_attribute a ON a.attrelid = i.indrelid AND a.attnum = k.attnum
+            WHERE k.n <= i.indnkeyatts ORDER BY k.n
+        ),
+        ARRAY(
+            SELECT a.attname FROM unnest(i.indkey::int2[]) WITH ORDINALITY AS k(attnum, n)
+            JOIN pg_attribute a ON a.attrelid = i.indrelid AND a.attnum = k.attnum
+            WHERE k.n > i.indnkeyatts ORDER BY k.n
+        )
+    FROM pg_index i
+    JOIN pg_class c ON c.oid = i.indexrelid
+    LEFT JOIN pg_constraint con ON con.conindid = i.indexrelid AND con.conrelid = i.indrelid
+    WHERE i.indrelid = 'main_data'::regclass AND i.indisunique
+    ORDER BY c.relname
+"""
+
+TRIGGER_DEFINITIONS_SQL = """
+    SELECT pg_get_triggerdef(oid)
+    FROM pg_trigger
+    WHERE tgrelid = 'main_data'::regclass AND NOT tgisinternal
+    ORDER BY tgname
+"""
+
+OWNED_SEQUENCES_SQL = """
+    SELECT attname, pg_get_serial_sequence('main_data_unpartitioned', attname)
+    FROM pg_attribute
+    WHERE attrelid = 'main_data_unpartitioned'::regclass AND attnum > 0 AND NOT attisdropped
+"""
+
+CREATE_PARENT_SQL = """
+    CREATE TABLE main_data (LIKE main_data_unpartitioned INCLUDING DEFAULTS INCLUDING CONSTRAINTS
+    INCLUDING GENERATED INCLUDING STORAGE INCLUDING COMMENTS)
+    PARTITION BY RANGE (wo_created_date)
+"""
+
+NOT_EMPTY = (
+    "main_data holds rows and is not partitioned yet. Converting it copies every row under an "
+    "exclusive lock, so it is not done by migrate: run `python manage.py main_data_partitions --convert` "
+    "in a maintenance window, then migrate again."
+)
+
+
+def unique_sql(connection, name, contype, keys, include):
+    # a unique key on the partitioned table has to include wo_created_date; a
+    # primary key becomes a UNIQUE constraint as the column is nullable, with
+    # NULLS NOT DISTINCT (postgres 15+) for the rows without a date
+    quote = connection.ops.quote_name
+    columns = ", ".join(quote(column) for column in keys + ["wo_created_date"] * ("wo_created_date" not in keys))
+    nulls = " NULLS NOT DISTINCT" if connection.pg_version >= 150000 else ""
+    including = f" INCLUDE ({', '.join(quote(column) for column in include)})" if include else ""
+    if contype in ("p", "u"):
+        return f"ALTER TABLE main_data ADD CONSTRAINT {quote(name)} UNIQUE{nulls} ({columns}){including}"
+    return f"CREATE UNIQUE INDEX {quote(name)} ON main_data ({columns}){including}{nulls}"
+
+
+def add_months(month, count):
+    index = month.year * 12 + month.month - 1 + count
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def bound(month):
+    # partitions split at UTC midnight, the session time zone of the app
+    return f"'{month:%Y-%m-%d} 00:00:00+00'"
+
+
+def partition_main_data(apps, schema_editor):
+    connection = schema_editor.connection
+    with connection.cursor() as cursor:
+        cursor.execute(RELKIND_SQL)
+        row = cursor.fetchone()
+        if row is None or row[0] != "r":
+            return
+        cursor.execute("LOCK TABLE main_data IN ACCESS EXCLUSIVE MODE")
+        cursor.execute("SELECT EXISTS (SELECT 1 FROM main_data)")
+        if cursor.fetchone()[0]:
+            raise RuntimeError(NOT_EMPTY)
+        cursor.execute(UNIQUE_INDEXES_SQL)
+        unique = {}
+        for name, contype, complex_, keys, include in cursor.fetchall():
+            if complex_:
+                raise RuntimeError(
+                    f"main_data has the expression or partial unique index {name}, which cannot be recreated "
+                    "with wo_created_date on the partitioned table; drop or replace it, then migrate again."
+                )
+            unique[name] = unique_sql(connection, name, contype, keys, include)
+        cursor.execute(INDEX_DEFINITIONS_SQL)
+        indexes = cursor.fetchall()
+        cursor.execute(TRIGGER_DEFINITIONS_SQL)
+        triggers = [row[0] for row in cursor.fetchall()]
+
+        cursor.execute("ALTER TABLE main_data RENAME TO main_data_unpartitioned")
+        cursor.execute(CREATE_PARENT_SQL)
+        now = datetime.now(timezone.utc)
+        this_month = date(now.year, now.month, 1)
+        for month in (add_months(this_month, i) for i in range(MONTHS_AHEAD + 1)):
+            cursor.execute(
+                f"CREATE TABLE main_data_p{month:%Y_%m} PARTITION OF main_data "
+                f"FOR VALUES FROM ({bound(month)}) TO ({bound(add_months(month, 1))})"
+            )
+        cursor.execute("CREATE TABLE main_data_pdefault PARTITION OF main_data DEFAULT")
+
+        cursor.execute(OWNED_SEQUENCES_SQL)
+        for column, sequence in cursor.fetchall():
+            if sequence:
+                cursor.execute(f"ALTER SEQUENCE {sequence} OWNED BY main_data.{column}")
+        cursor.execute("DROP TABLE main_data_unpartitioned")
+
+        for name, definition, _ in indexes:
+            if name in unique:
+                print(f"\n  unique key {name} on main_data now includes wo_created_date.")
+            cursor.execute(unique.get(name, definition))
+        for definition in triggers:
+            cursor.execute(definition)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('engineering_app', '0014_main_data_change'),
+    ]
+
+    operations = [
+        # converting back would mean copying every row again; the partitioned
+        # table serves the same queries, so reversing leaves it in place
+        migrations.RunPython(partition_main_data, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,149 @@
+# Generated by Django 5.2.4 on 2026-10-18 19:55
+
+from django.db import migrations, models
+
+
+# numeric without a scale, like the daily_consumption columns it is built from.
+# The *_daily tables are loaded outside Django, so the triggers and the
+# backfill are only installed when all three are already there; otherwise
+# `manage.py refresh_energy_fact --full` installs them once the tables exist.
+CREATE_FACT_TABLE = """
+CREATE TABLE energy_daily_fact (
+    date date PRIMARY KEY,
+    water_consumption numeric,
+    cng_consumption numeric,
+    electricity_consumption numeric,
+    year smallint NOT NULL,
+    month smallint NOT NULL,
+    week_of_month smallint NOT NULL,
+    day smallint NOT NULL,
+    month_name varchar(10) NOT NULL,
+    day_name varchar(3) NOT NULL
+);
+"""
+
+INSTALL_DIRTY_TRIGGERS = """
+CREATE OR REPLACE FUNCTION energy_fact_mark_dirty() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+        INSERT INTO energy_fact_dirty_day (date)
+        SELECT DISTINCT date FROM new_rows
+        ON CONFLICT DO NOTHING;
+    END IF;
+    IF TG_OP IN ('UPDATE', 'DELETE') THEN
+        INSERT INTO energy_fact_dirty_day (date)
+        SELECT DISTINCT date FROM old_rows
+        ON CONFLICT DO NOTHING;
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DO $$
+DECLARE
+    source text;
+BEGIN
+    IF to_regclass('water_daily') IS NULL
+       OR to_regclass('cng_daily') IS NULL
+       OR to_regclass('electricity_daily') IS NULL THEN
+        RETURN;
+    END IF;
+    FOREACH source IN ARRAY ARRAY['water_daily', 'cng_daily', 'electricity_daily'] LOOP
+        EXECUTE format(
+            'CREATE OR REPLACE TRIGGER %1$s_fact_insert AFTER INSERT ON %1$s
+                 REFERENCING NEW TABLE AS new_rows
+                 FOR EACH STATEMENT EXECUTE FUNCTION energy_fact_mark_dirty()', source);
+        EXECUTE format(
+            'CREATE OR REPLACE TRIGGER %1$s_fact_update AFTER UPDATE ON %1$s
+                 REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+                 FOR EACH STATEMENT EXECUTE FUNCTION energy_fact_mark_dirty()', source);
+        EXECUTE format(
+            'CREATE OR REPLACE TRIGGER %1$s_fact_delete AFTER DELETE ON %1$s
+                 REFERENCING OLD TABLE AS old_rows
+                 FOR EACH STATEMENT EXECUTE FUNCTION energy_fact_mark_dirty()', source);
+    END LOOP;
+
+    INSERT INTO energy_daily_fact
+    SELECT
+        a.date,
+        a.daily_consumption * 100,
+        b.daily_consumption,
+        c.daily_consumption,
+        EXTRACT(YEAR FROM a.date),
+        EXTRACT(MONTH FROM a.date),
+        FLOOR((EXTRACT(DAY FROM a.date) - 1) / 7) + 1,
+        EXTRACT(DAY FROM a.date),
+        TO_CHAR(a.date, 'FMMonth'),
+        CASE TO_CHAR(a.date, 'DY')
+            WHEN 'MON' THEN 'Sen'
+            WHEN 'TUE' THEN 'Sel'
+            WHEN 'WED' THEN 'Rab'
+            WHEN 'THU' THEN 'Kam'
+            WHEN 'FRI' THEN 'Jum'
+            WHEN 'SAT' THEN 'Sab'
+            WHEN 'SUN' THEN 'Min'
+            ELSE TO_CHAR(a.date, 'DY')
+        END
+    FROM water_daily a
+    LEFT JOIN cng_daily b ON a.date = b.date
+    LEFT JOIN electricity_daily c ON a.date = c.date;
+END;
+$$;
+"""
+
+DROP_DIRTY_TRIGGERS = """
+DO $$
+DECLARE
+    source text;
+BEGIN
+    FOREACH source IN ARRAY ARRAY['water_daily', 'cng_daily', 'electricity_daily'] LOOP
+        IF to_regclass(source) IS NOT NULL THEN
+            EXECUTE format('DROP TRIGGER IF EXISTS %1$s_fact_insert ON %1$s', source);
+            EXECUTE format('DROP TRIGGER IF EXISTS %1$s_fact_update ON %1$s', source);
+            EXECUTE format('DROP TRIGGER IF EXISTS %1$s_fact_delete ON %1$s', source);
+        END IF;
+    END LOOP;
+END;
+$$;
+DROP FUNCTION IF EXISTS energy_fact_mark_dirty();
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('engineering_app', '0015_partition_main_data'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EnergyDailyFact',
+            fields=[
+                ('date', models.DateField(primary_key=True, serialize=False)),
+                ('water_consumption', models.DecimalField(decimal_places=6, max_digits=20, null=True)),
+                ('cng_consumption', models.DecimalField(decimal_places=6, max_digits=20, null=True)),
+                ('electricity_consumption', models.DecimalField(decimal_places=6, max_digits=20, null=True)),
+                ('year', models.SmallIntegerField()),
+                ('month', models.SmallIntegerField()),
+                ('week_of_month', models.SmallIntegerField()),
+                ('day', models.SmallIntegerField()),
+                ('month_name', models.CharField(max_length=10)),
+                ('day_name', models.CharField(max_length=3)),
+            ],
+            options={
+                'db_table': 'energy_daily_fact',
+                'managed': False,
+            },
+        ),
+        migrations.CreateModel(
+            name='EnergyFactDirtyDay',
+            fields=[
+                ('date', models.DateField(primary_key=True, serialize=False)),
+            ],
+            options={
+                'db_table': 'energy_fact_dirty_day',
+            },
+        ),
+        migrations.RunSQL(CREATE_FACT_TABLE, "DROP TABLE energy_daily_fact"),
+        migrations.RunSQL(INSTALL_DIRTY_TRIGGERS, DROP_DIRTY_TRIGGERS),
+    ]
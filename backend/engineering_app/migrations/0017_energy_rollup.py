@@ -0,0 +1,51 @@
+# Generated by Django 5.2.4 on 2026-10-18 19:57
+
+from django.db import migrations, models
+
+
+# Initial fill from energy_daily_fact; later writes are rolled up by
+# engineering_app.energy_fact.refresh_energy_rollup.
+BACKFILL_ROLLUP = """
+INSERT INTO energy_rollup (grain, period_start, utility, total, average, minimum, maximum, days)
+SELECT g.grain, date_trunc(g.grain, f.date::timestamp)::date, u.utility,
+       SUM(u.value), AVG(u.value), MIN(u.value), MAX(u.value), COUNT(u.value)
+FROM energy_daily_fact f
+CROSS JOIN unnest(ARRAY['day', 'week', 'month', 'year']) AS g(grain)
+CROSS JOIN LATERAL (
+    VALUES
+        ('water', f.water_consumption),
+        ('cng', f.cng_consumption),
+        ('electricity', f.electricity_consumption)
+) AS u(utility, value)
+GROUP BY 1, 2, 3
+HAVING COUNT(u.value) > 0;
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('engineering_app', '0016_energy_daily_fact'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EnergyRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('grain', models.CharField(max_length=5)),
+                ('period_start', models.DateField()),
+                ('utility', models.CharField(max_length=12)),
+                ('total', models.FloatField()),
+                ('average', models.FloatField()),
+                ('minimum', models.FloatField()),
+                ('maximum', models.FloatField()),
+                ('days', models.IntegerField()),
+            ],
+            options={
+                'db_table': 'energy_rollup',
+                'constraints': [models.UniqueConstraint(fields=('grain', 'period_start', 'utility'), name='energy_rollup_key')],
+            },
+        ),
+        migrations.RunSQL(BACKFILL_ROLLUP, migrations.RunSQL.noop),
+    ]
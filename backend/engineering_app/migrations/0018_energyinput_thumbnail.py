@@ -0,0 +1,18 @@
+# Generated by Django 5.2.4 on 2026-10-18 20:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('engineering_app', '0017_energy_rollup'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='energyinput',
+            name='thumbnail',
+            field=models.ImageField(blank=True, editable=False, null=True, upload_to='energy_photos/'),
+        ),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 5.2.4 on 2026-10-18 20:04
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('engineering_app', '0018_energyinput_thumbnail'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='energyinput',
+            index=models.Index(fields=['created_at'], name='energy_input_created'),
+        ),
+        migrations.AddIndex(
+            model_name='energyinput',
+            index=models.Index(fields=['user', 'created_at'], name='energy_input_user_created'),
+        ),
+        migrations.AddIndex(
+            model_name='energyinput',
+            index=models.Index(fields=['meter_number', 'date'], name='energy_input_meter_date'),
+        ),
+    ]
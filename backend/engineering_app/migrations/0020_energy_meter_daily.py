@@ -0,0 +1,38 @@
+# Generated by Django 5.2.4 on 2026-10-18 20:11
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('engineering_app', '0019_energy_input_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AggregationWatermark',
+            fields=[
+                ('name', models.CharField(max_length=50, primary_key=True, serialize=False)),
+                ('value', models.DateTimeField()),
+            ],
+            options={
+                'db_table': 'aggregation_watermark',
+            },
+        ),
+        migrations.CreateModel(
+            name='EnergyMeterDaily',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('type', models.CharField(max_length=10)),
+                ('meter_number', models.CharField(max_length=100)),
+                ('date', models.DateField()),
+                ('consumption', models.DecimalField(decimal_places=6, max_digits=20)),
+            ],
+            options={
+                'db_table': 'energy_meter_daily',
+                'indexes': [models.Index(fields=['type', 'date'], name='energy_meter_daily_type_date')],
+                'constraints': [models.UniqueConstraint(fields=('type', 'meter_number', 'date'), name='energy_meter_daily_key')],
+            },
+        ),
+    ]
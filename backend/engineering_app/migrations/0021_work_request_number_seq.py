@@ -0,0 +1,21 @@
+# Generated by Django 5.2.4 on 2026-10-18 20:20
+
+from django.db import migrations
+
+
+# Source of WorkRequest.wr_number (engineering_app/wr_numbers.py). The random
+# WR-XXXXXX numbers already stored are six characters long and cannot clash
+# with the zero-padded ones it produces.
+CREATE_SEQUENCE = "CREATE SEQUENCE IF NOT EXISTS work_request_number_seq START 1"
+DROP_SEQUENCE = "DROP SEQUENCE IF EXISTS work_request_number_seq"
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('engineering_app', '0020_energy_meter_daily'),
+    ]
+
+    operations = [
+        migrations.RunSQL(CREATE_SEQUENCE, DROP_SEQUENCE),
+    ]
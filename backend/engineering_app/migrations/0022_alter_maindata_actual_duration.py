@@ -0,0 +1,20 @@
+# Generated by Django 5.2.4 on 2026-10-18 21:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    # main_data is unmanaged: this only brings the migration state in line
+    # with MainData.actual_duration, which holds seconds, not an interval.
+
+    dependencies = [
+        ('engineering_app', '0021_work_request_number_seq'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='maindata',
+            name='actual_duration',
+            field=models.FloatField(null=True),
+        ),
+    ]
@@ -0,0 +1,52 @@
+# Generated by Django 5.2.4 on 2026-10-18 23:10
+
+from django.db import migrations
+
+
+# The work-request list pages on (wr_request_by_date, no) instead of
+# (wr_request_by_date, wr_number), which is neither unique nor non-null, so
+# its index follows. Nothing happens when main_data does not exist yet;
+# `manage.py main_data_indexes` creates the set once it does.
+NEW_INDEX = ("main_data_wr_request_by_no_idx", "(wr_request_by_date, no) WHERE wr_request_by_date IS NOT NULL")
+OLD_INDEX = ("main_data_wr_request_by_idx", "(wr_request_by_date, wr_number) WHERE wr_request_by_date IS NOT NULL")
+
+
+def main_data_kind(connection):
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT relkind FROM pg_class WHERE oid = to_regclass('main_data')")
+        row = cursor.fetchone()
+        return row[0] if row else None
+
+
+def swap_index(schema_editor, new, old):
+    # CONCURRENTLY keeps a plain main_data writable while the index builds;
+    # that is why this migration is not atomic. A partitioned main_data takes
+    # the plain statements, as CONCURRENTLY does not apply to it.
+    kind = main_data_kind(schema_editor.connection)
+    if kind is None:
+        return
+    concurrently = "" if kind == "p" else " CONCURRENTLY"
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute(f"CREATE INDEX{concurrently} IF NOT EXISTS {new[0]} ON main_data {new[1]}")
+        cursor.execute(f"DROP INDEX{concurrently} IF EXISTS {old[0]}")
+
+
+def use_no(apps, schema_editor):
+    swap_index(schema_editor, NEW_INDEX, OLD_INDEX)
+
+
+def use_wr_number(apps, schema_editor):
+    swap_index(schema_editor, OLD_INDEX, NEW_INDEX)
+
+
+class Migration(migrations.Migration):
+
+    atomic = False
+
+    dependencies = [
+        ('engineering_app', '0022_alter_maindata_actual_duration'),
+    ]
+
+    operations = [
+        migrations.RunPython(use_no, use_wr_number),
+    ]
@@ -2,6 +2,8 @@ from django.contrib.auth.models import User
 from django.db import models
 import uuid
 
+from .wr_numbers import allocate_wr_number
+
 class UserProfile(models.Model):
     ROLE_CHOICES = [
         ('admin', 'Admin'),
@@ -162,7 +164,7 @@ class WorkRequest(models.Model):
 
     def save(self, *args, **kwargs):
         if not self.wr_number:
-            self.wr_number = f"WR-{uuid.uuid4().hex[:6].upper()}"
+            self.wr_number = allocate_wr_number()
         if self.status == 'approved' and not self.approved_at:
             from django.utils import timezone
             self.approved_at = timezone.now()
@@ -186,8 +188,19 @@ class EnergyInput(models.Model):
     value = models.DecimalField(max_digits=10, decimal_places=2)
     meter_number = models.CharField(max_length=100)
     photo = models.ImageField(upload_to="energy_photos/", null=True, blank=True)
+    # made from `photo` in the background (energy_photos.py)
+    thumbnail = models.ImageField(upload_to="energy_photos/", null=True, blank=True, editable=False)
     created_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        # the keyset-paginated lists: newest first overall and per user, and
+        # one meter's readings over a date range
+        indexes = [
+            models.Index(fields=["created_at"], name="energy_input_created"),
+            models.Index(fields=["user", "created_at"], name="energy_input_user_created"),
+            models.Index(fields=["meter_number", "date"], name="energy_input_meter_date"),
+        ]
+
     def __str__(self):
         return f"{self.type} - {self.meter_number} - {self.date}"
 
@@ -223,3 +236,191 @@ class Document(models.Model):
 
     def __str__(self):
         return f"{self.file_name} ({self.version})"
+
+
+class WoWeeklyStatusRollup(models.Model):
+    # Work orders per (year, month, week_of_month, wo_status) of main_data.wo_created_date.
+    # Kept up to date by engineering_app.rollups.refresh_weekly_status_rollup.
+    year = models.IntegerField()
+    month = models.IntegerField()
+    week_of_month = models.IntegerField()
+    wo_status = models.CharField(max_length=50)
+    wo_count = models.IntegerField()
+
+    class Meta:
+        db_table = "wo_weekly_status_rollup"
+        constraints = [
+            models.UniqueConstraint(
+                fields=["year", "month", "week_of_month", "wo_status"],
+                name="wo_weekly_status_rollup_key",
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.year}-{self.month:02d} W{self.week_of_month} {self.wo_status}: {self.wo_count}"
+
+
+class WoRollupDirtyDay(models.Model):
+    # Days of wo_created_date touched in main_data since the last rollup refresh.
+    # Filled by statement triggers on main_data, drained by the refresh.
+    day = models.DateField(primary_key=True)
+
+    class Meta:
+        db_table = "wo_rollup_dirty_day"
+
+    def __str__(self):
+        return str(self.day)
+
+
+class MainData(models.Model):
+    # Work order / work request export from the CMMS. The table is created and
+    # loaded by the ingest job, not by Django; the views query it with raw SQL.
+    # Its indexes are installed by migration 0013_main_data_indexes.
+    no = models.IntegerField(primary_key=True)
+    title = models.CharField(max_length=255, null=True)
+    wo_description = models.TextField(null=True)
+    wo_status = models.CharField(max_length=50, null=True)
+    wo_type = models.CharField(max_length=50, null=True)
+    resource = models.CharField(max_length=100, null=True)
+    wr_number = models.CharField(max_length=50, null=True)
+    wr_type = models.CharField(max_length=50, null=True)
+    wr_requestor = models.CharField(max_length=100, null=True)
+    wr_request_by_date = models.DateTimeField(null=True)
+    wo_created_date = models.DateTimeField(null=True)
+    wo_scheduled_start_date = models.DateTimeField(null=True)
+    wo_scheduled_completion_date = models.DateTimeField(null=True)
+    wo_actual_start_date = models.DateTimeField(null=True)
+    wo_actual_completion_date = models.DateTimeField(null=True)
+    actual_failure_date = models.DateTimeField(null=True)
+    actual_duration = models.FloatField(null=True)  # seconds
+    no_asset_of_wo = models.CharField(max_length=100, null=True)
+    asset_group = models.CharField(max_length=100, null=True)
+    department = models.CharField(max_length=100, null=True)
+
+    class Meta:
+        managed = False
+        db_table = "main_data"
+
+    def __str__(self):
+        return f"{self.no} - {self.title}"
+
+
+class MainDataChange(models.Model):
+    # Days of wo_created_date written in main_data, logged by statement triggers
+    # with the writing transaction's id. Readers that remember the xmin of the
+    # snapshot they loaded main_data from re-read the days logged since
+    # (engineering_app.reliability). A NULL day means "reload everything".
+    xid = models.BigIntegerField(db_index=True)
+    day = models.DateField(null=True)
+    changed_at = models.DateTimeField(db_index=True)
+
+    class Meta:
+        db_table = "main_data_change"
+
+    def __str__(self):
+        return f"{self.day} (xid {self.xid})"
+
+
+class EnergyDailyFact(models.Model):
+    # One row per water_daily date with the cng / electricity consumption of the
+    # same day joined in, water already scaled by 100, and the calendar fields
+    # the energy views group and label by. The table is created by migration
+    # 0016 with untyped numeric columns like the *_daily tables (a DecimalField
+    # would pin a scale), and kept up to date by
+    # engineering_app.energy_fact.refresh_energy_daily_fact.
+    date = models.DateField(primary_key=True)
+    water_consumption = models.DecimalField(max_digits=20, decimal_places=6, null=True)
+    cng_consumption = models.DecimalField(max_digits=20, decimal_places=6, null=True)
+    electricity_consumption = models.DecimalField(max_digits=20, decimal_places=6, null=True)
+    year = models.SmallIntegerField()
+    month = models.SmallIntegerField()
+    week_of_month = models.SmallIntegerField()
+    day = models.SmallIntegerField()
+    month_name = models.CharField(max_length=10)
+    day_name = models.CharField(max_length=3)
+
+    class Meta:
+        managed = False
+        db_table = "energy_daily_fact"
+
+    def __str__(self):
+        return str(self.date)
+
+
+class EnergyFactDirtyDay(models.Model):
+    # Dates written in water_daily / cng_daily / electricity_daily since the
+    # last energy_daily_fact refresh. Filled by statement triggers, drained by
+    # the refresh.
+    date = models.DateField(primary_key=True)
+
+    class Meta:
+        db_table = "energy_fact_dirty_day"
+
+    def __str__(self):
+        return str(self.date)
+
+
+class EnergyRollup(models.Model):
+    # Sum / avg / min / max / count of one utility's daily consumption per
+    # day, ISO week, month or year (period_start is the first day of the
+    # period). Built from energy_daily_fact by
+    # engineering_app.energy_fact.refresh_energy_rollup.
+    grain = models.CharField(max_length=5)
+    period_start = models.DateField()
+    utility = models.CharField(max_length=12)
+    total = models.FloatField()
+    average = models.FloatField()
+    minimum = models.FloatField()
+    maximum = models.FloatField()
+    days = models.IntegerField()
+
+    class Meta:
+        db_table = "energy_rollup"
+        constraints = [
+            models.UniqueConstraint(
+                fields=["grain", "period_start", "utility"],
+                name="energy_rollup_key",
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.grain} {self.period_start} {self.utility}: {self.total}"
+
+
+class EnergyMeterDaily(models.Model):
+    # Consumption of one meter per day, from the differences between its
+    # cumulative EnergyInput readings (a gap of several days is spread evenly
+    # over them). Summed per type into water_daily / cng_daily /
+    # electricity_daily by engineering_app.energy_aggregation.
+    type = models.CharField(max_length=10)
+    meter_number = models.CharField(max_length=100)
+    date = models.DateField()
+    consumption = models.DecimalField(max_digits=20, decimal_places=6)
+
+    class Meta:
+        db_table = "energy_meter_daily"
+        constraints = [
+            models.UniqueConstraint(
+                fields=["type", "meter_number", "date"],
+                name="energy_meter_daily_key",
+            ),
+        ]
+        indexes = [
+            models.Index(fields=["type", "date"], name="energy_meter_daily_type_date"),
+        ]
+
+    def __str__(self):
+        return f"{self.type} {self.meter_number} {self.date}: {self.consumption}"
+
+
+class AggregationWatermark(models.Model):
+    # How far an incremental job has read its source, e.g. the created_at of
+    # the last EnergyInput rows aggregated.
+    name = models.CharField(max_length=50, primary_key=True)
+    value = models.DateTimeField()
+
+    class Meta:
+        db_table = "aggregation_watermark"
+
+    def __str__(self):
+        return f"{self.name}: {self.value}"
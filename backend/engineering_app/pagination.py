@@ -0,0 +1,290 @@
+import base64
+import json
+from datetime import date, datetime
+from decimal import Decimal
+from uuid import UUID
+
+from django.core.exceptions import ValidationError
+from django.db import connection
+from django.db.models import Q
+from rest_framework.utils.urls import replace_query_param
+
+from .json_encoding import JsonResponse
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+
+
+class InvalidPageRequest(ValueError):
+    pass
+
+
+def wants_pagination(request):
+    # old clients pass ?paginate=false to get the full unpaginated array
+    return (request.GET.get("paginate") or "").lower() not in ("0", "false", "no")
+
+
+def encode_cursor(values, reverse=False):
+    values = [
+        v.isoformat() if isinstance(v, (date, datetime)) else str(v) if isinstance(v, UUID) else v
+        for v in values
+    ]
+    payload = json.dumps({"k": values, "r": reverse}, separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+
+def _parse_int(value):
+    if isinstance(value, bool) or not isinstance(value, (int, str)):
+        raise TypeError(value)
+    return int(value)
+
+
+def _parse_text(value):
+    if not isinstance(value, str):
+        raise TypeError(value)
+    return value
+
+
+# PostgreSQL type oid of a key column -> parser of a cursor value into that
+# type; other types are passed on as decoded
+CURSOR_VALUE_PARSERS = {
+    20: _parse_int,  # bigint
+    21: _parse_int,  # smallint
+    23: _parse_int,  # integer
+    25: _parse_text,  # text
+    1043: _parse_text,  # varchar
+    1082: date.fromisoformat,
+    1114: datetime.fromisoformat,  # timestamp
+    1184: datetime.fromisoformat,  # timestamptz
+    1700: lambda value: Decimal(str(value)),  # numeric
+    2950: UUID,
+}
+
+# (select_sql, key columns) -> parsers of their cursor values
+_key_parsers = {}
+
+
+def key_parsers(select_sql, key_columns, params=None):
+    """Parsers of cursor values into the types of `key_columns` of `select_sql`, looked up once per query."""
+    cache_key = (select_sql, tuple(key_columns))
+    if cache_key not in _key_parsers:
+        key_list = ", ".join(f"page_src.{col}" for col in key_columns)
+        with connection.cursor() as cursor:
+            cursor.execute(f"SELECT {key_list} FROM ({select_sql}) AS page_src LIMIT 0", params)
+            _key_parsers[cache_key] = [
+                CURSOR_VALUE_PARSERS.get(col.type_code, lambda value: value) for col in cursor.description
+            ]
+    return _key_parsers[cache_key]
+
+
+def decode_cursor(token, key_length, parsers=None):
+    """
+    (key values, reverse) of a cursor token. Only the leading key value may be
+    null; with `parsers` each value is parsed into its column's type, so a
+    tampered cursor is an InvalidPageRequest rather than a database error.
+    """
+    try:
+        padded = token + "=" * (-len(token) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        values, reverse = payload["k"], bool(payload.get("r", False))
+    except (ValueError, TypeError, KeyError):
+        raise InvalidPageRequest("Invalid cursor")
+    if not isinstance(values, list) or len(values) != key_length or None in values[1:]:
+        raise InvalidPageRequest("Invalid cursor")
+    if parsers:
+        try:
+            values = [None if value is None else parse(value) for parse, value in zip(parsers, values)]
+        except (ValueError, TypeError, ArithmeticError):
+            raise InvalidPageRequest("Invalid cursor")
+    return values, reverse
+
+
+def parse_page_size(request):
+    raw = request.GET.get("page_size")
+    if raw in (None, ""):
+        return DEFAULT_PAGE_SIZE
+    try:
+        page_size = int(raw)
+    except ValueError:
+        raise InvalidPageRequest("Invalid page_size")
+    if page_size < 1:
+        raise InvalidPageRequest("Invalid page_size")
+    return min(page_size, MAX_PAGE_SIZE)
+
+
+def keyset_page_sql(select_sql, key_columns, seek=False, reverse=False, null_key=False, null_rows=False):
+    """
+    One page of `select_sql` in key order, newest first (oldest first if
+    `reverse`). Rows with a null leading key come first, as in a plain ORDER
+    BY ... DESC and a backward scan of the key's index; the other key columns
+    must not be null. Seeking stays a row comparison on the key so that it
+    is an index range: seeking from a cursor whose leading key is null
+    (`null_key`) covers the rows with a null key and, forward, everything
+    after them; a reverse seek from a non-null key leaves out the null rows,
+    which `null_rows` selects on their own.
+
+    Parameters: those of select_sql, the cursor's key values if seeking
+    (without the null leading one), the limit.
+    """
+    leading, rest = f"page_src.{key_columns[0]}", key_columns[1:]
+    where = [f"page_src.{col} IS NOT NULL" for col in rest]
+    if null_rows:
+        where.append(f"{leading} IS NULL")
+    elif seek:
+        op = ">" if reverse else "<"
+        if null_key:
+            rest_list = ", ".join(f"page_src.{col}" for col in rest)
+            placeholders = ", ".join(["%s"] * len(rest))
+            among_nulls = f"{leading} IS NULL AND ({rest_list}) {op} ({placeholders})" if rest else "FALSE"
+            where.append(f"({among_nulls})" if reverse else f"({leading} IS NOT NULL OR ({among_nulls}))")
+        else:
+            # a null leading key compares as null, so those rows drop out
+            key_list = ", ".join(f"page_src.{col}" for col in key_columns)
+            placeholders = ", ".join(["%s"] * len(key_columns))
+            where.append(f"({key_list}) {op} ({placeholders})")
+
+    direction = "ASC NULLS LAST" if reverse else "DESC NULLS FIRST"
+    order_by = ", ".join(f"page_src.{col} {direction}" for col in key_columns)
+    return f"""
+        SELECT * FROM ({select_sql}) AS page_src
+        WHERE {" AND ".join(where) or "TRUE"}
+        ORDER BY {order_by}
+        LIMIT %s
+    """
+
+
+def fetch_keyset_page(select_sql, key_columns, cursor_token=None, page_size=DEFAULT_PAGE_SIZE, params=None):
+    """
+    Runs one page of `select_sql` ordered by `key_columns` DESC, seeking past
+    the cursor with a row comparison instead of OFFSET so that every page is a
+    single index range scan. Returns (columns, rows, next_key, previous_key).
+    """
+    reverse = null_key = False
+    query_params = list(params or [])
+    if cursor_token:
+        parsers = key_parsers(select_sql, key_columns, params)
+        values, reverse = decode_cursor(cursor_token, len(key_columns), parsers)
+        null_key = values[0] is None
+        query_params += values[1:] if null_key else values
+    sql = keyset_page_sql(select_sql, key_columns, seek=bool(cursor_token), reverse=reverse, null_key=null_key)
+
+    with connection.cursor() as cursor:
+        cursor.execute(sql, query_params + [page_size + 1])
+        columns = [col.name for col in cursor.description]
+        rows = cursor.fetchall()
+        if reverse and not null_key and len(rows) <= page_size:
+            # back from a dated row: the rows without a leading key come last
+            # in this order and are not in the seek's index range
+            cursor.execute(
+                keyset_page_sql(select_sql, key_columns, reverse=True, null_rows=True),
+                list(params or []) + [page_size + 1 - len(rows)],
+            )
+            rows += cursor.fetchall()
+
+    has_more = len(rows) > page_size
+    rows = rows[:page_size]
+    if reverse:
+        rows.reverse()
+
+    key_index = [columns.index(col) for col in key_columns]
+    first_key = [rows[0][i] for i in key_index] if rows else None
+    last_key = [rows[-1][i] for i in key_index] if rows else None
+
+    if reverse:
+        next_key = last_key
+        previous_key = first_key if has_more else None
+    else:
+        next_key = last_key if has_more else None
+        previous_key = first_key if cursor_token else None
+    return columns, rows, next_key, previous_key
+
+
+def page_links(request, next_key, previous_key):
+    url = request.build_absolute_uri()
+    return {
+        "next": replace_query_param(url, "cursor", encode_cursor(next_key)) if next_key else None,
+        "previous": (
+            replace_query_param(url, "cursor", encode_cursor(previous_key, reverse=True))
+            if previous_key else None
+        ),
+    }
+
+
+def keyset_response(request, select_sql, key_columns, fields, params=None):
+    try:
+        page_size = parse_page_size(request)
+        _, rows, next_key, previous_key = fetch_keyset_page(
+            select_sql, key_columns,
+            cursor_token=request.GET.get("cursor"),
+            page_size=page_size,
+            params=params,
+        )
+    except InvalidPageRequest as exc:
+        return JsonResponse({"error": str(exc)}, status=400)
+
+    return JsonResponse({
+        "page_size": page_size,
+        **page_links(request, next_key, previous_key),
+        "results": [dict(zip(fields, row)) for row in rows],
+    })
+
+
+def _seek_filter(key_fields, values, reverse):
+    # (k1, k2, ...) < (v1, v2, ...) spelt out for the ORM; the leading
+    # k1 <= v1 repeats part of it so that it becomes the index range bound
+    op = "gt" if reverse else "lt"
+    condition = Q(**{f"{key_fields[-1]}__{op}": values[-1]})
+    for field, value in zip(reversed(key_fields[:-1]), reversed(values[:-1])):
+        condition = Q(**{f"{field}__{op}": value}) | Q(**{field: value}) & condition
+    return Q(**{f"{key_fields[0]}__{op}e": values[0]}) & condition
+
+
+def fetch_keyset_queryset_page(queryset, key_fields, cursor_token=None, page_size=DEFAULT_PAGE_SIZE):
+    """
+    fetch_keyset_page() for a queryset: one page of model instances ordered by
+    `key_fields` DESC, as (objects, next_key, previous_key).
+    """
+    reverse = False
+    if cursor_token:
+        values, reverse = decode_cursor(cursor_token, len(key_fields))
+        try:
+            queryset = queryset.filter(_seek_filter(key_fields, values, reverse))
+        except (ValidationError, ValueError, TypeError):
+            raise InvalidPageRequest("Invalid cursor")
+    direction = "" if reverse else "-"
+    queryset = queryset.order_by(*(direction + field for field in key_fields))
+    objects = list(queryset[:page_size + 1])
+
+    has_more = len(objects) > page_size
+    objects = objects[:page_size]
+    if reverse:
+        objects.reverse()
+
+    first_key = [getattr(objects[0], field) for field in key_fields] if objects else None
+    last_key = [getattr(objects[-1], field) for field in key_fields] if objects else None
+
+    if reverse:
+        next_key = last_key
+        previous_key = first_key if has_more else None
+    else:
+        next_key = last_key if has_more else None
+        previous_key = first_key if cursor_token else None
+    return objects, next_key, previous_key
+
+
+def keyset_queryset_page(request, queryset, key_fields, serializer_class):
+    """
+    The page envelope of keyset_response() for a queryset, with the results
+    serialized by `serializer_class`. Raises InvalidPageRequest.
+    """
+    page_size = parse_page_size(request)
+    objects, next_key, previous_key = fetch_keyset_queryset_page(
+        queryset, key_fields,
+        cursor_token=request.GET.get("cursor"),
+        page_size=page_size,
+    )
+    return {
+        "page_size": page_size,
+        **page_links(request, next_key, previous_key),
+        "results": serializer_class(objects, many=True).data,
+    }
@@ -0,0 +1,336 @@
+import re
+from datetime import date
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.dispatch import receiver
+from django.utils import timezone
+
+from .ingest import data_ingested
+
+# main_data is range-partitioned by month of wo_created_date, one partition per
+# month named main_data_pYYYY_MM plus a DEFAULT partition for NULL and
+# not-yet-covered dates. Queries bounded on wo_created_date only touch the
+# matching months (see filters.filter_sql() for the other date columns).
+# Partitions are created ahead of time; rows that landed in DEFAULT before
+# their month existed are moved out when it is created.
+
+DEFAULTS = {
+    "MONTHS_AHEAD": 3,
+    "ENSURE_ON_INGEST": True,
+}
+
+# Serialises conversion, partition creation and detaching.
+PARTITION_LOCK_ID = 4_210_002
+
+PARTITION_KEY = "wo_created_date"
+DEFAULT_PARTITION = "main_data_pdefault"
+OLD_TABLE = "main_data_unpartitioned"
+
+PARTITION_NAME_RE = re.compile(r"^main_data_p(\d{4})_(\d{2})$")
+
+RELKIND_SQL = "SELECT relkind FROM pg_class WHERE oid = to_regclass('main_data')"
+
+PARTITIONS_SQL = """
+    SELECT c.relname, pg_get_expr(c.relpartbound, c.oid) = 'DEFAULT'
+    FROM pg_inherits i
+    JOIN pg_class c ON c.oid = i.inhrelid
+    WHERE i.inhparent = 'main_data'::regclass
+    ORDER BY c.relname
+"""
+
+INDEX_DEFINITIONS_SQL = """
+    SELECT c.relname, pg_get_indexdef(i.indexrelid), i.indisunique
+    FROM pg_index i
+    JOIN pg_class c ON c.oid = i.indexrelid
+    WHERE i.indrelid = 'main_data'::regclass
+    ORDER BY c.relname
+"""
+
+# the unique indexes of main_data: name, constraint type ('p' / 'u' / None),
+# whether it has expressions or a predicate, key columns, INCLUDE columns
+UNIQUE_INDEXES_SQL = """
+    SELECT
+        c.relname,
+        con.contype,
+        i.indexprs IS NOT NULL OR i.indpred IS NOT NULL,
+        ARRAY(
+            SELECT a.attname FROM unnest(i.indkey::int2[]) WITH ORDINALITY AS k(attnum, n)
+            JOIN pg_attribute a ON a.attrelid = i.indrelid AND a.attnum = k.attnum
+            WHERE k.n <= i.indnkeyatts ORDER BY k.n
+        ),
+        ARRAY(
+            SELECT a.attname FROM unnest(i.indkey::int2[]) WITH ORDINALITY AS k(attnum, n)
+            JOIN pg_attribute a ON a.attrelid = i.indrelid AND a.attnum = k.attnum
+            WHERE k.n > i.indnkeyatts ORDER BY k.n
+        )
+    FROM pg_index i
+    JOIN pg_class c ON c.oid = i.indexrelid
+    LEFT JOIN pg_constraint con ON con.conindid = i.indexrelid AND con.conrelid = i.indrelid
+    WHERE i.indrelid = 'main_data'::regclass AND i.indisunique
+    ORDER BY c.relname
+"""
+
+TRIGGER_DEFINITIONS_SQL = """
+    SELECT pg_get_triggerdef(oid)
+    FROM pg_trigger
+    WHERE tgrelid = 'main_data'::regclass AND NOT tgisinternal
+    ORDER BY tgname
+"""
+
+OWNED_SEQUENCES_SQL = f"""
+    SELECT attname, pg_get_serial_sequence('{OLD_TABLE}', attname)
+    FROM pg_attribute
+    WHERE attrelid = '{OLD_TABLE}'::regclass AND attnum > 0 AND NOT attisdropped
+"""
+
+# Detached months disappear from main_data without firing its triggers, so the
+# derived data is told by hand: the rollup recomputes their weeks, the
+# reliability engine reloads in full (NULL day).
+DETACHED_DIRTY_DAYS_SQL = """
+    INSERT INTO wo_rollup_dirty_day (day)
+    SELECT generate_series(%s::date, %s::date - 1, INTERVAL '1 day')::date
+    ON CONFLICT DO NOTHING
+"""
+DETACHED_CHANGE_SQL = """
+    INSERT INTO main_data_change (xid, day, changed_at)
+    VALUES (pg_current_xact_id()::text::bigint, NULL, now())
+"""
+
+
+def partition_setting(name):
+    return getattr(settings, "MAIN_DATA_PARTITIONS", {}).get(name, DEFAULTS[name])
+
+
+def add_months(month, count):
+    index = month.year * 12 + month.month - 1 + count
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def month_of(value):
+    return date(value.year, value.month, 1)
+
+
+def partition_name(month):
+    return f"main_data_p{month:%Y_%m}"
+
+
+def partition_month(name):
+    match = PARTITION_NAME_RE.match(name)
+    return date(int(match[1]), int(match[2]), 1) if match else None
+
+
+def _bound(month):
+    # partitions split at UTC midnight, the session time zone of the app
+    return f"'{month:%Y-%m-%d} 00:00:00+00'"
+
+
+def main_data_kind(cursor):
+    """'p' when main_data is partitioned, 'r' for a plain table, None if missing."""
+    cursor.execute(RELKIND_SQL)
+    row = cursor.fetchone()
+    return row[0] if row else None
+
+
+def list_partitions(cursor):
+    """(month partitions in month order as (month, name), default partition name or None)."""
+    cursor.execute(PARTITIONS_SQL)
+    months, default = [], None
+    for name, is_default in cursor.fetchall():
+        if is_default:
+            default = name
+        elif partition_month(name) is not None:
+            months.append((partition_month(name), name))
+    return sorted(months), default
+
+
+def _create_partition(cursor, month):
+    cursor.execute(
+        f"CREATE TABLE {partition_name(month)} PARTITION OF main_data "
+        f"FOR VALUES FROM ({_bound(month)}) TO ({_bound(add_months(month, 1))})"
+    )
+
+
+class UnsupportedUniqueIndex(RuntimeError):
+    pass
+
+
+def partitioned_unique_sql(name, contype, keys, include, nulls_not_distinct=True):
+    """
+    The unique index (or PRIMARY KEY / UNIQUE constraint) `name` rebuilt for
+    the partitioned main_data: a unique key there has to include the partition
+    key, so wo_created_date is appended. A primary key becomes a UNIQUE
+    constraint, wo_created_date being nullable; NULLS NOT DISTINCT (postgres
+    15+) keeps the rows without a date in DEFAULT unique on the other columns.
+    """
+    quote = connection.ops.quote_name
+    columns = ", ".join(quote(column) for column in keys + [PARTITION_KEY] * (PARTITION_KEY not in keys))
+    nulls = " NULLS NOT DISTINCT" if nulls_not_distinct else ""
+    including = f" INCLUDE ({', '.join(quote(column) for column in include)})" if include else ""
+    if contype in ("p", "u"):
+        return f"ALTER TABLE main_data ADD CONSTRAINT {quote(name)} UNIQUE{nulls} ({columns}){including}"
+    return f"CREATE UNIQUE INDEX {quote(name)} ON main_data ({columns}){including}{nulls}"
+
+
+def unique_indexes(cursor):
+    """
+    The unique indexes of a plain main_data as (name, SQL recreating it on the
+    partitioned table). Raises UnsupportedUniqueIndex for expression or
+    partial unique indexes, which cannot be carried over.
+    """
+    cursor.execute(UNIQUE_INDEXES_SQL)
+    rows = cursor.fetchall()
+    unsupported = [name for name, _, complex_, _, _ in rows if complex_]
+    if unsupported:
+        raise UnsupportedUniqueIndex(
+            f"main_data has expression or partial unique indexes ({', '.join(unsupported)}) that cannot "
+            f"be recreated with {PARTITION_KEY}; drop or replace them first"
+        )
+    nulls_not_distinct = connection.pg_version >= 150000
+    return [
+        (name, partitioned_unique_sql(name, contype, keys, include, nulls_not_distinct))
+        for name, contype, _, keys, include in rows
+    ]
+
+
+def convert_main_data(months_ahead=None):
+    """
+    Rebuilds a plain main_data as a partitioned table in one transaction and
+    returns (number of month partitions, names of the unique indexes now also
+    keyed on wo_created_date). The table is locked for writes while its rows
+    are copied. Indexes and triggers are recreated from their definitions on
+    the new parent, unique ones through partitioned_unique_sql(). Returns None
+    when there is nothing to convert, and raises UnsupportedUniqueIndex, before
+    touching anything, when a unique index cannot be carried over.
+    """
+    if months_ahead is None:
+        months_ahead = partition_setting("MONTHS_AHEAD")
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute("SELECT pg_advisory_xact_lock(%s)", [PARTITION_LOCK_ID])
+        if main_data_kind(cursor) != "r":
+            return None
+        cursor.execute("LOCK TABLE main_data IN ACCESS EXCLUSIVE MODE")
+        unique = dict(unique_indexes(cursor))
+        cursor.execute(INDEX_DEFINITIONS_SQL)
+        indexes = cursor.fetchall()
+        cursor.execute(TRIGGER_DEFINITIONS_SQL)
+        triggers = [row[0] for row in cursor.fetchall()]
+        cursor.execute(f"SELECT MIN({PARTITION_KEY}), MAX({PARTITION_KEY}) FROM main_data")
+        first, last = cursor.fetchone()
+
+        cursor.execute(f"ALTER TABLE main_data RENAME TO {OLD_TABLE}")
+        cursor.execute(
+            f"CREATE TABLE main_data (LIKE {OLD_TABLE} INCLUDING DEFAULTS INCLUDING CONSTRAINTS "
+            f"INCLUDING GENERATED INCLUDING STORAGE INCLUDING COMMENTS) "
+            f"PARTITION BY RANGE ({PARTITION_KEY})"
+        )
+        this_month = month_of(timezone.now())
+        month = month_of(first) if first is not None else this_month
+        until = add_months(max(month_of(last) if last is not None else this_month, this_month), months_ahead)
+        count = 0
+        while month <= until:
+            _create_partition(cursor, month)
+            month = add_months(month, 1)
+            count += 1
+        cursor.execute(f"CREATE TABLE {DEFAULT_PARTITION} PARTITION OF main_data DEFAULT")
+        cursor.execute(f"INSERT INTO main_data SELECT * FROM {OLD_TABLE}")
+
+        cursor.execute(OWNED_SEQUENCES_SQL)
+        for column, sequence in cursor.fetchall():
+            if sequence:
+                cursor.execute(f"ALTER SEQUENCE {sequence} OWNED BY main_data.{column}")
+        cursor.execute(f"DROP TABLE {OLD_TABLE}")
+
+        for name, definition, _ in indexes:
+            cursor.execute(unique.get(name, definition))
+        for definition in triggers:
+            cursor.execute(definition)
+        cursor.execute("ANALYZE main_data")
+    return count, list(unique)
+
+
+def _move_out_of_default(cursor, month, default):
+    # a partition cannot be created while DEFAULT holds rows of its range:
+    # take DEFAULT out, create the month, move the rows through main_data
+    # (so its triggers see them) and put DEFAULT back
+    lo, hi = _bound(month), _bound(add_months(month, 1))
+    in_range = f"{PARTITION_KEY} >= {lo} AND {PARTITION_KEY} < {hi}"
+    cursor.execute(f"SELECT EXISTS (SELECT 1 FROM {default} WHERE {in_range})")
+    if not cursor.fetchone()[0]:
+        _create_partition(cursor, month)
+        return 0
+    cursor.execute(f"ALTER TABLE main_data DETACH PARTITION {default}")
+    _create_partition(cursor, month)
+    cursor.execute(f"INSERT INTO main_data SELECT * FROM {default} WHERE {in_range}")
+    moved = cursor.rowcount
+    cursor.execute(f"DELETE FROM {default} WHERE {in_range}")
+    cursor.execute(f"ALTER TABLE main_data ATTACH PARTITION {default} DEFAULT")
+    return moved
+
+
+def ensure_partitions(months_ahead=None, months=()):
+    """
+    Creates the missing month partitions up to `months_ahead` months after the
+    current one, plus any month that has rows waiting in the DEFAULT partition
+    and the first-of-month dates in `months`. Returns (names created, rows
+    moved out of DEFAULT); None if main_data is not partitioned.
+    """
+    if months_ahead is None:
+        months_ahead = partition_setting("MONTHS_AHEAD")
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute("SELECT pg_advisory_xact_lock(%s)", [PARTITION_LOCK_ID])
+        if main_data_kind(cursor) != "p":
+            return None
+        existing, default = list_partitions(cursor)
+        existing = {month for month, _ in existing}
+        this_month = month_of(timezone.now())
+        wanted = {add_months(this_month, i) for i in range(months_ahead + 1)} | set(months)
+        if default is None:
+            cursor.execute(f"CREATE TABLE {DEFAULT_PARTITION} PARTITION OF main_data DEFAULT")
+            default = DEFAULT_PARTITION
+        else:
+            cursor.execute(
+                f"SELECT DISTINCT date_trunc('month', {PARTITION_KEY})::date FROM {default} "
+                f"WHERE {PARTITION_KEY} IS NOT NULL"
+            )
+            wanted.update(row[0] for row in cursor.fetchall())
+        created, moved = [], 0
+        for month in sorted(wanted - existing):
+            moved += _move_out_of_default(cursor, month, default)
+            created.append(partition_name(month))
+    return created, moved
+
+
+def detach_partitions(before, archive_schema=None):
+    """
+    Detaches the month partitions that end on or before the month `before`
+    starts. The detached tables keep their data under the same name, moved to
+    `archive_schema` if given. Returns the names detached.
+    """
+    before = month_of(before)
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute("SELECT pg_advisory_xact_lock(%s)", [PARTITION_LOCK_ID])
+        if main_data_kind(cursor) != "p":
+            return []
+        months, _ = list_partitions(cursor)
+        old = [(month, name) for month, name in months if add_months(month, 1) <= before]
+        if archive_schema:
+            cursor.execute(f"CREATE SCHEMA IF NOT EXISTS {connection.ops.quote_name(archive_schema)}")
+        for month, name in old:
+            cursor.execute(f"ALTER TABLE main_data DETACH PARTITION {name}")
+            if archive_schema:
+                cursor.execute(f"ALTER TABLE {name} SET SCHEMA {connection.ops.quote_name(archive_schema)}")
+            cursor.execute(DETACHED_DIRTY_DAYS_SQL, [month, add_months(month, 1)])
+        if old:
+            cursor.execute(DETACHED_CHANGE_SQL)
+    if old:
+        data_ingested.send(sender=detach_partitions, tables=["main_data"])
+    return [name for _, name in old]
+
+
+@receiver(data_ingested)
+def ensure_partitions_after_ingest(sender, tables=None, **kwargs):
+    if not partition_setting("ENSURE_ON_INGEST"):
+        return
+    if tables is None or "main_data" in tables:
+        ensure_partitions()
@@ -0,0 +1,357 @@
+import json
+from collections import Counter
+from datetime import datetime, timedelta
+from datetime import timezone as dt_timezone
+from pathlib import Path
+
+from django.conf import settings
+from django.db import DatabaseError, connection, transaction
+from django.utils import timezone
+
+from . import queries, views
+from .benchmarks import git_commit
+from .energy_fact import DELETE_DIRTY_SQL as DELETE_DIRTY_ENERGY_SQL
+from .energy_fact import INSERT_DIRTY_SQL as INSERT_DIRTY_ENERGY_SQL
+from .filters import AnalyticsFilters, EnergyRollupFilters
+from .models import EnergyInput
+from .pagination import DEFAULT_PAGE_SIZE, keyset_page_sql
+from .rollups import DELETE_TOUCHED_SQL, INSERT_TOUCHED_SQL
+
+# Query-plan regression check (manage.py check_query_plans). Every statement in
+# endpoint_queries() is run under EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) and
+# reduced to its shape -- node types, join types and strategies, and the tables
+# and indexes read, with partitions named after main_data -- and a few
+# measurements: shared buffers touched, temp blocks, sorts and hashes that
+# spilled to disk, and the tables read by a Seq Scan. A run is stored as a
+# baseline and later runs are compared with it. Buffer counts are only
+# comparable on a database of the same size (e.g. `manage.py
+# generate_scale_data` with a fixed --seed and --end), so the baseline records
+# how many rows main_data had.
+
+DEFAULTS = {
+    "BASELINE": None,  # BASE_DIR / "benchmarks" / "query_plans.json"
+    "BUFFER_TOLERANCE": 0.25,  # allowed growth of the shared buffers touched, as a fraction
+    "MIN_BUFFER_DELTA": 100,  # smaller growths are ignored, whatever the fraction
+    "SEQ_SCAN_TABLES": ("main_data",),  # a new Seq Scan on these is a regression
+}
+
+# partition / partition index name -> name of the table or index it belongs to
+ROOT_NAMES_SQL = """
+    SELECT c.relname, r.relname
+    FROM pg_class c
+    JOIN pg_class r ON r.oid = COALESCE(pg_partition_root(c.oid), c.oid)
+    WHERE c.relname = ANY(%s)
+"""
+
+# planner's row estimate of main_data, summed over the partitions
+MAIN_DATA_ROWS_SQL = """
+    SELECT COALESCE(SUM(GREATEST(c.reltuples, 0)), 0)::bigint
+    FROM pg_class c
+    WHERE (c.oid = 'main_data'::regclass AND c.relkind = 'r')
+       OR c.oid IN (SELECT relid FROM pg_partition_tree('main_data') WHERE isleaf)
+"""
+
+APPEND_NODES = ("Append", "Merge Append")
+
+
+def plan_setting(name):
+    value = getattr(settings, "QUERY_PLANS", {}).get(name, DEFAULTS[name])
+    if name == "BASELINE" and value is None:
+        value = Path(settings.BASE_DIR) / "benchmarks" / "query_plans.json"
+    return value
+
+
+def endpoint_queries():
+    """
+    name -> (sql, params) of the statements the dashboard endpoints run against
+    the database, with the parameters a typical request would bind.
+    """
+    statuses = views.DEFAULT_WEEKLY_STATUSES
+    now = timezone.now()
+    last_quarter = AnalyticsFilters(now - timedelta(days=90), now, (), (), ())
+    energy_inputs = EnergyInput.objects.order_by(*("-" + field for field in views.ENERGY_INPUT_KEY))
+    return {
+        "active-work-orders": (views.weekly_status_counts_sql(1), ["Released", ["Released"]]),
+        "work-order-counts": (views.weekly_status_counts_sql(len(statuses)), statuses + [statuses]),
+        "work-order-counts?source=live": (
+            views.weekly_status_counts_sql(len(statuses), "live"), statuses + [statuses],
+        ),
+        "work-order-list?paginate=false": (views.WORK_ORDER_LIST_SQL, None),
+        "work-order-list": (
+            keyset_page_sql(views.WORK_ORDER_LIST_SELECT, views.WORK_ORDER_LIST_KEY),
+            [DEFAULT_PAGE_SIZE + 1],
+        ),
+        "work-order-list?cursor": (
+            keyset_page_sql(views.WORK_ORDER_LIST_SELECT, views.WORK_ORDER_LIST_KEY, seek=True),
+            [now, "0", DEFAULT_PAGE_SIZE + 1],
+        ),
+        "work-request?paginate=false": (views.WORK_REQUEST_LIST_SQL, None),
+        "work-request": (
+            keyset_page_sql(views.WORK_REQUEST_LIST_SELECT, views.WORK_REQUEST_LIST_KEY),
+            [DEFAULT_PAGE_SIZE + 1],
+        ),
+        "work-request?cursor": (
+            keyset_page_sql(views.WORK_REQUEST_LIST_SELECT, views.WORK_REQUEST_LIST_KEY, seek=True),
+            [now, "0", DEFAULT_PAGE_SIZE + 1],
+        ),
+        "work-request/bulk-status": (views.BULK_STATUS_UPDATE_SQL, {"ids": [1, 2, 3], "status": "approved"}),
+        "energy-input": energy_inputs[:DEFAULT_PAGE_SIZE + 1].query.sql_with_params(),
+        "energy": (queries.ENERGY_SQL, None),
+        "energy_monthly": (queries.ENERGY_TREND_SQL, None),
+        "energy/rollup?grain=month": queries.energy_rollup_query(EnergyRollupFilters("month", None, None)),
+        "energy/rollup?grain=day&from&to": queries.energy_rollup_query(
+            EnergyRollupFilters("day", now.date() - timedelta(days=30), now.date()),
+        ),
+        "analytics": (queries.ANALYTIC_SQL, None),
+        "category-analytics": (queries.CATEGORY_ANALYTICS_SQL, None),
+        "equipment-analytics": (queries.EQUIPMENT_ANALYTICS_SQL, None),
+        "monthly-trend": (queries.MONTHLY_TREND_SQL, None),
+        "downtime": (queries.WEEKLY_DOWNTIME_SQL, None),
+        "analytics?from&to": queries.analytic_query(last_quarter),
+        "category-analytics?from&to": queries.category_analytics_query(last_quarter),
+        "equipment-analytics?from&to&asset_group": queries.equipment_analytics_query(
+            last_quarter._replace(asset_group=("GRP1",)),
+        ),
+        "monthly-trend?from&to": queries.monthly_trend_query(last_quarter),
+        "downtime?from&to&resource": queries.weekly_downtime_query(last_quarter._replace(resource=("MTC",))),
+        "energydaily": (queries.ENERGY_DAILY_SQL, None),
+        "refresh_wo_rollup": (INSERT_TOUCHED_SQL, [[now.date()]]),
+        "refresh_energy_fact": (INSERT_DIRTY_ENERGY_SQL, [[now.date()]]),
+    }
+
+
+def analyze_setup():
+    """
+    name -> [(sql, params)] run before EXPLAIN ANALYZE of that endpoint query,
+    in the same rolled-back transaction. The refreshes insert today's rows,
+    which the last refresh left in place, so they are deleted first as the
+    refresh itself does.
+    """
+    today = [[timezone.now().date()]]
+    return {
+        "refresh_wo_rollup": [(DELETE_TOUCHED_SQL, today)],
+        "refresh_energy_fact": [(DELETE_DIRTY_ENERGY_SQL, today)],
+    }
+
+
+def explain_document(sql, params=None, analyze=False, setup=()):
+    # EXPLAIN (FORMAT JSON) of one statement; ANALYZE executes it, so it runs in
+    # a transaction that is rolled back, after the `setup` statements
+    options = "FORMAT JSON, ANALYZE, BUFFERS" if analyze else "FORMAT JSON"
+    with transaction.atomic(), connection.cursor() as cursor:
+        for statement, arguments in setup:
+            cursor.execute(statement, arguments)
+        cursor.execute(f"EXPLAIN ({options}) {sql}", params)
+        document = cursor.fetchone()[0]
+        transaction.set_rollback(True)
+    return document[0]
+
+
+def explain(sql, params=None, analyze=False, setup=()):
+    # the top plan node
+    return explain_document(sql, params, analyze, setup)["Plan"]
+
+
+def iter_plan_nodes(node):
+    yield node
+    for child in node.get("Plans", []):
+        yield from iter_plan_nodes(child)
+
+
+def plan_scans(node):
+    """(node type, relation, index or None) of every scan in the plan."""
+    return [
+        (n["Node Type"], n.get("Relation Name"), n.get("Index Name"))
+        for n in iter_plan_nodes(node)
+        if "Relation Name" in n or "Index Name" in n
+    ]
+
+
+def root_names(names):
+    """name -> root table or index name, for the partitions and partition indexes among `names`."""
+    with connection.cursor() as cursor:
+        cursor.execute(ROOT_NAMES_SQL, [sorted(names)])
+        return dict(cursor.fetchall())
+
+
+def plan_root_names(node):
+    return root_names({n for _, relation, index in plan_scans(node) for n in (relation, index) if n})
+
+
+def plan_shape(node, roots, depth=0):
+    """
+    The plan as indented lines of node type, join type or strategy, index and
+    table, without costs, rows or timings. Partitions and their indexes are
+    named after the table they belong to, and a subplan repeated for each
+    partition under an Append appears once, so the shape does not depend on
+    how many partitions there are.
+    """
+    line = node["Node Type"]
+    detail = node.get("Join Type") or node.get("Strategy")
+    if detail and detail != "Plain":
+        line += f" ({detail})"
+    if "Index Name" in node:
+        line += f" using {roots.get(node['Index Name'], node['Index Name'])}"
+    if "Relation Name" in node:
+        line += f" on {roots.get(node['Relation Name'], node['Relation Name'])}"
+    elif "CTE Name" in node:
+        line += f" on {node['CTE Name']}"
+    lines = ["  " * depth + line]
+    children = []
+    for child in node.get("Plans", []):
+        block = plan_shape(child, roots, depth + 1)
+        if node["Node Type"] in APPEND_NODES and block in children:
+            continue
+        children.append(block)
+    for block in children:
+        lines.extend(block)
+    return lines
+
+
+def _spills(node):
+    # sorts and hashes that ran out of work_mem, in the leader or a worker
+    for part in (node, *node.get("Workers", [])):
+        if part.get("Sort Space Type") == "Disk":
+            yield "Sort"
+        if part.get("Hash Batches", 1) > 1:
+            yield "Hash"
+        if part.get("Disk Usage", 0) > 0:
+            yield "HashAggregate"
+
+
+def _read_rows(node):
+    # a Seq Scan of an empty partition is the planner's choice whatever the indexes
+    return node.get("Actual Loops", 0) > 0 and (node.get("Actual Rows", 0) or node.get("Rows Removed by Filter", 0))
+
+
+def plan_metrics(document, roots):
+    """
+    Measurements of an EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) document. The
+    buffers include the whole tree; seq_scans counts, per table, the Seq Scans
+    that read rows (one per partition).
+    """
+    plan = document["Plan"]
+    nodes = list(iter_plan_nodes(plan))
+    seq_scans = Counter(
+        roots.get(n["Relation Name"], n["Relation Name"])
+        for n in nodes if n["Node Type"] == "Seq Scan" and _read_rows(n)
+    )
+    return {
+        "execution_ms": document.get("Execution Time"),
+        "planning_ms": document.get("Planning Time"),
+        "rows": plan.get("Actual Rows"),
+        "shared_blocks": plan.get("Shared Hit Blocks", 0) + plan.get("Shared Read Blocks", 0),
+        "shared_read_blocks": plan.get("Shared Read Blocks", 0),
+        "temp_blocks": plan.get("Temp Read Blocks", 0) + plan.get("Temp Written Blocks", 0),
+        "seq_scans": dict(sorted(seq_scans.items())),
+        "spills": sorted(spill for n in nodes for spill in _spills(n)),
+    }
+
+
+def _main_data_rows():
+    with connection.cursor() as cursor:
+        cursor.execute(MAIN_DATA_ROWS_SQL)
+        return cursor.fetchone()[0]
+
+
+def _work_mem():
+    with connection.cursor() as cursor:
+        cursor.execute("SHOW work_mem")
+        return cursor.fetchone()[0]
+
+
+def collect_plans(names=None, progress=None):
+    """
+    EXPLAIN ANALYZE of the endpoint queries `names` (default: all) as a
+    JSON-ready dict with the shape and metrics of each, or the error it failed
+    with.
+    """
+    endpoints = endpoint_queries()
+    setup = analyze_setup()
+    run = {
+        "created_at": datetime.now(dt_timezone.utc).isoformat(timespec="seconds"),
+        "environment": {
+            "git_commit": git_commit(),
+            "database": settings.DATABASES["default"]["NAME"],
+            "server_version": connection.pg_version,
+            "work_mem": _work_mem(),
+            "main_data_rows": _main_data_rows(),
+        },
+        "queries": {},
+    }
+    for name in names or endpoints:
+        sql, params = endpoints[name]
+        try:
+            document = explain_document(sql, params, analyze=True, setup=setup.get(name, ()))
+        except DatabaseError as exc:
+            result = {"error": str(exc).strip()}
+        else:
+            roots = plan_root_names(document["Plan"])
+            result = {"shape": plan_shape(document["Plan"], roots), "metrics": plan_metrics(document, roots)}
+        run["queries"][name] = result
+        if progress:
+            progress(name, result)
+    return run
+
+
+def save_plans(run, path=None, merge=False):
+    """
+    Writes `run` to `path` (default: the BASELINE setting) and returns the path;
+    with `merge` the queries of an existing file that `run` did not explain
+    are kept.
+    """
+    path = Path(path or plan_setting("BASELINE"))
+    if merge and path.exists():
+        run = {**run, "queries": {**load_plans(path)["queries"], **run["queries"]}}
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(json.dumps(run, indent=2) + "\n")
+    return path
+
+
+def load_plans(path=None):
+    return json.loads(Path(path or plan_setting("BASELINE")).read_text())
+
+
+def _grew(old, new, tolerance, min_delta):
+    return new > old * (1 + tolerance) and new - old >= min_delta
+
+
+def compare_plans(run, baseline, tolerance=None, min_delta=None, watched=None):
+    """
+    One row per query found in both: (name, regressions, shape changed).
+    A query regresses when it starts failing, reads a table of `watched` (or
+    more of its partitions) with a Seq Scan it did not use before, spills a sort or hash to disk it did not spill before,
+    or touches more shared or temp buffers than `tolerance` allows (and at
+    least `min_delta` more). A changed shape alone is not a regression.
+    """
+    if tolerance is None:
+        tolerance = plan_setting("BUFFER_TOLERANCE")
+    if min_delta is None:
+        min_delta = plan_setting("MIN_BUFFER_DELTA")
+    if watched is None:
+        watched = plan_setting("SEQ_SCAN_TABLES")
+    rows = []
+    for name, current in run["queries"].items():
+        before = baseline.get("queries", {}).get(name)
+        if before is None:
+            continue
+        if "error" in current:
+            rows.append((name, [] if "error" in before else [f"fails: {current['error']}"], False))
+            continue
+        if "error" in before:
+            rows.append((name, [], True))
+            continue
+        old, new = before["metrics"], current["metrics"]
+        regressions = []
+        for table in watched:
+            was, count = old["seq_scans"].get(table, 0), new["seq_scans"].get(table, 0)
+            if count > was:
+                regressions.append(f"new Seq Scan on {table}" + (f" ({was} -> {count} partitions)" if was else ""))
+        regressions += [
+            f"{node} spills to disk" for node in Counter(new["spills"]) - Counter(old["spills"])
+        ]
+        for metric in ("shared_blocks", "temp_blocks"):
+            if _grew(old[metric], new[metric], tolerance, min_delta):
+                regressions.append(f"{metric} {old[metric]} -> {new[metric]}")
+        rows.append((name, regressions, current["shape"] != before["shape"]))
+    return rows
@@ -0,0 +1,457 @@
+# SQL and row shaping of the raw-SQL dashboard views, shared by the sync views
+# in views.py and their async variants in async_views.py. The analytics
+# queries are templates: <name>_query(filters) pushes ?from=&to= and the
+# dimension filters into every CTE (see filters.py), <NAME>_SQL is the
+# unfiltered statement.
+
+from .columnar import columns_from_rows
+from .filters import NO_FILTERS, filter_params, filter_sql, since_sql
+
+# The energy views read energy_daily_fact (see energy_fact.py), one row per
+# date. The calendar fields are cast back to numeric, the type EXTRACT()
+# gave them when the views joined the *_daily tables themselves.
+ENERGY_SQL = """
+    SELECT
+        date,
+        water_consumption,
+        cng_consumption,
+        electricity_consumption,
+        year::numeric AS year,
+        month::numeric AS month,
+        week_of_month::numeric AS week_of_month,
+        day::numeric AS day
+    FROM energy_daily_fact
+    ORDER BY date DESC
+"""
+
+
+ENERGY_FIELDS = ["date", "water_consumption", "cng_consumption", "electricity_consumption", "year", "month", "week_of_month"]
+
+
+def energy_result(rows):
+    return [dict(zip(ENERGY_FIELDS, row)) for row in rows]
+
+
+ENERGY_TREND_SQL = """
+    SELECT
+        month_name,
+        round(avg(water_consumption)) AS water_monthly,
+        round(avg(cng_consumption)) AS cng_monthly,
+        round(avg(electricity_consumption)) AS electricity_monthly,
+        month::numeric AS month_number
+    FROM energy_daily_fact
+    GROUP BY month_name, month
+    ORDER BY month
+"""
+
+
+def energy_trend_result(rows):
+    return [
+        {"month_name": row[0], "water_monthly": row[1], "cng_monthly": row[2], "electricity_monthly": row[3], "month_number": row[4]}
+        for row in rows
+    ]
+
+
+# /energy/rollup/ reads energy_rollup (see energy_fact.py) through its
+# (grain, period_start, utility) key.
+ENERGY_ROLLUP_TEMPLATE = """
+    SELECT period_start, utility, total, average, minimum, maximum, days
+    FROM energy_rollup
+    WHERE grain = %(grain)s{range}
+    ORDER BY period_start, utility
+"""
+
+
+def energy_rollup_query(filters):
+    conditions = []
+    if filters.date_from is not None:
+        conditions.append("period_start >= date_trunc(%(grain)s, %(date_from)s::timestamp)::date")
+    if filters.date_to is not None:
+        conditions.append("period_start <= %(date_to)s")
+    sql = ENERGY_ROLLUP_TEMPLATE.format(range="".join(f"\n      AND {c}" for c in conditions))
+    return sql, filters._asdict()
+
+
+def energy_rollup_result(rows):
+    # one entry per period, the utilities side by side
+    periods = {}
+    for period_start, utility, total, average, minimum, maximum, days in rows:
+        period = periods.setdefault(period_start, {"period_start": str(period_start)})
+        period[utility] = {"sum": total, "avg": average, "min": minimum, "max": maximum, "count": days}
+    return list(periods.values())
+
+
+ANALYTIC_TEMPLATE = """
+    WITH
+    mttr_data AS (
+        SELECT
+            DATE(wo_scheduled_start_date) AS date,
+            ROUND(AVG(EXTRACT(EPOCH FROM (wo_scheduled_completion_date - wo_scheduled_start_date)) / 3600), 2) AS mttr_hours
+        FROM main_data
+        WHERE wo_scheduled_start_date IS NOT NULL
+          AND wo_scheduled_completion_date IS NOT NULL{mttr_filter}
+        GROUP BY DATE(wo_scheduled_start_date)
+    ),
+
+    failure_dates AS (
+        SELECT
+            MIN(actual_failure_date) AS failure_time
+        FROM main_data
+        WHERE actual_failure_date IS NOT NULL{failure_filter}
+        GROUP BY DATE(actual_failure_date), no_asset_of_wo
+    ),
+
+    failure_with_diff AS (
+        SELECT
+            failure_time,
+            failure_time - LAG(failure_time) OVER (ORDER BY failure_time) AS diff
+        FROM failure_dates
+    ),
+
+    mtbf_data AS (
+        SELECT
+            DATE(failure_time) AS date,
+            ROUND(AVG(EXTRACT(EPOCH FROM diff) / 3600), 2) AS mtbf_hours,
+            COUNT(*) AS failure_count
+        FROM failure_with_diff
+        WHERE diff IS NOT NULL{since}
+        GROUP BY DATE(failure_time)
+    )
+
+    SELECT
+        COALESCE(mttr_data.date, mtbf_data.date) AS date,
+        mttr_data.mttr_hours,
+        mtbf_data.mtbf_hours,
+        mtbf_data.failure_count
+    FROM mttr_data
+    FULL OUTER JOIN mtbf_data ON mttr_data.date = mtbf_data.date
+    ORDER BY date
+"""
+
+
+def analytic_query(filters=NO_FILTERS):
+    sql = ANALYTIC_TEMPLATE.format(
+        mttr_filter=filter_sql(filters, "wo_scheduled_start_date"),
+        failure_filter=filter_sql(filters, "actual_failure_date", lookback=True),
+        since=since_sql(filters, "failure_time"),
+    )
+    return sql, filter_params(filters)
+
+
+ANALYTIC_SQL, _ = analytic_query()
+
+
+ANALYTIC_FIELDS = ["date", "mttr_hours", "mtbf_hours", "failure_count"]
+
+
+def analytic_result(rows):
+    return [
+        {
+            "date": str(row[0]),
+            "mttr_hours": row[1],
+            "mtbf_hours": row[2],
+            "failure_count": row[3]
+        }
+        for row in rows
+    ]
+
+
+def analytic_columns(rows):
+    # analytic_result() for ?format=columnar / arrow
+    columns = columns_from_rows(ANALYTIC_FIELDS, rows)
+    columns["date"] = [str(day) for day in columns["date"]]
+    return columns
+
+
+CATEGORY_ANALYTICS_TEMPLATE = """
+    WITH valid_mttr AS (
+        SELECT
+            resource,
+            ROUND(AVG(EXTRACT(EPOCH FROM (wo_actual_completion_date - wo_actual_start_date)) / 3600), 1) AS avg_mttr_hours
+        FROM main_data
+        WHERE wo_actual_start_date IS NOT NULL
+          AND wo_actual_completion_date IS NOT NULL
+          AND wo_actual_completion_date >= wo_actual_start_date
+          AND resource IN ('MTC', 'CAL', 'UTY'){mttr_filter}
+        GROUP BY resource
+    ),
+
+    valid_mtbf_raw AS (
+        SELECT
+            resource,
+            actual_failure_date,
+            LAG(actual_failure_date) OVER (PARTITION BY resource ORDER BY actual_failure_date) AS prev_failure_date
+        FROM main_data
+        WHERE actual_failure_date IS NOT NULL
+          AND resource IN ('MTC', 'CAL', 'UTY'){failure_filter}
+    ),
+
+    valid_mtbf AS (
+        SELECT
+            resource,
+            ROUND(AVG(EXTRACT(EPOCH FROM (actual_failure_date - prev_failure_date)) / 3600), 1) AS avg_mtbf_hours
+        FROM valid_mtbf_raw
+        WHERE prev_failure_date IS NOT NULL{since}
+        GROUP BY resource
+    ),
+
+    work_orders AS (
+        SELECT
+            resource,
+            COUNT(*) AS work_order_count
+        FROM main_data
+        WHERE resource IN ('MTC', 'CAL', 'UTY'){work_order_filter}
+        GROUP BY resource
+    )
+
+    SELECT
+        wo.resource,
+        wo.work_order_count,
+        COALESCE(mt.avg_mttr_hours, 0),
+        COALESCE(mb.avg_mtbf_hours, 0)
+    FROM work_orders wo
+    LEFT JOIN valid_mttr mt ON wo.resource = mt.resource
+    LEFT JOIN valid_mtbf mb ON wo.resource = mb.resource
+"""
+
+
+def category_analytics_query(filters=NO_FILTERS):
+    sql = CATEGORY_ANALYTICS_TEMPLATE.format(
+        mttr_filter=filter_sql(filters, "wo_actual_start_date"),
+        failure_filter=filter_sql(filters, "actual_failure_date", lookback=True),
+        since=since_sql(filters, "actual_failure_date"),
+        work_order_filter=filter_sql(filters, "wo_created_date"),
+    )
+    return sql, filter_params(filters)
+
+
+CATEGORY_ANALYTICS_SQL, _ = category_analytics_query()
+
+
+def category_analytics_result(rows):
+    return [
+        {
+            "category": row[0],
+            "count": row[1],
+            "avgMttr": row[2],
+            "avgMtbf": row[3],
+        }
+        for row in rows
+    ]
+
+
+EQUIPMENT_ANALYTICS_TEMPLATE = """
+    WITH valid_mttr AS (
+        SELECT
+            asset_group,
+            ROUND(AVG(EXTRACT(EPOCH FROM (wo_actual_completion_date - wo_actual_start_date)) / 3600), 1) AS mttr
+        FROM main_data
+        WHERE wo_actual_start_date IS NOT NULL AND wo_actual_completion_date IS NOT NULL{mttr_filter}
+        GROUP BY asset_group
+    ),
+    valid_mtbf_raw AS (
+        SELECT
+            asset_group,
+            actual_failure_date,
+            LAG(actual_failure_date) OVER (PARTITION BY asset_group ORDER BY actual_failure_date) AS prev_failure
+        FROM main_data
+        WHERE actual_failure_date IS NOT NULL{failure_filter}
+    ),
+    valid_mtbf AS (
+        SELECT
+            asset_group,
+            ROUND(AVG(EXTRACT(EPOCH FROM (actual_failure_date - prev_failure)) / 3600), 1) AS mtbf
+        FROM valid_mtbf_raw
+        WHERE prev_failure IS NOT NULL{since}
+        GROUP BY asset_group
+    ),
+    failures AS (
+        SELECT asset_group, COUNT(*) AS failure_count
+        FROM main_data
+        WHERE actual_failure_date IS NOT NULL{failure_count_filter}
+        GROUP BY asset_group
+    )
+
+    SELECT
+        f.asset_group,
+        COALESCE(m.mttr, 0) AS mttr,
+        COALESCE(b.mtbf, 0) AS mtbf,
+        f.failure_count
+    FROM failures f
+    LEFT JOIN valid_mttr m ON f.asset_group = m.asset_group
+    LEFT JOIN valid_mtbf b ON f.asset_group = b.asset_group
+    WHERE f.asset_group IS NOT NULL
+    ORDER BY f.failure_count DESC
+    LIMIT 10
+"""
+
+
+def equipment_analytics_query(filters=NO_FILTERS):
+    sql = EQUIPMENT_ANALYTICS_TEMPLATE.format(
+        mttr_filter=filter_sql(filters, "wo_actual_start_date"),
+        failure_filter=filter_sql(filters, "actual_failure_date", lookback=True),
+        since=since_sql(filters, "actual_failure_date"),
+        failure_count_filter=filter_sql(filters, "actual_failure_date"),
+    )
+    return sql, filter_params(filters)
+
+
+EQUIPMENT_ANALYTICS_SQL, _ = equipment_analytics_query()
+
+
+def equipment_analytics_result(rows):
+    return [
+        {
+            "equipment": row[0],       # asset_group
+            "mttr": row[1],            # avg_mttr
+            "mtbf": row[2],            # avg_mtbf
+            "failures": row[3],        # count
+        }
+        for row in rows
+    ]
+
+
+MONTHLY_TREND_TEMPLATE = """
+    WITH monthly_mttr AS (
+        SELECT
+            TO_CHAR(wo_actual_start_date, 'YYYY-MM') AS month,
+            ROUND(AVG(EXTRACT(EPOCH FROM (wo_actual_completion_date - wo_actual_start_date)) / 3600), 1) AS avg_mttr,
+            COUNT(*) AS work_orders
+        FROM main_data
+        WHERE wo_actual_start_date IS NOT NULL AND wo_actual_completion_date IS NOT NULL{mttr_filter}
+        GROUP BY TO_CHAR(wo_actual_start_date, 'YYYY-MM')
+    ),
+
+    mtbf_raw AS (
+        SELECT
+            actual_failure_date,
+            TO_CHAR(actual_failure_date, 'YYYY-MM') AS month,
+            LAG(actual_failure_date) OVER (ORDER BY actual_failure_date) AS prev_date
+        FROM main_data
+        WHERE actual_failure_date IS NOT NULL{failure_filter}
+    ),
+
+    monthly_mtbf AS (
+        SELECT
+            month,
+            ROUND(AVG(EXTRACT(EPOCH FROM (actual_failure_date - prev_date)) / 3600), 1) AS avg_mtbf
+        FROM mtbf_raw
+        WHERE prev_date IS NOT NULL{since}
+        GROUP BY month
+    )
+
+    SELECT
+        mttr.month,
+        mttr.avg_mttr,
+        mtbf.avg_mtbf,
+        mttr.work_orders
+    FROM monthly_mttr mttr
+    LEFT JOIN monthly_mtbf mtbf ON mttr.month = mtbf.month
+    ORDER BY mttr.month
+"""
+
+
+def monthly_trend_query(filters=NO_FILTERS):
+    sql = MONTHLY_TREND_TEMPLATE.format(
+        mttr_filter=filter_sql(filters, "wo_actual_start_date"),
+        failure_filter=filter_sql(filters, "actual_failure_date", lookback=True),
+        since=since_sql(filters, "actual_failure_date"),
+    )
+    return sql, filter_params(filters)
+
+
+MONTHLY_TREND_SQL, _ = monthly_trend_query()
+
+
+def monthly_trend_result(rows):
+    return [
+        {
+            "month": row[0],  # Format 'YYYY-MM'
+            "mttr": row[1],
+            "mtbf": row[2],
+            "workOrders": row[3],
+        }
+        for row in rows
+    ]
+
+
+WEEKLY_DOWNTIME_TEMPLATE = """
+    SELECT
+      DATE_TRUNC('week', wo_actual_start_date) AS week,
+
+      ROUND(SUM(CASE
+        WHEN wo_type IN (
+          'Preventive Maintenance',
+          'Predictive Maintenance',
+          'Planned Maintenance',
+          'Calibration'
+        ) THEN actual_duration / 3600.0
+        ELSE 0
+      END)::numeric, 2) AS planned_hours,
+
+      ROUND(SUM(CASE
+        WHEN wo_type IS NULL
+             OR wo_type NOT IN (
+               'Preventive Maintenance',
+               'Predictive Maintenance',
+               'Planned Maintenance',
+               'Calibration'
+             ) THEN actual_duration / 3600.0
+        ELSE 0
+      END)::numeric, 2) AS unplanned_hours,
+
+      ROUND(SUM(actual_duration / 3600.0)::numeric, 2) AS total_hours
+
+    FROM main_data
+    WHERE
+      wo_actual_start_date IS NOT NULL
+      AND actual_duration IS NOT NULL
+      AND actual_duration BETWEEN 1 AND 10000000{filter}
+
+    GROUP BY DATE_TRUNC('week', wo_actual_start_date)
+    ORDER BY week
+"""
+
+
+def weekly_downtime_query(filters=NO_FILTERS):
+    sql = WEEKLY_DOWNTIME_TEMPLATE.format(filter=filter_sql(filters, "wo_actual_start_date"))
+    return sql, filter_params(filters)
+
+
+WEEKLY_DOWNTIME_SQL, _ = weekly_downtime_query()
+
+
+def weekly_downtime_result(rows):
+    return [
+        {
+            "week": row[0].strftime("%Y-%m-%d"),
+            "planned": float(row[1]),
+            "unplanned": float(row[2]),
+            "total": float(row[3]),
+        }
+        for row in rows
+    ]
+
+
+ENERGY_DAILY_SQL = """
+    SELECT *
+    FROM (
+        SELECT
+            date,
+            day_name AS name,
+            electricity_consumption AS listrik,
+            water_consumption AS air,
+            cng_consumption AS cng
+        FROM energy_daily_fact
+        ORDER BY date DESC
+        LIMIT 7
+    ) AS recent_data
+    ORDER BY date ASC
+"""
+
+
+def energy_daily_result(rows):
+    return [
+        {"name": row[1], "listrik": float(row[2]), "air": float(row[3]), "cng": float(row[4])}
+        for row in rows
+    ]
@@ -0,0 +1,761 @@
+import logging
+import threading
+import time
+from datetime import date, datetime, timedelta
+from decimal import ROUND_HALF_UP, Context, Decimal
+
+import numpy as np
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import connection, transaction
+
+from .dataversion import async_request_data_version, request_data_version
+from .filters import DIMENSIONS, NO_FILTERS, created_range, lookback_from
+
+# The MTTR / MTBF endpoints all reduce the same few columns of main_data. The
+# engine keeps those columns in this process as NumPy arrays (timestamps as
+# int64 microseconds, text columns as int32 category codes) and answers every
+# endpoint with vectorised diffs and group reductions, matching their SQL to
+# the digit. After a write it only re-reads the wo_created_date days logged in
+# main_data_change since its last snapshot.
+#
+# Matching the SQL means rounding like postgres: ROUND(AVG(EXTRACT(EPOCH FROM
+# ...) / 3600), n) divides every row in numeric, rounded at the scale
+# numeric.c's select_div_scale() picks, before averaging; quotient_sums() keeps
+# track of those roundings. SUM(actual_duration / 3600.0)::numeric goes through
+# float8 instead when actual_duration is a float column.
+
+logger = logging.getLogger(__name__)
+
+DEFAULTS = {
+    "ENABLED": True,
+    "FULL_RELOAD_INTERVAL": 6 * 3600,
+}
+
+NAT = np.iinfo(np.int64).min
+DAY_US = 86_400_000_000
+EPOCH_DATE = date(1970, 1, 1)
+
+LOAD_BATCH_SIZE = 20000
+
+# numeric.c: NUMERIC_MIN_SIG_DIGITS, and enough precision for exact sums
+NUMERIC_MIN_SIG_DIGITS = 16
+NUMERIC = Context(prec=1000, rounding=ROUND_HALF_UP)
+
+# |microseconds| from which (us / 10^6) / 3600 has quotient weight -2 .. 2
+QWEIGHT_BOUNDS = np.array([37, 3601 * 10**2, 3601 * 10**6, 3601 * 10**10, 3601 * 10**14], dtype=np.int64)
+POW10_MOD_3600 = np.array([pow(10, exponent, 3600) for exponent in range(64)], dtype=np.int64)
+# rounding error of us * 10^k / 3600 for k >= 4, where 10^k = 2800 (mod 3600),
+# by us mod 9, in units of 1 / 3600
+QUOTIENT_ERRORS = np.array(
+    [3600 - r if 2 * r >= 3600 else -r for r in (n * 2800 % 3600 for n in range(9))], dtype=np.int64
+)
+
+# actual_duration types that make actual_duration / 3600.0 a float8 division;
+# the float8 sum keeps DBL_DIG (15) significant digits when cast to numeric
+FLOAT_TYPES = ("real", "double precision")
+
+PLANNED_WORK_TYPES = (
+    "Preventive Maintenance",
+    "Predictive Maintenance",
+    "Planned Maintenance",
+    "Calibration",
+)
+CATEGORY_RESOURCES = ("MTC", "CAL", "UTY")
+
+TIME_COLUMNS = (
+    "created",
+    "scheduled_start",
+    "scheduled_completion",
+    "actual_start",
+    "actual_completion",
+    "failure",
+)
+CATEGORY_COLUMNS = ("resource", "asset_group", "asset", "department")
+
+
+def _epoch_us(col):
+    # wall-clock microseconds in the session time zone, the clock DATE(),
+    # TO_CHAR() and DATE_TRUNC() bucket on in the SQL; NULL becomes NAT
+    return f"COALESCE((EXTRACT(EPOCH FROM m.{col}::timestamp) * 1000000)::bigint, {NAT})"
+
+
+LOAD_SQL = """
+    SELECT
+        {created},
+        {scheduled_start},
+        {scheduled_completion},
+        {actual_start},
+        {actual_completion},
+        {failure},
+        m.actual_duration::float8,
+        COALESCE(m.wo_type IN ({planned}), false),
+        m.resource,
+        m.asset_group,
+        m.no_asset_of_wo,
+        m.department
+    FROM main_data m
+""".format(
+    created=_epoch_us("wo_created_date"),
+    scheduled_start=_epoch_us("wo_scheduled_start_date"),
+    scheduled_completion=_epoch_us("wo_scheduled_completion_date"),
+    actual_start=_epoch_us("wo_actual_start_date"),
+    actual_completion=_epoch_us("wo_actual_completion_date"),
+    failure=_epoch_us("actual_failure_date"),
+    planned=", ".join(f"'{work_type}'" for work_type in PLANNED_WORK_TYPES),
+)
+
+# main_data rows created within the given [lo, hi) ranges
+LOAD_RANGES_SQL = LOAD_SQL + """
+    JOIN unnest(%s::timestamp[], %s::timestamp[]) AS r(lo, hi)
+      ON m.wo_created_date >= r.lo AND m.wo_created_date < r.hi
+"""
+
+SNAPSHOT_XMIN_SQL = "SELECT pg_snapshot_xmin(pg_current_snapshot())::text::bigint"
+
+DURATION_TYPE_SQL = """
+    SELECT atttypid::regtype::text
+    FROM pg_attribute
+    WHERE attrelid = 'main_data'::regclass AND attname = 'actual_duration'
+"""
+
+CHANGED_DAYS_SQL = "SELECT DISTINCT day FROM main_data_change WHERE xid >= %s"
+
+# Statement triggers on main_data log the wo_created_date days each transaction
+# writes into main_data_change; TRUNCATE has no transition table and logs a
+# NULL day (full reload). Migration 0014 installs them if main_data exists at
+# migrate time, `manage.py install_change_triggers` once it does.
+CHANGE_FUNCTION_SQL = """
+    CREATE OR REPLACE FUNCTION main_data_log_change() RETURNS trigger AS $$
+    BEGIN
+        IF TG_OP = 'TRUNCATE' THEN
+            INSERT INTO main_data_change (xid, day, changed_at)
+            VALUES (pg_current_xact_id()::text::bigint, NULL, now());
+            RETURN NULL;
+        END IF;
+        IF TG_OP IN ('INSERT', 'UPDATE') THEN
+            INSERT INTO main_data_change (xid, day, changed_at)
+            SELECT DISTINCT pg_current_xact_id()::text::bigint, wo_created_date::date, now() FROM new_rows;
+        END IF;
+        IF TG_OP IN ('UPDATE', 'DELETE') THEN
+            INSERT INTO main_data_change (xid, day, changed_at)
+            SELECT DISTINCT pg_current_xact_id()::text::bigint, wo_created_date::date, now() FROM old_rows;
+        END IF;
+        RETURN NULL;
+    END;
+    $$ LANGUAGE plpgsql
+"""
+
+# trigger name -> CREATE OR REPLACE TRIGGER of it on main_data
+CHANGE_TRIGGERS = {
+    "main_data_change_insert": """
+        CREATE OR REPLACE TRIGGER main_data_change_insert AFTER INSERT ON main_data
+        REFERENCING NEW TABLE AS new_rows
+        FOR EACH STATEMENT EXECUTE FUNCTION main_data_log_change()
+    """,
+    "main_data_change_update": """
+        CREATE OR REPLACE TRIGGER main_data_change_update AFTER UPDATE ON main_data
+        REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+        FOR EACH STATEMENT EXECUTE FUNCTION main_data_log_change()
+    """,
+    "main_data_change_delete": """
+        CREATE OR REPLACE TRIGGER main_data_change_delete AFTER DELETE ON main_data
+        REFERENCING OLD TABLE AS old_rows
+        FOR EACH STATEMENT EXECUTE FUNCTION main_data_log_change()
+    """,
+    "main_data_change_truncate": """
+        CREATE OR REPLACE TRIGGER main_data_change_truncate AFTER TRUNCATE ON main_data
+        FOR EACH STATEMENT EXECUTE FUNCTION main_data_log_change()
+    """,
+}
+
+INSTALLED_CHANGE_TRIGGERS_SQL = """
+    SELECT tgname FROM pg_trigger
+    WHERE tgrelid = to_regclass('main_data') AND tgname = ANY(%s::text[])
+"""
+
+# must stay longer than FULL_RELOAD_INTERVAL
+TRIM_CHANGES_SQL = "DELETE FROM main_data_change WHERE changed_at < now() - INTERVAL '1 day'"
+
+
+def engine_setting(name):
+    return getattr(settings, "RELIABILITY_ENGINE", {}).get(name, DEFAULTS[name])
+
+
+def engine_enabled():
+    return engine_setting("ENABLED")
+
+
+def missing_change_triggers(cursor):
+    """The change-log triggers not installed on main_data (all of them without the table)."""
+    cursor.execute(INSTALLED_CHANGE_TRIGGERS_SQL, [list(CHANGE_TRIGGERS)])
+    installed = {row[0] for row in cursor.fetchall()}
+    return [name for name in CHANGE_TRIGGERS if name not in installed]
+
+
+def install_change_triggers(cursor):
+    cursor.execute(CHANGE_FUNCTION_SQL)
+    for sql in CHANGE_TRIGGERS.values():
+        cursor.execute(sql)
+
+
+class Categories:
+    """Append-only value <-> code mapping of one text column (None is a value too)."""
+
+    def __init__(self):
+        self.values = []
+        self.codes = {}
+
+    def code(self, value):
+        code = self.codes.get(value)
+        if code is None:
+            code = self.codes[value] = len(self.values)
+            self.values.append(value)
+        return code
+
+    def encode(self, values):
+        return np.array([self.code(value) for value in values], dtype=np.int32)
+
+
+def group_sum(keys, values):
+    """
+    Sorts `values` by `keys` and reduces each run: returns (unique keys, sums,
+    counts). Integer input stays int64, so sums of microseconds are exact.
+    """
+    if not len(keys):
+        return keys, values, np.zeros(0, dtype=np.int64)
+    order = np.argsort(keys, kind="stable")
+    keys = keys[order]
+    starts = np.flatnonzero(np.r_[True, keys[1:] != keys[:-1]])
+    sums = np.add.reduceat(values[order], starts)
+    counts = np.diff(np.r_[starts, len(keys)])
+    return keys[starts], sums, counts
+
+
+def _round_div(num, den):
+    # num / den for den > 0, rounded half away from zero like numeric
+    quotient, remainder = divmod(abs(num), den)
+    if 2 * remainder >= den:
+        quotient += 1
+    return -quotient if num < 0 else quotient
+
+
+def numeric_mean(total, scale, count, places):
+    """
+    ROUND(AVG(x), places) of `count` numeric values summing to
+    total * 10^-scale: numeric_div() of the sum by the count, rounded half
+    away from zero at select_div_scale() (at least 16 significant digits and
+    no less than the sum's scale), then rounded to `places`.
+    """
+    magnitude = abs(total)
+    weight1 = (len(str(magnitude)) - 1 - scale) // 4 if total else 0
+    shift = scale + 4 * weight1
+    first1 = magnitude // 10**shift if shift >= 0 else magnitude * 10**-shift
+    weight2 = (len(str(count)) - 1) // 4
+    qweight = weight1 - weight2 - (first1 <= count // 10 ** (4 * weight2))
+    rscale = min(max(NUMERIC_MIN_SIG_DIGITS - 4 * qweight, scale, 0), 1000)
+    quotient = _round_div(total * 10 ** (rscale - scale), count)
+    if rscale > places:
+        quotient = _round_div(quotient, 10 ** (rscale - places))
+    else:
+        quotient *= 10 ** (places - rscale)
+    return Decimal(quotient).scaleb(-places, NUMERIC)
+
+
+def numeric_round(value, places):
+    # ROUND(numeric, places); numeric has no negative zero
+    value = value.quantize(Decimal(1).scaleb(-places), context=NUMERIC)
+    return value.copy_abs() if value.is_zero() else value
+
+
+def _quotient_scales(magnitude):
+    # select_div_scale() of (us / 10^6 seconds) / 3600 per |us|: 16 digits
+    # from the quotient's weight, which steps up where the seconds' first
+    # base-10000 digit passes 3600. The seconds have 6 decimals at most, below
+    # the scale picked for any duration under ~10^11 s.
+    steps = (magnitude >= QWEIGHT_BOUNDS[0]).view(np.int8).copy()
+    for bound in QWEIGHT_BOUNDS[1:]:
+        steps += (magnitude >= bound).view(np.int8)
+    scales = NUMERIC_MIN_SIG_DIGITS + 12 - 4 * steps
+    scales[magnitude == 0] = NUMERIC_MIN_SIG_DIGITS + 4
+    return scales
+
+
+def quotient_sums(keys, us):
+    """
+    SUM(seconds / 3600) in numeric of the microsecond values `us` grouped by
+    `keys`, each row's quotient rounded at its own scale as numeric does:
+    (unique keys, sums, scales, counts), a sum being an int in units of
+    10^-scale at the largest row scale of its group.
+
+    The rounding error of every row is an integer in units of
+    1 / (3600 * 10^scale) hours, so the sums stay exact in int64: the exact
+    sum of `us` plus the errors summed per scale.
+    """
+    if not len(keys):
+        return keys, [], [], np.zeros(0, dtype=np.int64)
+    magnitude = np.abs(us)
+    scales = _quotient_scales(magnitude)
+    # us * 10^(scale - 6) mod 3600, which for scale >= 10 only depends on us mod 9
+    errors = QUOTIENT_ERRORS[magnitude % 9]
+    wide = np.flatnonzero(scales < 10)
+    if len(wide):
+        remainders = magnitude[wide] % 3600 * POW10_MOD_3600[scales[wide] - 6] % 3600
+        errors[wide] = np.where(2 * remainders >= 3600, 3600 - remainders, -remainders)
+    negative = np.flatnonzero(us < 0)
+    errors[negative] = -errors[negative]
+
+    # integer sums don't depend on the order within a group
+    order = np.argsort(keys)
+    keys, us, scales, errors = keys[order], us[order], scales[order], errors[order]
+    starts = np.flatnonzero(np.r_[True, keys[1:] != keys[:-1]])
+    top = int(scales.max())
+    totals = [int(total) * 10 ** (top - 6) for total in np.add.reduceat(us, starts).tolist()]
+    for scale in np.flatnonzero(np.bincount(scales)).tolist():
+        at_scale = np.add.reduceat(np.where(scales == scale, errors, 0), starts)
+        for i, error in enumerate(at_scale.tolist()):
+            totals[i] += error * 10 ** (top - scale)
+    group_scales = np.maximum.reduceat(scales, starts).tolist()
+    # total / 3600 is the sum in units of 10^-top
+    totals = [total // 3600 // 10 ** (top - scale) for total, scale in zip(totals, group_scales)]
+    return keys[starts], totals, group_scales, np.diff(np.r_[starts, len(keys)])
+
+
+def hours(keys, us, places):
+    """
+    {key: ROUND(AVG(EXTRACT(EPOCH FROM interval) / 3600), places)} of the
+    microsecond intervals `us` grouped by `keys`.
+    """
+    unique, sums, scales, counts = quotient_sums(keys, us)
+    return {
+        key: numeric_mean(total, scale, count, places)
+        for key, total, scale, count in zip(unique.tolist(), sums, scales, counts.tolist())
+    }
+
+
+def _hour_sums(keys, seconds, floats):
+    # (unique keys, unrounded SUM(seconds / 3600.0)::numeric) for sum_hours()
+    if not floats:
+        unique, sums, scales, _ = quotient_sums(keys, np.rint(seconds * 1_000_000).astype(np.int64))
+        return unique, [Decimal(total).scaleb(-scale, NUMERIC) for total, scale in zip(sums, scales)]
+    if not len(keys):
+        return keys, []
+    order = np.argsort(keys, kind="stable")
+    keys, quotients = keys[order], seconds[order] / 3600.0
+    starts = np.flatnonzero(np.r_[True, keys[1:] != keys[:-1]])
+    bounds = np.r_[starts, len(keys)]
+    totals = [
+        # SUM(float8) adds row by row, as cumsum does
+        np.cumsum(quotients[lo:hi])[-1]
+        for lo, hi in zip(bounds[:-1], bounds[1:])
+    ]
+    return keys[starts], [Decimal(f"{total:.15g}") for total in totals]
+
+
+def sum_hours(keys, seconds, floats=False, places=2):
+    """
+    (unique keys, [ROUND(SUM(seconds / 3600.0)::numeric, places)]) of the
+    `seconds` grouped by `keys`. With `floats` (a float actual_duration) the
+    division and the sum are float8, row by row in load order, and the total
+    keeps 15 significant digits. Otherwise seconds are numeric with up to 6
+    decimals.
+    """
+    unique, sums = _hour_sums(keys, seconds, floats)
+    return unique, [numeric_round(total, places) for total in sums]
+
+
+def time_key(us, by):
+    days = us // DAY_US
+    if by == "day":
+        return days
+    if by == "week":
+        # DATE_TRUNC('week', ...): back to Monday (1970-01-01 was a Thursday)
+        return days - (days - 4) % 7
+    if by == "month":
+        return us.view("M8[us]").astype("M8[M]").astype(np.int64)
+    raise ValueError(f"Unknown grouping: {by}")
+
+
+def wall_clock_us(value):
+    # an aware datetime on the engine's clock, see _epoch_us()
+    wall = value.astimezone(connection.timezone).replace(tzinfo=None)
+    return (wall - datetime(1970, 1, 1)) // timedelta(microseconds=1)
+
+
+def time_labels(keys, by):
+    unit = "M" if by == "month" else "D"
+    return np.asarray(keys, dtype=np.int64).astype(f"M8[{unit}]").astype(str).tolist()
+
+
+class ReliabilityFrame:
+    """
+    One immutable load of the main_data columns. Every metric is grouped `by`
+    a category column (resource, asset_group, asset, department) or by the
+    day / week / month of the metric's own timestamp. repair_times() and
+    failure_intervals() return per-row (keys, values) for hours(); counts()
+    and downtime() return the groups. `filters` (filters.py)
+    restrict the rows exactly as the filtered SQL does.
+    """
+
+    def __init__(self, columns, categories, duration_type="numeric"):
+        self.columns = columns
+        self.categories = categories
+        self.duration_type = duration_type
+        self._memo = {}
+
+    def __len__(self):
+        return len(self.columns["created"])
+
+    def code(self, column, value):
+        return self.categories[column].codes.get(value)
+
+    def value(self, column, code):
+        return self.categories[column].values[code]
+
+    def _mask(self, filters, time_column, lookback=False):
+        # rows in `filters`; a NULL `time_column` only falls out with a date
+        # range, as in filter_sql(), so callers require their own NOT NULLs
+        times = self.columns[time_column]
+        mask = np.ones(len(times), bool)
+        date_from = lookback_from(filters) if lookback else filters.date_from
+        if date_from is not None or filters.date_to is not None:
+            mask &= times != NAT
+        if date_from is not None:
+            mask &= times >= wall_clock_us(date_from)
+        if filters.date_to is not None:
+            mask &= times < wall_clock_us(filters.date_to)
+        created = created_range(filters, lookback) if time_column != "created" else None
+        if created is not None:
+            # the partition-pruning bound of filter_sql()
+            in_window = np.ones(len(times), bool)
+            if created[0] is not None:
+                in_window &= self.columns["created"] >= wall_clock_us(created[0])
+            if created[1] is not None:
+                in_window &= self.columns["created"] < wall_clock_us(created[1])
+            mask &= in_window | (self.columns["created"] == NAT)
+        for name in DIMENSIONS:
+            values = getattr(filters, name)
+            if values:
+                codes = [self.code(name, value) for value in values]
+                mask &= np.isin(self.columns[name], [code for code in codes if code is not None])
+        return mask
+
+    def _key(self, by, rows, time_column):
+        if by in CATEGORY_COLUMNS:
+            return self.columns[by][rows]
+        return time_key(self.columns[time_column][rows], by)
+
+    def repair_times(self, by, basis="actual", non_negative=False, filters=NO_FILTERS):
+        """(keys, completion - start) of the work orders that have both, keyed by `by` of the start."""
+        start = self.columns[f"{basis}_start"]
+        end = self.columns[f"{basis}_completion"]
+        mask = self._mask(filters, f"{basis}_start") & (start != NAT) & (end != NAT)
+        if non_negative:
+            mask &= end >= start
+        rows = np.flatnonzero(mask)
+        return self._key(by, rows, f"{basis}_start"), end[rows] - start[rows]
+
+    def _failure_rows(self, partition=None, first_per_asset_day=False, filters=NO_FILTERS):
+        # failure rows (from the look-back on) ordered by (partition, failure
+        # time), and whether each one has a predecessor in its partition;
+        # memoised for the unfiltered frame only
+        memo_key = ("failures", partition, first_per_asset_day)
+        if filters != NO_FILTERS or memo_key not in self._memo:
+            failure = self.columns["failure"]
+            rows = np.flatnonzero(self._mask(filters, "failure", lookback=True) & (failure != NAT))
+            if first_per_asset_day:
+                # MIN(actual_failure_date) GROUP BY DATE(actual_failure_date), no_asset_of_wo
+                day, asset = failure[rows] // DAY_US, self.columns["asset"][rows]
+                order = np.lexsort((failure[rows], asset, day))
+                day, asset = day[order], asset[order]
+                first = np.ones(len(rows), dtype=bool)
+                first[1:] = (day[1:] != day[:-1]) | (asset[1:] != asset[:-1])
+                rows = rows[order][first]
+            has_previous = np.zeros(len(rows), dtype=bool)
+            if partition is None:
+                rows = rows[np.argsort(failure[rows], kind="stable")]
+                has_previous[1:] = True
+            else:
+                groups = self.columns[partition][rows]
+                order = np.lexsort((failure[rows], groups))
+                rows, groups = rows[order], groups[order]
+                has_previous[1:] = groups[1:] == groups[:-1]
+            if filters != NO_FILTERS:
+                return rows, has_previous
+            self._memo[memo_key] = (rows, has_previous)
+        return self._memo[memo_key]
+
+    def failure_intervals(self, by, partition=None, first_per_asset_day=False, filters=NO_FILTERS):
+        """
+        (keys, time since the previous failure in the same `partition`) (LAG
+        over actual_failure_date), keyed by `by` of the later failure. Failures
+        in the look-back before `from` only serve as predecessors.
+        """
+        rows, has_previous = self._failure_rows(partition, first_per_asset_day, filters)
+        failure = self.columns["failure"][rows]
+        diffs = np.diff(failure, prepend=failure[:1])
+        if filters.date_from is not None:
+            has_previous = has_previous & (failure >= wall_clock_us(filters.date_from))
+        later = rows[has_previous]
+        return self._key(by, later, "failure"), diffs[has_previous]
+
+    def counts(self, by, failures_only=False, filters=NO_FILTERS):
+        """Work orders per `by` of wo_created_date, or failures per `by` of actual_failure_date."""
+        time_column = "failure" if failures_only else "created"
+        if failures_only:
+            rows = np.flatnonzero(self._mask(filters, time_column) & (self.columns["failure"] != NAT))
+        elif filters != NO_FILTERS:
+            rows = np.flatnonzero(self._mask(filters, time_column))
+        else:
+            rows = np.arange(len(self))
+        return group_sum(self._key(by, rows, time_column), np.ones(len(rows), dtype=np.int64))
+
+    def downtime(self, by="week", filters=NO_FILTERS):
+        """(keys, planned, unplanned, total hours) of actual_duration per `by` of the actual start."""
+        duration = self.columns["duration"]
+        rows = np.flatnonzero(
+            self._mask(filters, "actual_start")
+            & (self.columns["actual_start"] != NAT)
+            & (duration >= 1)
+            & (duration <= 10_000_000)
+        )
+        row_keys = self._key(by, rows, "actual_start")
+        floats = self.duration_type in FLOAT_TYPES
+        # the planned and unplanned sums in one pass, grouped by (key, planned)
+        pairs, sums = _hour_sums(2 * row_keys + self.columns["planned"][rows], duration[rows], floats)
+        keys = np.unique(pairs // 2)
+        planned_sums, unplanned_sums = [Decimal(0)] * len(keys), [Decimal(0)] * len(keys)
+        for slot, pair, total in zip(np.searchsorted(keys, pairs // 2).tolist(), pairs.tolist(), sums):
+            (planned_sums if pair % 2 else unplanned_sums)[slot] = total
+        if floats:
+            # the float8 total adds the rows of both in load order
+            _, total_sums = _hour_sums(row_keys, duration[rows], floats)
+        else:
+            total_sums = [NUMERIC.add(planned, unplanned) for planned, unplanned in zip(planned_sums, unplanned_sums)]
+        planned_hours = [numeric_round(total, 2) for total in planned_sums]
+        unplanned_hours = [numeric_round(total, 2) for total in unplanned_sums]
+        total_hours = [numeric_round(total, 2) for total in total_sums]
+        return keys, planned_hours, unplanned_hours, total_hours
+
+
+class ReliabilityEngine:
+    """
+    Process-wide holder of the current ReliabilityFrame. frame(version) returns
+    a frame loaded at (or after) the given data_version("main_data"); when the
+    version moved on it reads the change log under a REPEATABLE READ snapshot
+    and swaps in a new frame. Requests keep using the frame they got.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._frame = None
+        self._duration_type = None
+        # whether main_data_change sees every write; without its triggers any
+        # new version is a full reload
+        self._tracked = False
+        self._version = None
+        self._xmin = None
+        self._loaded_at = 0.0
+        self._categories = {name: Categories() for name in CATEGORY_COLUMNS}
+
+    def frame(self, version):
+        if self._frame is not None and self._version == version:
+            return self._frame
+        with self._lock:
+            if self._frame is None or self._version != version:
+                self._refresh(version)
+            return self._frame
+
+    def _refresh(self, version):
+        full = (
+            self._frame is None
+            or not self._tracked
+            or time.monotonic() - self._loaded_at > engine_setting("FULL_RELOAD_INTERVAL")
+        )
+        outermost = not connection.in_atomic_block
+        with transaction.atomic(), connection.cursor() as cursor:
+            if outermost:
+                cursor.execute("SET TRANSACTION ISOLATION LEVEL REPEATABLE READ")
+            cursor.execute(SNAPSHOT_XMIN_SQL)
+            xmin = cursor.fetchone()[0]
+            if not full:
+                cursor.execute(CHANGED_DAYS_SQL, [self._xmin])
+                days = [row[0] for row in cursor.fetchall()]
+                full = None in days
+            if full:
+                missing = missing_change_triggers(cursor)
+                if missing and (self._frame is None or self._tracked):
+                    logger.warning(
+                        "main_data has no %s trigger(s); reloading the whole of it on every change. "
+                        "Run `manage.py install_change_triggers`.", ", ".join(missing)
+                    )
+                self._tracked = not missing
+                cursor.execute(DURATION_TYPE_SQL)
+                self._duration_type = cursor.fetchone()[0]
+                columns = self._load(cursor, LOAD_SQL)
+                cursor.execute(TRIM_CHANGES_SQL)
+            elif days:
+                columns = self._reload_days(cursor, days)
+            else:
+                columns = self._frame.columns
+
+        self._frame = ReliabilityFrame(columns, self._categories, self._duration_type)
+        self._version, self._xmin = version, xmin
+        if full:
+            self._loaded_at = time.monotonic()
+
+    def _load(self, cursor, sql, params=None):
+        cursor.execute(sql, params)
+        batches = []
+        while True:
+            rows = cursor.fetchmany(LOAD_BATCH_SIZE)
+            if not rows:
+                break
+            batches.append(frame_columns(rows, self._categories))
+        return _concat(batches)
+
+    def _reload_days(self, cursor, days):
+        # the log holds days in the writer's time zone: widen each by a day on
+        # both sides, drop those rows and read them again
+        touched = sorted({day + timedelta(days=offset) for day in days for offset in (-1, 0, 1)})
+        ranges = []
+        for day in touched:
+            if ranges and ranges[-1][1] == day:
+                ranges[-1][1] = day + timedelta(days=1)
+            else:
+                ranges.append([day, day + timedelta(days=1)])
+
+        current = self._frame.columns
+        touched_numbers = np.array([(day - EPOCH_DATE).days for day in touched], dtype=np.int64)
+        keep = ~np.isin(current["created"] // DAY_US, touched_numbers)
+        kept = {name: values[keep] for name, values in current.items()}
+
+        lows = [datetime.combine(lo, datetime.min.time()) for lo, _ in ranges]
+        highs = [datetime.combine(hi, datetime.min.time()) for _, hi in ranges]
+        return _concat([kept, self._load(cursor, LOAD_RANGES_SQL, [lows, highs])])
+
+
+def frame_columns(rows, categories):
+    """The frame columns of LOAD_SQL `rows`, text columns encoded through `categories`."""
+    values = list(zip(*rows))
+    columns = {name: np.array(values[i], dtype=np.int64) for i, name in enumerate(TIME_COLUMNS)}
+    columns["duration"] = np.array(values[6], dtype=np.float64)
+    columns["planned"] = np.array(values[7], dtype=bool)
+    for i, name in enumerate(CATEGORY_COLUMNS):
+        columns[name] = categories[name].encode(values[8 + i])
+    return columns
+
+
+def _concat(batches):
+    if not batches:
+        empty = {name: np.zeros(0, dtype=np.int64) for name in TIME_COLUMNS}
+        empty["duration"] = np.zeros(0, dtype=np.float64)
+        empty["planned"] = np.zeros(0, dtype=bool)
+        empty.update({name: np.zeros(0, dtype=np.int32) for name in CATEGORY_COLUMNS})
+        return empty
+    return {name: np.concatenate([batch[name] for batch in batches]) for name in batches[0]}
+
+
+engine = ReliabilityEngine()
+
+
+def request_frame(request):
+    return engine.frame(request_data_version(request, "main_data"))
+
+
+async def async_request_frame(request):
+    version = await async_request_data_version(request, "main_data")
+    return await sync_to_async(engine.frame)(version)
+
+
+# Endpoint results, shaped exactly like queries.<name>_result(rows).
+
+def analytic_result(frame, filters=NO_FILTERS):
+    mttr = hours(*frame.repair_times("day", basis="scheduled", filters=filters), 2)
+    keys, values = frame.failure_intervals("day", first_per_asset_day=True, filters=filters)
+    mtbf_hours = hours(keys, values, 2)
+    unique, _, counts = group_sum(keys, values)
+    mtbf = {key: (mtbf_hours[key], n) for key, n in zip(unique.tolist(), counts.tolist())}
+
+    days = sorted(mttr.keys() | mtbf.keys())
+    result = []
+    for day, label in zip(days, time_labels(days, "day")):
+        mtbf_hours, failure_count = mtbf.get(day, (None, None))
+        result.append({
+            "date": label,
+            "mttr_hours": mttr.get(day),
+            "mtbf_hours": mtbf_hours,
+            "failure_count": failure_count,
+        })
+    return result
+
+
+def category_analytics_result(frame, filters=NO_FILTERS):
+    keys, _, counts = frame.counts("resource", filters=filters)
+    work_orders = dict(zip(keys.tolist(), counts.tolist()))
+    mttr = hours(*frame.repair_times("resource", non_negative=True, filters=filters), 1)
+    mtbf = hours(*frame.failure_intervals("resource", partition="resource", filters=filters), 1)
+
+    result = []
+    for resource in CATEGORY_RESOURCES:
+        code = frame.code("resource", resource)
+        if code not in work_orders:
+            continue
+        result.append({
+            "category": resource,
+            "count": work_orders[code],
+            "avgMttr": mttr.get(code, Decimal(0)),
+            "avgMtbf": mtbf.get(code, Decimal(0)),
+        })
+    return result
+
+
+def equipment_analytics_result(frame, filters=NO_FILTERS):
+    keys, _, counts = frame.counts("asset_group", failures_only=True, filters=filters)
+    failures = [
+        (frame.value("asset_group", key), key, count)
+        for key, count in zip(keys.tolist(), counts.tolist())
+        if frame.value("asset_group", key) is not None
+    ]
+    failures.sort(key=lambda item: (-item[2], item[0]))
+    mttr = hours(*frame.repair_times("asset_group", filters=filters), 1)
+    mtbf = hours(*frame.failure_intervals("asset_group", partition="asset_group", filters=filters), 1)
+
+    return [
+        {
+            "equipment": asset_group,
+            "mttr": mttr.get(code, Decimal(0)),
+            "mtbf": mtbf.get(code, Decimal(0)),
+            "failures": count,
+        }
+        for asset_group, code, count in failures[:10]
+    ]
+
+
+def monthly_trend_result(frame, filters=NO_FILTERS):
+    mtbf = hours(*frame.failure_intervals("month", filters=filters), 1)
+    keys, values = frame.repair_times("month", filters=filters)
+    mttr = hours(keys, values, 1)
+    keys, _, counts = group_sum(keys, values)
+    return [
+        {
+            "month": label,
+            "mttr": mttr[key],
+            "mtbf": mtbf.get(key),
+            "workOrders": n,
+        }
+        for key, label, n in zip(keys.tolist(), time_labels(keys, "month"), counts.tolist())
+    ]
+
+
+def weekly_downtime_result(frame, filters=NO_FILTERS):
+    keys, planned, unplanned, total = frame.downtime("week", filters=filters)
+    return [
+        {
+            "week": label,
+            "planned": float(p),
+            "unplanned": float(u),
+            "total": float(t),
+        }
+        for label, p, u, t in zip(time_labels(keys, "week"), planned, unplanned, total)
+    ]
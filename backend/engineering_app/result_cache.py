@@ -0,0 +1,161 @@
+import asyncio
+import hashlib
+import logging
+import threading
+import time
+from functools import wraps
+
+from asgiref.sync import iscoroutinefunction
+from django.conf import settings
+from django.core.cache import caches
+from django.db import connections
+from django.http import HttpResponse
+
+from .conditional import stamp_version
+from .dataversion import async_request_data_version, request_data_version
+
+logger = logging.getLogger(__name__)
+
+DEFAULTS = {
+    "ALIAS": "analytics",
+    "TTL": 3600,
+    "STALE_WHILE_REVALIDATE": 300,
+    "ENDPOINT_TTLS": {},
+}
+
+# keeps background revalidation tasks of async views alive until they finish
+_background_tasks = set()
+
+
+def cache_setting(name):
+    return getattr(settings, "ANALYTICS_CACHE", {}).get(name, DEFAULTS[name])
+
+
+def result_cache_key(endpoint, request):
+    params = sorted((key, sorted(values)) for key, values in request.GET.lists())
+    digest = hashlib.md5(repr(params).encode()).hexdigest()
+    return f"analytics:{endpoint}:{digest}"
+
+
+def _entry(version, response):
+    return {
+        "version": version,
+        "computed_at": time.time(),
+        "content": response.content,
+        "content_type": response["Content-Type"],
+    }
+
+
+def _entry_state(entry, version, ttl, swr):
+    if entry is None:
+        return None
+    age = time.time() - entry["computed_at"]
+    if entry["version"] == version and age < ttl:
+        return "HIT"
+    if age < ttl + swr:
+        return "STALE"
+    return None
+
+
+def _cached_response(request, entry, state):
+    response = HttpResponse(entry["content"], content_type=entry["content_type"])
+    response["X-Cache"] = state
+    # a STALE body may come from an older version than the current one; its
+    # validators must say so, or a client revalidating with them would be
+    # told its outdated copy is current
+    return stamp_version(response, request, entry["version"])
+
+
+def _revalidate(cache, key, version, view, request, args, kwargs, ttl, swr):
+    try:
+        response = view(request, *args, **kwargs)
+        if response.status_code == 200:
+            cache.set(key, _entry(version, response), timeout=ttl + swr)
+    except Exception:
+        logger.exception("Background refresh of %s failed", key)
+    finally:
+        cache.delete(key + ":refreshing")
+        connections.close_all()
+
+
+async def _arevalidate(cache, key, version, view, request, args, kwargs, ttl, swr):
+    try:
+        response = await view(request, *args, **kwargs)
+        if response.status_code == 200:
+            await cache.aset(key, _entry(version, response), timeout=ttl + swr)
+    except Exception:
+        logger.exception("Background refresh of %s failed", key)
+    finally:
+        await cache.adelete(key + ":refreshing")
+
+
+def cached_result(endpoint, tables=("main_data",)):
+    """
+    Caches a JSON view's body under endpoint + query parameters. Each entry
+    remembers the data_version() of `tables` it was computed from: it is fresh
+    while that version is current and younger than the TTL. A stale entry is
+    still served for STALE_WHILE_REVALIDATE seconds past the TTL while one
+    background thread (or task, for async views) recomputes it.
+    """
+    def lookup(request):
+        cache = caches[cache_setting("ALIAS")]
+        ttl = cache_setting("ENDPOINT_TTLS").get(endpoint, cache_setting("TTL"))
+        swr = cache_setting("STALE_WHILE_REVALIDATE")
+        return cache, result_cache_key(endpoint, request), ttl, swr
+
+    def decorator(view):
+        if iscoroutinefunction(view):
+            @wraps(view)
+            async def async_wrapper(request, *args, **kwargs):
+                if request.method != "GET":
+                    return await view(request, *args, **kwargs)
+
+                cache, key, ttl, swr = lookup(request)
+                version = await async_request_data_version(request, *tables)
+                entry = await cache.aget(key)
+                state = _entry_state(entry, version, ttl, swr)
+
+                if state is None:
+                    response = await view(request, *args, **kwargs)
+                    if response.status_code == 200 and not response.streaming:
+                        await cache.aset(key, _entry(version, response), timeout=ttl + swr)
+                    response["X-Cache"] = "MISS"
+                    return response
+
+                if state == "STALE" and await cache.aadd(key + ":refreshing", 1, timeout=max(swr, 30)):
+                    task = asyncio.create_task(
+                        _arevalidate(cache, key, version, view, request, args, kwargs, ttl, swr)
+                    )
+                    _background_tasks.add(task)
+                    task.add_done_callback(_background_tasks.discard)
+                return _cached_response(request, entry, state)
+
+            return async_wrapper
+
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if request.method != "GET":
+                return view(request, *args, **kwargs)
+
+            cache, key, ttl, swr = lookup(request)
+            version = request_data_version(request, *tables)
+            entry = cache.get(key)
+            state = _entry_state(entry, version, ttl, swr)
+
+            if state is None:
+                response = view(request, *args, **kwargs)
+                if response.status_code == 200 and not response.streaming:
+                    cache.set(key, _entry(version, response), timeout=ttl + swr)
+                response["X-Cache"] = "MISS"
+                return response
+
+            if state == "STALE" and cache.add(key + ":refreshing", 1, timeout=max(swr, 30)):
+                threading.Thread(
+                    target=_revalidate,
+                    args=(cache, key, version, view, request, args, kwargs, ttl, swr),
+                    daemon=True,
+                ).start()
+            return _cached_response(request, entry, state)
+
+        return wrapper
+    return decorator
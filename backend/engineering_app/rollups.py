@@ -0,0 +1,165 @@
+from django.conf import settings
+from django.db import connection, transaction
+from django.dispatch import receiver
+
+from .ingest import data_ingested
+
+# Serialises concurrent refreshes (management command vs. ingest hook).
+ROLLUP_LOCK_ID = 4_210_001
+
+WEEK_KEY_SQL = """
+    EXTRACT(YEAR FROM {col})::INT AS year,
+    EXTRACT(MONTH FROM {col})::INT AS month,
+    (FLOOR((EXTRACT(DAY FROM {col}) - 1) / 7) + 1)::INT AS week_of_month
+"""
+
+# Dirty days are recorded in the ingest session's time zone, so every day is
+# widened by one day on each side before it is mapped to its week.
+TOUCHED_WEEKS_SQL = """
+    touched_weeks AS (
+        SELECT DISTINCT {week_key}
+        FROM unnest(%s::date[]) AS dirty(day),
+             generate_series(dirty.day - 1, dirty.day + 1, INTERVAL '1 day') AS d
+    ),
+    week_bounds AS (
+        SELECT
+            year, month, week_of_month,
+            make_date(year, month, (week_of_month - 1) * 7 + 1)::timestamp AS lo,
+            LEAST(
+                make_date(year, month, (week_of_month - 1) * 7 + 1) + 7,
+                make_date(year, month, 1) + INTERVAL '1 month'
+            )::timestamp AS hi
+        FROM touched_weeks
+    )
+""".format(week_key=WEEK_KEY_SQL.format(col="d"))
+
+DELETE_TOUCHED_SQL = """
+    WITH {touched}
+    DELETE FROM wo_weekly_status_rollup r
+    USING touched_weeks t
+    WHERE r.year = t.year AND r.month = t.month AND r.week_of_month = t.week_of_month
+""".format(touched=TOUCHED_WEEKS_SQL)
+
+INSERT_TOUCHED_SQL = """
+    WITH {touched}
+    INSERT INTO wo_weekly_status_rollup (year, month, week_of_month, wo_status, wo_count)
+    SELECT b.year, b.month, b.week_of_month, m.wo_status, COUNT(*)
+    FROM week_bounds b
+    JOIN main_data m
+      ON m.wo_created_date >= b.lo
+     AND m.wo_created_date < b.hi
+    WHERE m.wo_status IS NOT NULL
+    GROUP BY b.year, b.month, b.week_of_month, m.wo_status
+""".format(touched=TOUCHED_WEEKS_SQL)
+
+# Statement triggers on main_data log the wo_created_date days they write into
+# wo_rollup_dirty_day. Migration 0011 installs them if main_data exists at
+# migrate time; it is loaded by the CMMS ingest, so a full refresh installs (or
+# replaces) them as well.
+DIRTY_FUNCTION_SQL = """
+    CREATE OR REPLACE FUNCTION wo_rollup_mark_dirty() RETURNS trigger AS $$
+    BEGIN
+        IF TG_OP IN ('INSERT', 'UPDATE') THEN
+            INSERT INTO wo_rollup_dirty_day (day)
+            SELECT DISTINCT wo_created_date::date FROM new_rows WHERE wo_created_date IS NOT NULL
+            ON CONFLICT DO NOTHING;
+        END IF;
+        IF TG_OP IN ('UPDATE', 'DELETE') THEN
+            INSERT INTO wo_rollup_dirty_day (day)
+            SELECT DISTINCT wo_created_date::date FROM old_rows WHERE wo_created_date IS NOT NULL
+            ON CONFLICT DO NOTHING;
+        END IF;
+        RETURN NULL;
+    END;
+    $$ LANGUAGE plpgsql
+"""
+
+# trigger name -> CREATE OR REPLACE TRIGGER of it on main_data
+DIRTY_TRIGGERS = {
+    "main_data_rollup_insert": """
+        CREATE OR REPLACE TRIGGER main_data_rollup_insert AFTER INSERT ON main_data
+        REFERENCING NEW TABLE AS new_rows
+        FOR EACH STATEMENT EXECUTE FUNCTION wo_rollup_mark_dirty()
+    """,
+    "main_data_rollup_update": """
+        CREATE OR REPLACE TRIGGER main_data_rollup_update AFTER UPDATE ON main_data
+        REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+        FOR EACH STATEMENT EXECUTE FUNCTION wo_rollup_mark_dirty()
+    """,
+    "main_data_rollup_delete": """
+        CREATE OR REPLACE TRIGGER main_data_rollup_delete AFTER DELETE ON main_data
+        REFERENCING OLD TABLE AS old_rows
+        FOR EACH STATEMENT EXECUTE FUNCTION wo_rollup_mark_dirty()
+    """,
+}
+
+INSTALLED_TRIGGERS_SQL = """
+    SELECT tgname FROM pg_trigger
+    WHERE tgrelid = to_regclass('main_data') AND tgname = ANY(%s::text[])
+"""
+
+INSERT_ALL_SQL = """
+    INSERT INTO wo_weekly_status_rollup (year, month, week_of_month, wo_status, wo_count)
+    SELECT year, month, week_of_month, wo_status, COUNT(*)
+    FROM (
+        SELECT {week_key}, wo_status
+        FROM main_data
+        WHERE wo_created_date IS NOT NULL AND wo_status IS NOT NULL
+    ) AS weekly
+    GROUP BY year, month, week_of_month, wo_status
+""".format(week_key=WEEK_KEY_SQL.format(col="wo_created_date"))
+
+
+class MainDataMissing(RuntimeError):
+    pass
+
+
+def missing_rollup_triggers():
+    """The dirty-day triggers not installed on main_data (all of them without the table)."""
+    with connection.cursor() as cursor:
+        cursor.execute(INSTALLED_TRIGGERS_SQL, [list(DIRTY_TRIGGERS)])
+        installed = {row[0] for row in cursor.fetchall()}
+    return [name for name in DIRTY_TRIGGERS if name not in installed]
+
+
+def install_dirty_triggers(cursor):
+    cursor.execute(DIRTY_FUNCTION_SQL)
+    for sql in DIRTY_TRIGGERS.values():
+        cursor.execute(sql)
+
+
+def refresh_weekly_status_rollup(full=False):
+    """
+    Brings wo_weekly_status_rollup up to date with main_data and returns the
+    number of dirty days consumed (or None for a full rebuild). Only the weeks
+    containing a dirty day are recomputed, each through a wo_created_date range.
+    A full rebuild also installs the dirty-day triggers, and raises
+    MainDataMissing if main_data does not exist.
+    """
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute("SELECT pg_advisory_xact_lock(%s)", [ROLLUP_LOCK_ID])
+        if full:
+            cursor.execute("SELECT to_regclass('main_data') IS NULL")
+            if cursor.fetchone()[0]:
+                raise MainDataMissing("main_data does not exist")
+            install_dirty_triggers(cursor)
+            cursor.execute("DELETE FROM wo_rollup_dirty_day")
+            cursor.execute("DELETE FROM wo_weekly_status_rollup")
+            cursor.execute(INSERT_ALL_SQL)
+            return None
+
+        cursor.execute("DELETE FROM wo_rollup_dirty_day RETURNING day")
+        days = [row[0] for row in cursor.fetchall()]
+        if not days:
+            return 0
+        cursor.execute(DELETE_TOUCHED_SQL, [days])
+        cursor.execute(INSERT_TOUCHED_SQL, [days])
+        return len(days)
+
+
+@receiver(data_ingested)
+def refresh_rollup_after_ingest(sender, tables=None, **kwargs):
+    if not getattr(settings, "WO_ROLLUP_REFRESH_ON_INGEST", True):
+        return
+    if tables is None or "main_data" in tables:
+        refresh_weekly_status_rollup()
@@ -0,0 +1,503 @@
+import math
+import uuid
+from datetime import datetime, timedelta, timezone
+from decimal import Decimal
+
+import numpy as np
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.db import connection, transaction
+
+from .energy_aggregation import DAILY_TABLES, aggregate_energy_inputs
+from .ingest import data_ingested
+from .models import UserProfile
+from .partitions import add_months, ensure_partitions, main_data_kind, month_of
+from .rollups import refresh_weekly_status_rollup
+from .wr_numbers import reserve_wr_numbers
+
+# Synthetic main_data, work requests and meter readings at production size,
+# for benchmarking the raw-SQL endpoints (manage.py generate_scale_data).
+# Every value is drawn from numpy generators seeded from one seed, so the same
+# arguments give the same rows; only what the database assigns (user ids, the
+# WorkRequest numbers from their sequence) depends on what it held before.
+#
+# Rows are written with COPY. The *_daily tables are aggregated from the
+# generated readings (energy_aggregation.py), so the energy views and the
+# EnergyInput lists agree.
+
+USERNAME_PREFIX = "scale_user_"
+
+CHUNK_ROWS = 100_000
+
+HOUR = 3600
+DAY = 86400
+
+EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+
+# (asset class, resource, department); asset_group is the class
+ASSET_CLASSES = [
+    ("Pump", "MTC", "Production"),
+    ("Conveyor", "MTC", "Production"),
+    ("Mixer", "MTC", "Production"),
+    ("Filling machine", "MTC", "Production"),
+    ("Gearbox", "MTC", "Production"),
+    ("Compressor", "UTY", "Utility"),
+    ("Boiler", "UTY", "Utility"),
+    ("Chiller", "UTY", "Utility"),
+    ("Cooling tower", "UTY", "Utility"),
+    ("Transformer", "UTY", "Engineering"),
+    ("Pressure gauge", "CAL", "Engineering"),
+    ("Flow meter", "CAL", "Engineering"),
+    ("Temperature sensor", "CAL", "Engineering"),
+]
+
+# (wo_type, share, verb of the title)
+WORK_TYPES = [
+    ("Preventive Maintenance", 0.38, "Service"),
+    ("Corrective Maintenance", 0.22, "Repair"),
+    ("Breakdown", 0.14, "Breakdown of"),
+    ("Calibration", 0.12, "Calibrate"),
+    ("Predictive Maintenance", 0.06, "Inspect"),
+    ("Planned Maintenance", 0.05, "Overhaul"),
+    ("Modification", 0.03, "Modify"),
+]
+FAILURE_WORK_TYPES = ("Corrective Maintenance", "Breakdown")
+
+FAILURE_DESCRIPTIONS = [
+    "Abnormal noise and vibration",
+    "Leak at the shaft seal",
+    "Tripped on overload",
+    "Does not start",
+    "Running hot",
+    "Output below setpoint",
+]
+PLANNED_DESCRIPTIONS = [
+    "Scheduled service per maintenance plan",
+    "Lubrication and visual inspection",
+    "Check alignment and fasteners",
+    "Replace filters and wear parts",
+    "Verify readings against the reference",
+]
+
+# (wr_type, share); repair and corrective requests report a failure
+WR_TYPES = [
+    ("repair", 0.35),
+    ("inspection", 0.20),
+    ("corrective", 0.20),
+    ("modification", 0.10),
+    ("routine", 0.15),
+]
+FAILURE_WR_TYPES = ("repair", "corrective")
+
+# (failure_code, failure_cause, resolution)
+FAILURES = [
+    ("BRG", "Bearing worn out", "Replaced the bearing"),
+    ("SEAL", "Seal leaking", "Replaced the mechanical seal"),
+    ("ELEC", "Motor or wiring fault", "Repaired the wiring, tested the motor"),
+    ("BLK", "Line blocked", "Cleared and flushed the line"),
+    ("CTRL", "Sensor or controller fault", "Replaced the sensor"),
+    ("OPR", "Operating error", "Reset and briefed the operator"),
+]
+
+URGENCIES = [("low", 0.50), ("medium", 0.35), ("high", 0.15)]
+
+# energy type -> (meter prefix, daily consumption of all its meters, seasonal swing)
+ENERGY_METERS = {
+    "listrik": ("PLN", 1500.0, 0.10),
+    "air": ("PDAM", 1000.0, 0.15),
+    "cng": ("CNG", 500.0, 0.20),
+}
+
+# main_data is created outside Django and its column types differ between
+# databases (`no` is text or integer, actual_duration numeric or double
+# precision), while binary COPY needs every value in its column's exact type:
+# the types are read from the catalog (main_data_types) and the generated
+# values follow them.
+MAIN_DATA_COLUMNS = (
+    "no", "title", "wo_description", "wo_status", "wo_type", "resource", "wr_number", "wr_type",
+    "wr_requestor", "wr_request_by_date", "wo_created_date", "wo_scheduled_start_date",
+    "wo_scheduled_completion_date", "wo_actual_start_date", "wo_actual_completion_date",
+    "actual_failure_date", "actual_duration", "no_asset_of_wo", "asset_group", "department",
+)
+
+COLUMN_TYPES_SQL = """
+    SELECT a.attname, t.typname
+    FROM pg_attribute a
+    JOIN pg_type t ON t.oid = a.atttypid
+    WHERE a.attrelid = %s::regclass AND a.attnum > 0 AND NOT a.attisdropped
+"""
+
+INTEGER_TYPES = ("int2", "int4", "int8")
+FLOAT_TYPES = ("float4", "float8")
+
+# (column, type) of the binary COPY into the tables Django creates; the
+# timestamptz columns are sent as timestamp (see _timestamps)
+WORK_REQUEST_COLUMNS = (
+    ("wr_number", "varchar"), ("title", "varchar"), ("description", "text"), ("wr_type", "varchar"),
+    ("resource", "varchar"), ("asset_number", "varchar"), ("asset_department", "varchar"),
+    ("created_at", "timestamp"), ("status", "varchar"), ("urgency", "varchar"),
+    ("actual_failure_date", "date"), ("approved_at", "timestamp"), ("failure_cause", "text"),
+    ("failure_code", "varchar"), ("requested_by_id", "int4"), ("resolution", "text"),
+)
+
+ENERGY_INPUT_COLUMNS = (
+    ("id", "uuid"), ("date", "date"), ("type", "varchar"), ("value", "numeric"),
+    ("meter_number", "varchar"), ("created_at", "timestamp"), ("user_id", "int4"),
+)
+
+
+def parse_count(value):
+    """'5M', '250k' or '5000000' as an int."""
+    text = str(value).strip().lower().replace("_", "")
+    factor = {"k": 1_000, "m": 1_000_000}.get(text[-1:], 1)
+    if factor != 1:
+        text = text[:-1]
+    count = int(float(text) * factor)
+    if count < 0:
+        raise ValueError(value)
+    return count
+
+
+def _seconds(moment):
+    return int((moment - EPOCH).total_seconds())
+
+
+def _timestamps(seconds, present=None):
+    # epoch seconds as naive UTC datetimes, None where not `present`. They are
+    # copied as "timestamp", whose binary form (microseconds since 2000-01-01
+    # UTC) is what a timestamptz column reads, so no tzinfo is needed per value.
+    values = np.asarray(seconds, dtype=np.int64).astype("datetime64[s]")
+    if present is not None:
+        values = np.where(present, values, np.datetime64("NaT"))
+    return values.tolist()
+
+
+def _nullable(values, present):
+    values = np.asarray(values, dtype=object)
+    values[~present] = None
+    return values.tolist()
+
+
+def _choices(rng, options, size):
+    names, shares = zip(*options)
+    shares = np.asarray(shares) / sum(shares)
+    return np.asarray(names, dtype=object)[rng.choice(len(names), size, p=shares)]
+
+
+def main_data_types(cursor):
+    """(column, COPY type) of MAIN_DATA_COLUMNS as main_data has them here."""
+    cursor.execute(COLUMN_TYPES_SQL, ["main_data"])
+    types = dict(cursor.fetchall())
+    missing = [name for name in MAIN_DATA_COLUMNS if name not in types]
+    if missing:
+        raise ValueError(f"main_data has no column(s) {', '.join(missing)}")
+    # timestamptz is sent as timestamp (see _timestamps)
+    return tuple((name, "timestamp" if types[name] == "timestamptz" else types[name]) for name in MAIN_DATA_COLUMNS)
+
+
+def _copy(cursor, table, columns, rows):
+    # binary COPY: postgres does not parse the values back from text, which
+    # for timestamps takes longer than the rest of the load
+    names, types = zip(*columns)
+    written = 0
+    with cursor.copy(f"COPY {table} ({', '.join(names)}) FROM STDIN (FORMAT BINARY)") as copy:
+        copy.set_types(types)
+        for row in rows:
+            copy.write_row(row)
+            written += 1
+    return written
+
+
+def make_assets(rng, count, skew):
+    """
+    `count` assets with a class, and a failure probability per asset that
+    follows a Zipf law of exponent `skew`: a few assets fail far more often
+    than the rest.
+    """
+    kind = rng.integers(0, len(ASSET_CLASSES), count)
+    ranks = rng.permutation(count) + 1
+    weights = 1.0 / ranks ** skew
+    return {
+        "number": np.asarray([f"A{i:05d}" for i in range(1, count + 1)], dtype=object),
+        "group": np.asarray([c[0] for c in ASSET_CLASSES], dtype=object)[kind],
+        "resource": np.asarray([c[1] for c in ASSET_CLASSES], dtype=object)[kind],
+        "department": np.asarray([c[2] for c in ASSET_CLASSES], dtype=object)[kind],
+        "failure_p": weights / weights.sum(),
+    }
+
+
+def main_data_chunks(rng, assets, requestors, count, start, end, types=None):
+    """
+    main_data rows in wo_created_date order, CHUNK_ROWS at a time, with `no`
+    and actual_duration in the types of `types` (main_data_types()).
+    """
+    types = dict(types or ())
+    integer_no = types.get("no") in INTEGER_TYPES
+    float_duration = types.get("actual_duration") in FLOAT_TYPES
+    start_s, end_s = _seconds(start), _seconds(end)
+    chunks = max(1, math.ceil(count / CHUNK_ROWS))
+    span = (end_s - start_s) / chunks
+    type_names = np.asarray([t[0] for t in WORK_TYPES], dtype=object)
+    verbs = np.asarray([t[2] for t in WORK_TYPES], dtype=object)
+    shares = np.asarray([t[1] for t in WORK_TYPES])
+    shares = shares / shares.sum()
+    failure_types = np.isin(type_names, FAILURE_WORK_TYPES)
+    calibration = type_names.tolist().index("Calibration")
+    asset_count = len(assets["number"])
+    numbered = wr_numbered = 0
+
+    for i in range(chunks):
+        n = count * (i + 1) // chunks - count * i // chunks
+        created = np.sort(rng.integers(int(start_s + i * span), int(start_s + (i + 1) * span), n))
+        kind = rng.choice(len(type_names), n, p=shares)
+        failure = failure_types[kind]
+        # failures land on the failure-prone assets, planned work on all alike
+        asset = np.where(
+            failure,
+            rng.choice(asset_count, n, p=assets["failure_p"]),
+            rng.integers(0, asset_count, n),
+        )
+        resource = np.where(kind == calibration, "CAL", assets["resource"][asset])
+
+        # the recent work orders are the open ones
+        is_open = rng.random(n) < np.exp(-(end_s - created) / (30 * DAY))
+        status = np.where(
+            is_open,
+            np.where(rng.random(n) < 0.4, "Unreleased", "Released"),
+            np.where(rng.random(n) < 0.3, "Completed", "Closed"),
+        )
+        started = ~is_open | ((status == "Released") & (rng.random(n) < 0.3))
+        finished = ~is_open
+
+        # failures are scheduled within hours, planned work days ahead
+        lead = np.where(failure, rng.lognormal(np.log(2 * HOUR), 0.8, n), rng.uniform(DAY, 14 * DAY, n))
+        scheduled_start = created + lead.astype(np.int64)
+        planned = rng.lognormal(np.log(3 * HOUR), 0.6, n)
+        scheduled_completion = scheduled_start + planned.astype(np.int64)
+        actual_start = np.where(
+            failure,
+            created + rng.lognormal(np.log(HOUR), 0.9, n),
+            scheduled_start + rng.normal(0, 4 * HOUR, n),
+        ).astype(np.int64)
+        duration = (planned * rng.lognormal(np.where(failure, 0.3, 0.0), 0.5)).astype(np.int64)
+        # a few completions are keyed in before the start, as in the real exports
+        duration = np.where(rng.random(n) < 0.001, -duration, duration)
+        actual_completion = actual_start + duration
+        failed_at = created - rng.lognormal(np.log(30 * 60), 1.0, n).astype(np.int64)
+
+        has_wr = rng.random(n) < np.where(failure, 0.95, 0.1)
+        wr_index = wr_numbered + np.cumsum(has_wr)
+        wr_numbered = int(wr_index[-1]) if n else wr_numbered
+        wr_type = np.where(
+            failure,
+            rng.choice(["repair", "corrective"], n),
+            rng.choice(["inspection", "modification", "routine"], n),
+        )
+        requested = created - rng.lognormal(np.log(2 * HOUR), 1.0, n).astype(np.int64)
+        description = np.where(
+            failure,
+            np.asarray(FAILURE_DESCRIPTIONS, dtype=object)[rng.integers(0, len(FAILURE_DESCRIPTIONS), n)],
+            np.asarray(PLANNED_DESCRIPTIONS, dtype=object)[rng.integers(0, len(PLANNED_DESCRIPTIONS), n)],
+        )
+
+        numbers = assets["number"][asset].tolist()
+        groups = assets["group"][asset].tolist()
+        titles = [
+            f"{verb} {group.lower()} {number}"
+            for verb, group, number in zip(verbs[kind].tolist(), groups, numbers)
+        ]
+        yield zip(
+            list(range(numbered + 1, numbered + n + 1)) if integer_no
+            else [f"WO{k:08d}" for k in range(numbered + 1, numbered + n + 1)],
+            titles,
+            description.tolist(),
+            status.tolist(),
+            type_names[kind].tolist(),
+            resource.tolist(),
+            _nullable([f"WR{k:08d}" for k in wr_index.tolist()], has_wr),
+            _nullable(wr_type, has_wr),
+            _nullable(np.asarray(requestors, dtype=object)[rng.integers(0, len(requestors), n)], has_wr),
+            _timestamps(requested, has_wr),
+            _timestamps(created),
+            _timestamps(scheduled_start),
+            _timestamps(scheduled_completion),
+            _timestamps(actual_start, started),
+            _timestamps(actual_completion, finished),
+            _timestamps(failed_at, failure),
+            _nullable(duration.astype(np.float64) if float_duration else duration, finished),
+            numbers,
+            groups,
+            assets["department"][asset].tolist(),
+        )
+        numbered += n
+
+
+def work_request_rows(rng, assets, user_ids, count, start, end):
+    start_s, end_s = _seconds(start), _seconds(end)
+    created = np.sort(rng.integers(start_s, end_s, count))
+    wr_type = _choices(rng, WR_TYPES, count)
+    failure = np.isin(wr_type, FAILURE_WR_TYPES)
+    asset = np.where(
+        failure,
+        rng.choice(len(assets["number"]), count, p=assets["failure_p"]),
+        rng.integers(0, len(assets["number"]), count),
+    )
+    is_open = rng.random(count) < np.exp(-(end_s - created) / (14 * DAY))
+    status = np.where(
+        is_open,
+        np.where(rng.random(count) < 0.6, "pending", "in_review"),
+        np.where(rng.random(count) < 0.85, "approved", "rejected"),
+    )
+    approved = status == "approved"
+    approved_at = created + rng.lognormal(np.log(DAY), 0.7, count).astype(np.int64)
+    failed_on = (created - rng.integers(0, 2 * DAY, count)).astype("datetime64[s]").astype("datetime64[D]")
+    cause = rng.integers(0, len(FAILURES), count)
+    codes, causes, resolutions = (np.asarray(column, dtype=object) for column in zip(*FAILURES))
+
+    numbers = assets["number"][asset].tolist()
+    groups = assets["group"][asset].tolist()
+    titles = [
+        f"{kind.capitalize()} {group.lower()} {number}"
+        for kind, group, number in zip(wr_type.tolist(), groups, numbers)
+    ]
+    return zip(
+        reserve_wr_numbers(count),
+        titles,
+        [f"{title}, reported from the floor" for title in titles],
+        wr_type.tolist(),
+        assets["resource"][asset].tolist(),
+        numbers,
+        assets["department"][asset].tolist(),
+        _timestamps(created),
+        status.tolist(),
+        _choices(rng, URGENCIES, count).tolist(),
+        _nullable(failed_on.tolist(), failure),
+        _timestamps(approved_at, approved),
+        _nullable(causes[cause], failure),
+        _nullable(codes[cause], failure),
+        np.asarray(user_ids)[rng.integers(0, len(user_ids), count)].tolist(),
+        _nullable(resolutions[cause], failure & approved),
+    )
+
+
+def energy_input_rows(rng, user_ids, meters, start, end):
+    """
+    Cumulative readings of `meters` meters per energy type, one per day on
+    most weekdays and fewer at weekends. Consumption follows the seasons and
+    the working week.
+    """
+    days = np.arange(np.datetime64(start.date()), np.datetime64(end.date()))
+    weekend = ((days.astype(np.int64) + 3) % 7) >= 5
+    season = np.sin(2 * np.pi * (days - days.astype("datetime64[Y]")).astype(np.int64) / 365.25)
+    rows = []
+    for kind, (prefix, total, swing) in ENERGY_METERS.items():
+        for meter in range(1, meters + 1):
+            base = total / meters * rng.lognormal(0, 0.3)
+            daily = base * (1 + swing * season) * np.where(weekend, 0.7, 1.0) * rng.lognormal(0, 0.08, len(days))
+            value = rng.uniform(1_000, 50_000) + np.cumsum(daily)
+            read = rng.random(len(days)) < np.where(weekend, 0.4, 0.97)
+            read[[0, -1]] = True
+            taken = days[read]
+            created = taken.astype("datetime64[s]").astype(np.int64) + rng.integers(7 * HOUR, 10 * HOUR, len(taken))
+            rows.extend(zip(
+                [uuid.UUID(bytes=rng.bytes(16), version=4) for _ in range(len(taken))],
+                taken.tolist(),
+                [kind] * len(taken),
+                [Decimal(f"{reading:.2f}") for reading in value[read].tolist()],
+                [f"{prefix}-{meter:02d}"] * len(taken),
+                _timestamps(created),
+                np.asarray(user_ids)[rng.integers(0, len(user_ids), len(taken))].tolist(),
+            ))
+    return rows
+
+
+def scale_users(count):
+    """ids of the `count` generated requesters, created on first use."""
+    names = [f"{USERNAME_PREFIX}{i:03d}" for i in range(1, count + 1)]
+    existing = set(User.objects.filter(username__in=names).values_list("username", flat=True))
+    missing = [name for name in names if name not in existing]
+    if missing:
+        password = make_password(None)
+        User.objects.bulk_create([User(username=name, password=password) for name in missing])
+        users = User.objects.filter(username__in=missing)
+        departments = sorted({c[2] for c in ASSET_CLASSES})
+        UserProfile.objects.bulk_create([
+            UserProfile(
+                user=user,
+                full_name=f"Scale User {user.username[len(USERNAME_PREFIX):]}",
+                role="requester",
+                division=departments[int(user.username[len(USERNAME_PREFIX):]) % len(departments)],
+            )
+            for user in users
+        ])
+    return dict(User.objects.filter(username__in=names).values_list("username", "id"))
+
+
+def main_data_has_rows():
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT EXISTS (SELECT 1 FROM main_data)")
+        return cursor.fetchone()[0]
+
+
+def clear_scale_data():
+    """Empties main_data and the daily tables and drops the generated users' rows."""
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute("TRUNCATE main_data")
+        for table in DAILY_TABLES.values():
+            cursor.execute(f"DELETE FROM {table}")
+        cursor.execute("DELETE FROM energy_meter_daily")
+        ids = list(User.objects.filter(username__startswith=USERNAME_PREFIX).values_list("id", flat=True))
+        cursor.execute("DELETE FROM engineering_app_workrequest WHERE requested_by_id = ANY(%s)", [ids])
+        cursor.execute("DELETE FROM engineering_app_energyinput WHERE user_id = ANY(%s)", [ids])
+
+
+def generate_scale_data(
+    work_orders, years, assets, work_requests, meters=4, users=50, skew=1.0, seed=42, end=None, progress=None,
+):
+    """
+    Writes the synthetic rows for the `years` up to `end` (default: today,
+    UTC) and returns {table: rows written}. `progress(table, rows)` is called
+    as each main_data chunk is written.
+    """
+    end = datetime.combine(end or datetime.now(timezone.utc).date(), datetime.min.time(), timezone.utc)
+    start = end - timedelta(days=round(365.25 * years))
+    asset_seed, main_seed, request_seed, energy_seed = np.random.SeedSequence(seed).spawn(4)
+    asset_table = make_assets(np.random.default_rng(asset_seed), assets, skew)
+    user_ids = scale_users(users)
+    written = {}
+
+    with connection.cursor() as cursor:
+        if main_data_kind(cursor) == "p":
+            months, month = [], month_of(start)
+            while month <= end.date():
+                months.append(month)
+                month = add_months(month, 1)
+            ensure_partitions(months=months)
+
+    with transaction.atomic(), connection.cursor() as cursor:
+        rng = np.random.default_rng(main_seed)
+        columns = main_data_types(cursor)
+        total = 0
+        for rows in main_data_chunks(rng, asset_table, sorted(user_ids), work_orders, start, end, columns):
+            total += _copy(cursor, "main_data", columns, rows)
+            if progress:
+                progress("main_data", total)
+        written["main_data"] = total
+
+    with transaction.atomic(), connection.cursor() as cursor:
+        rows = work_request_rows(
+            np.random.default_rng(request_seed), asset_table, sorted(user_ids.values()), work_requests, start, end,
+        )
+        written["engineering_app_workrequest"] = _copy(cursor, "engineering_app_workrequest", WORK_REQUEST_COLUMNS, rows)
+
+    with transaction.atomic(), connection.cursor() as cursor:
+        rows = energy_input_rows(np.random.default_rng(energy_seed), sorted(user_ids.values()), meters, start, end)
+        written["engineering_app_energyinput"] = _copy(cursor, "engineering_app_energyinput", ENERGY_INPUT_COLUMNS, rows)
+
+    written.update(aggregate_energy_inputs(full=True))
+    refresh_weekly_status_rollup(full=True)
+    with connection.cursor() as cursor:
+        for table in written:
+            cursor.execute(f"ANALYZE {table}")
+    data_ingested.send(sender=generate_scale_data, tables=["main_data"])
+    return written
@@ -2,7 +2,6 @@
 from django.contrib.auth.models import User
 from rest_framework import serializers
 from .models import UserProfile, WorkRequest, EnergyInput
-from uuid import uuid4
 from rest_framework_simplejwt.serializers import TokenObtainPairSerializer
 from rest_framework_simplejwt.exceptions import AuthenticationFailed
 
@@ -57,7 +56,6 @@ class WorkRequestSerializer(serializers.ModelSerializer):
 
     def create(self, validated_data):
         request = self.context.get('request')  
-        validated_data['wr_number'] = f"WR-{uuid4().hex[:6].upper()}"
         validated_data['status'] = "pending"
 
         if request and hasattr(request, 'user'):
@@ -72,7 +70,7 @@ class EnergyInputSerializer(serializers.ModelSerializer):
     class Meta:
         model = EnergyInput
         fields = "__all__"
-        read_only_fields = ['user']
+        read_only_fields = ['user', 'thumbnail']
 
     def create(self, validated_data):
         validated_data["user"] = self.context["request"].user
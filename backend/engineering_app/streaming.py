@@ -0,0 +1,55 @@
+from django.db import connection, transaction
+from django.http import StreamingHttpResponse
+
+from .json_encoding import dumps
+
+STREAM_BATCH_SIZE = 2000
+
+NDJSON_CONTENT_TYPE = "application/x-ndjson"
+
+
+def stream_format(request):
+    # ?stream=1 / ?stream=json -> JSON array, ?stream=ndjson -> one object per line
+    value = (request.GET.get("stream") or "").lower()
+    if value in ("", "0", "false", "no"):
+        return None
+    return "ndjson" if value == "ndjson" else "json"
+
+
+def iter_batches(sql, params=None, batch_size=STREAM_BATCH_SIZE):
+    # Named (server-side) cursor: postgres keeps the result set and hands it over
+    # batch_size rows at a time. Runs inside a transaction so the cursor does not
+    # need WITH HOLD, which would materialise the whole result before the first fetch.
+    with transaction.atomic():
+        with connection.chunked_cursor() as cursor:
+            cursor.execute(sql, params)
+            while True:
+                rows = cursor.fetchmany(batch_size)
+                if not rows:
+                    break
+                yield rows
+
+
+def iter_json_array(fields, batches):
+    yield b"["
+    first = True
+    for rows in batches:
+        chunk = b", ".join(dumps(dict(zip(fields, row))) for row in rows)
+        if first:
+            first = False
+            yield chunk
+        else:
+            yield b", " + chunk
+    yield b"]"
+
+
+def iter_ndjson(fields, batches):
+    for rows in batches:
+        yield b"".join(dumps(dict(zip(fields, row))) + b"\n" for row in rows)
+
+
+def streaming_query_response(sql, fields, fmt="json", params=None):
+    batches = iter_batches(sql, params)
+    if fmt == "ndjson":
+        return StreamingHttpResponse(iter_ndjson(fields, batches), content_type=NDJSON_CONTENT_TYPE)
+    return StreamingHttpResponse(iter_json_array(fields, batches), content_type="application/json")
@@ -0,0 +1,59 @@
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+
+from asgiref.sync import iscoroutinefunction
+
+# Where a request's time goes, for the endpoint benchmarks (benchmarks.py).
+# The code paths worth telling apart (JSON encoding, the async views' queries)
+# are wrapped with @timed(kind); inside a collect() block the seconds spent in
+# them are added up per kind. Outside one a wrapper only reads a context
+# variable. Context variables follow a request into async_to_sync, so async
+# views are counted as well.
+
+_totals = ContextVar("timings", default=None)
+
+
+@contextmanager
+def collect():
+    """Yields {kind: seconds} filled in by the timed code run inside the block."""
+    totals = {}
+    token = _totals.set(totals)
+    try:
+        yield totals
+    finally:
+        _totals.reset(token)
+
+
+def add(kind, seconds):
+    totals = _totals.get()
+    if totals is not None:
+        totals[kind] = totals.get(kind, 0.0) + seconds
+
+
+def timed(kind):
+    def decorator(function):
+        if iscoroutinefunction(function):
+            @wraps(function)
+            async def async_wrapper(*args, **kwargs):
+                if _totals.get() is None:
+                    return await function(*args, **kwargs)
+                started = time.perf_counter()
+                try:
+                    return await function(*args, **kwargs)
+                finally:
+                    add(kind, time.perf_counter() - started)
+            return async_wrapper
+
+        @wraps(function)
+        def wrapper(*args, **kwargs):
+            if _totals.get() is None:
+                return function(*args, **kwargs)
+            started = time.perf_counter()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                add(kind, time.perf_counter() - started)
+        return wrapper
+    return decorator
@@ -1,32 +1,40 @@
+from django.conf import settings
 from django.urls import path
-from .views import MeView, RegisterUserView, DivisionListView, WorkRequestStatusUpdateAPIView, CustomTokenObtainPairView, DocumentUploadView, DocumentListView, EnergyInputListView
-from . import views
-from .views import MeView, RegisterUserView, DivisionListView, UserListView, UserStatsView, WorkRequestCreateAPIView, EnergyInputCreateView, UserEnergyInputListView, latest_energy_inputs, UserStatusUpdateView, ResetUserPasswordView
+from .views import MeView, RegisterUserView, DivisionListView, WorkRequestStatusUpdateAPIView, WorkRequestBulkStatusUpdateAPIView, CustomTokenObtainPairView, DocumentUploadView, DocumentListView, EnergyInputListView
+from . import views, async_views, bundle
+from .views import MeView, RegisterUserView, DivisionListView, UserListView, UserStatsView, WorkRequestCreateAPIView, EnergyInputCreateView, EnergyInputBulkCreateView, UserEnergyInputListView, latest_energy_inputs, UserStatusUpdateView, ResetUserPasswordView
 from rest_framework_simplejwt.views import TokenRefreshView
 
+sql_views = async_views if settings.DASHBOARD_ASYNC_VIEWS else views
+
 urlpatterns = [
     path('me/', MeView.as_view()),
     path('regist/', RegisterUserView.as_view()),
     path('divisions/', DivisionListView.as_view()),
-    path('active-work-orders/', views.active_work_orders),
-    path('unreleased-work-orders/', views.unreleased_work_orders),
-    path('work-order-list/', views.work_order_list),
-    path('work-request/', views.work_request_list),
+    path('active-work-orders/', views.active_work_orders, name='active-work-orders'),
+    path('unreleased-work-orders/', views.unreleased_work_orders, name='unreleased-work-orders'),
+    path('work-order-counts/', views.work_order_status_counts, name='work-order-counts'),
+    path('work-order-list/', views.work_order_list, name='work-order-list'),
+    path('work-request/', views.work_request_list, name='work-request-list'),
     path("users/", UserListView.as_view(), name="user-list"),
     path('users/stats/', UserStatsView.as_view(), name='user-stats'),
     path('api/token/refresh/', TokenRefreshView.as_view(), name='token_refresh'),
-    path('energy/', views.energy),
-    path('energy_monthly/', views.energyTrend),
-    path('analytics/', views.analytic),
-    path('category-analytics/', views.category_analytics),
-    path('equipment-analytics/', views.equipment_analytics),
-    path('monthly-trend/', views.monthly_trend),
-    path('downtime/', views.weekly_downtime),
-    path('energydaily/', views.energydaily),
+    path('energy/', sql_views.energy, name='energy'),
+    path('energy_monthly/', sql_views.energyTrend, name='energy-monthly'),
+    path('energy/rollup/', sql_views.energy_rollup, name='energy-rollup'),
+    path('analytics/', sql_views.analytic, name='analytics'),
+    path('category-analytics/', sql_views.category_analytics, name='category-analytics'),
+    path('equipment-analytics/', sql_views.equipment_analytics, name='equipment-analytics'),
+    path('monthly-trend/', sql_views.monthly_trend, name='monthly-trend'),
+    path('downtime/', sql_views.weekly_downtime, name='downtime'),
+    path('energydaily/', sql_views.energydaily, name='energydaily'),
+    path('bundle/', bundle.bundle_async if settings.DASHBOARD_ASYNC_VIEWS else bundle.bundle),
     path('work-request/', WorkRequestCreateAPIView.as_view(), name='work-request'),
     path('work-request/create/', WorkRequestCreateAPIView.as_view(), name='work-request-create'),
     path("work-request/update-status/<int:pk>/", WorkRequestStatusUpdateAPIView.as_view(), name="update-work-request-status"),
+    path("work-request/update-status/", WorkRequestBulkStatusUpdateAPIView.as_view(), name="bulk-update-work-request-status"),
     path('energy-input/create/', EnergyInputCreateView.as_view(), name='energy-input-create'),
+    path('energy-input/bulk/', EnergyInputBulkCreateView.as_view(), name='energy-input-bulk'),
     path('energy-input/my/', UserEnergyInputListView.as_view(), name='energy-input-my'),
     path('energy-input/latest/', latest_energy_inputs, name='latest-energy-inputs'),
     path('token/', CustomTokenObtainPairView.as_view(), name='token_obtain_pair'),
@@ -7,14 +7,22 @@ from rest_framework.permissions import AllowAny
 from .permissions import IsAdminUserProfile
 from .serializers import UserProfileWithUserSerializer
 from .serializers import UserProfileSerializer
-from django.http import JsonResponse
-from django.db import connection
+from .json_encoding import JsonResponse
+from django.db import connection, transaction
 import pandas as pd
 from rest_framework.decorators import api_view
+from . import queries, reliability
+from .streaming import stream_format, streaming_query_response
+from .columnar import InvalidFormat, columnar_query_response, columnar_response, columns_from_dicts, response_format
+from .pagination import keyset_response, wants_pagination
+from .rollups import WEEK_KEY_SQL
+from .result_cache import cached_result
+from .conditional import conditional_on
+from .filters import InvalidFilter, parse_energy_rollup, parse_filters
 
 
 
-from .models import UserProfile, active_work_orders, analytics
+from .models import UserProfile, WorkRequest, active_work_orders, analytics
 from .serializers import UserSerializer
 from .serializers import WorkRequestSerializer
 
@@ -39,6 +47,64 @@ class WorkRequestStatusUpdateAPIView(APIView):
         wr.save()
         return Response({"message": f"Status updated to {new_status}"}, status=200)
 
+# One set-based UPDATE for a batch of work requests. Rows already in the target
+# status are left alone, so an approval's approved_at is not moved.
+BULK_STATUS_UPDATE_SQL = """
+    WITH wanted AS (
+        SELECT DISTINCT unnest(%(ids)s::bigint[]) AS id
+    ),
+    updated AS (
+        UPDATE engineering_app_workrequest w
+        SET status = %(status)s,
+            approved_at = CASE WHEN %(status)s = 'approved' THEN now() ELSE w.approved_at END
+        FROM wanted
+        WHERE w.id = wanted.id AND w.status IS DISTINCT FROM %(status)s
+        RETURNING w.id
+    )
+    SELECT
+        wanted.id,
+        CASE
+            WHEN updated.id IS NOT NULL THEN 'updated'
+            WHEN w.id IS NOT NULL THEN 'unchanged'
+            ELSE 'not_found'
+        END
+    FROM wanted
+    LEFT JOIN updated ON updated.id = wanted.id
+    LEFT JOIN engineering_app_workrequest w ON w.id = wanted.id
+    ORDER BY wanted.id
+"""
+
+MAX_BULK_STATUS_IDS = 1000
+
+
+class WorkRequestBulkStatusUpdateAPIView(APIView):
+    # {"ids": [...], "status": "approved" | "rejected"} -> the outcome per id:
+    # updated, unchanged (already in that status) or not_found
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request):
+        new_status = request.data.get("status")
+        if new_status not in ["approved", "rejected"]:
+            return Response({"error": "Invalid status value"}, status=400)
+        ids = request.data.get("ids")
+        if (
+            not isinstance(ids, list) or not ids
+            or not all(isinstance(pk, int) and not isinstance(pk, bool) for pk in ids)
+        ):
+            return Response({"error": "ids must be a non-empty list of work request ids"}, status=400)
+        if len(ids) > MAX_BULK_STATUS_IDS:
+            return Response({"error": f"At most {MAX_BULK_STATUS_IDS} ids per request"}, status=400)
+
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.execute(BULK_STATUS_UPDATE_SQL, {"ids": ids, "status": new_status})
+            outcomes = dict(cursor.fetchall())
+        updated = sum(outcome == "updated" for outcome in outcomes.values())
+        return Response({
+            "status": new_status,
+            "updated": updated,
+            "results": [{"id": pk, "outcome": outcome} for pk, outcome in outcomes.items()],
+        }, status=200)
+
 class WorkRequestCreateAPIView(APIView):
     permission_classes = [IsAuthenticated]
 
@@ -141,555 +207,388 @@ class UserStatsView(APIView):
             "total_users": total_users,
             "active_users": active_users
         })
-def active_work_orders(request):
-    # Raw SQL to query active work orders
-    with connection.cursor() as cursor:
-        cursor.execute("""
-        WITH weekly_complete AS (
+DEFAULT_WEEKLY_STATUSES = ["Released", "Unreleased"]
+MAX_WEEKLY_STATUSES = 10
+
+def weekly_status_counts_sql(status_count, source="rollup"):
+    # One pass over the source computes every requested status as its own
+    # FILTER column. Weeks without a status get NULL, and LAG is partitioned on
+    # that so each series steps back to the previous week that had the status.
+    if source == "live":
+        count = "COUNT(*)"
+        src = f"""
+            (
+                SELECT {WEEK_KEY_SQL.format(col="wo_created_date")}, wo_status
+                FROM main_data
+                WHERE wo_created_date IS NOT NULL AND wo_status = ANY(%s)
+            ) AS src
+        """
+    else:
+        # weekly counts are kept in wo_weekly_status_rollup (see rollups.py)
+        count = "SUM(wo_count)"
+        src = "wo_weekly_status_rollup WHERE wo_status = ANY(%s)"
+
+    pivots = ",\n".join(
+        f"NULLIF({count} FILTER (WHERE wo_status = %s), 0) AS s{i}" for i in range(status_count)
+    )
+    series = ",\n".join(
+        f"s{i}, LAG(s{i}) OVER w{i}, s{i} - COALESCE(LAG(s{i}) OVER w{i}, 0)" for i in range(status_count)
+    )
+    windows = ",\n".join(
+        f"w{i} AS (PARTITION BY year, month, s{i} IS NULL ORDER BY week_of_month)" for i in range(status_count)
+    )
+    return f"""
+        WITH weekly AS (
             SELECT
-                EXTRACT(YEAR FROM wo_created_date)::INT AS year,
-                EXTRACT(MONTH FROM wo_created_date)::INT AS month,
-                FLOOR((EXTRACT(DAY FROM wo_created_date) - 1) / 7) + 1 AS week_of_month,
-                COUNT(*) AS released_count
-            FROM main_data
-            WHERE wo_status = 'Released'
+                year,
+                month,
+                week_of_month,
+                {pivots}
+            FROM {src}
             GROUP BY year, month, week_of_month
-            )
-
-            SELECT
+        )
+        SELECT
             year,
             month,
             week_of_month,
-            released_count,
-            LAG(released_count) OVER (
-                PARTITION BY year, month
-                ORDER BY week_of_month
-            ) AS last_week_count,
-            released_count - COALESCE(
-                LAG(released_count) OVER (
-                PARTITION BY year, month
-                ORDER BY week_of_month
-                ), 0
-            ) AS diff_from_last_week
-            FROM weekly_complete
-            ORDER BY year DESC, month DESC, week_of_month DESC;
-        """)
+            {series}
+        FROM weekly
+        WINDOW {windows}
+        ORDER BY year DESC, month DESC, week_of_month DESC
+    """
+
+def weekly_status_counts(statuses, source="rollup"):
+    sql = weekly_status_counts_sql(len(statuses), source)
+    with connection.cursor() as cursor:
+        cursor.execute(sql, statuses + [statuses])
         rows = cursor.fetchall()
 
+    result = []
+    for row in rows:
+        counts = {}
+        for i, wo_status in enumerate(statuses):
+            count, last_week_count, diff = row[3 + i * 3: 6 + i * 3]
+            if count is not None:
+                counts[wo_status] = {
+                    "count": count,
+                    "last_week_count": last_week_count,
+                    "diff_from_last_week": diff,
+                }
+        result.append({"year": row[0], "month": row[1], "week_of_month": row[2], "statuses": counts})
+    return result
+
+@conditional_on("main_data", "wo_weekly_status_rollup")
+def work_order_status_counts(request):
+    statuses = list(dict.fromkeys(s for s in request.GET.getlist("status") if s)) or DEFAULT_WEEKLY_STATUSES
+    if len(statuses) > MAX_WEEKLY_STATUSES:
+        return JsonResponse({"error": f"At most {MAX_WEEKLY_STATUSES} status values are allowed"}, status=400)
+    source = request.GET.get("source", "rollup")
+    if source not in ("rollup", "live"):
+        return JsonResponse({"error": "Invalid source value"}, status=400)
+
+    return JsonResponse(weekly_status_counts(statuses, source), safe=False)
+
+@conditional_on("main_data", "wo_weekly_status_rollup")
+def active_work_orders(request):
+    complete = []
+    for week in weekly_status_counts(["Released"]):
+        counts = week["statuses"]["Released"]
+        complete.append({
+            "year": week["year"],
+            "month": week["month"],
+            # the numeric string these endpoints have always returned
+            "week_of_month": str(week["week_of_month"]),
+            "released_count": counts["count"],
+            "last_week_count": counts["last_week_count"],
+            "diff_from_last_week": counts["diff_from_last_week"],
+        })
+
     # Return results as JSON
-    complete = [{"year": row[0], "month": row[1], "week_of_month": row[2], "released_count": row[3], "last_week_count": row[4], "diff_from_last_week": row[5]} for row in rows]
     return JsonResponse(complete, safe=False)
 
+@conditional_on("main_data", "wo_weekly_status_rollup")
 def unreleased_work_orders(request):
-    # Raw SQL to query unreleased work orders
-    with connection.cursor() as cursor:
-        cursor.execute("""
-            WITH weekly_complete AS (
-            SELECT
-                EXTRACT(YEAR FROM wo_created_date)::INT AS year,
-                EXTRACT(MONTH FROM wo_created_date)::INT AS month,
-                FLOOR((EXTRACT(DAY FROM wo_created_date) - 1) / 7) + 1 AS week_of_month,
-                COUNT(*) AS unreleased_count
-            FROM main_data
-            WHERE wo_status = 'Unreleased'
-            GROUP BY year, month, week_of_month
-            )
-
-            SELECT
-            year,
-            month,
-            week_of_month,
-            unreleased_count,
-            LAG(unreleased_count) OVER (
-                PARTITION BY year, month
-                ORDER BY week_of_month
-            ) AS last_week_count,
-            unreleased_count - COALESCE(
-                LAG(unreleased_count) OVER (
-                PARTITION BY year, month
-                ORDER BY week_of_month
-                ), 0
-            ) AS diff_from_last_week_unreleased
-            FROM weekly_complete
-            ORDER BY year DESC, month DESC, week_of_month DESC
-        """)
-        rows = cursor.fetchall()
+    unreleased = []
+    for week in weekly_status_counts(["Unreleased"]):
+        counts = week["statuses"]["Unreleased"]
+        unreleased.append({
+            "year": week["year"],
+            "month": week["month"],
+            # the numeric string these endpoints have always returned
+            "week_of_month": str(week["week_of_month"]),
+            "unreleased_count": counts["count"],
+            "last_week_count": counts["last_week_count"],
+            "diff_from_last_week_unreleased": counts["diff_from_last_week"],
+        })
 
     # Return results as JSON
-    unreleased = [{"year": row[0], "month": row[1], "week_of_month": row[2], "unreleased_count": row[3], "last_week_count": row[4], "diff_from_last_week_unreleased": row[5]} for row in rows]
     return JsonResponse(unreleased, safe=False)
 
+WORK_ORDER_LIST_SELECT = """
+    SELECT
+        no,
+        title,
+        wo_created_date,
+        wo_status,
+        resource,
+        wo_description,
+        wo_type,
+        wr_requestor,
+        wo_actual_completion_date,
+        actual_duration,
+        EXTRACT(YEAR FROM wo_created_date) AS year,
+        EXTRACT(MONTH FROM wo_created_date) AS month,
+        FLOOR((EXTRACT(DAY FROM wo_created_date) - 1) / 7) + 1 AS week_of_month
+    FROM main_data
+"""
+
+WORK_ORDER_LIST_SQL = WORK_ORDER_LIST_SELECT + "ORDER BY wo_created_date DESC"
+
+# keyset used by the paginated response: newest first, `no` breaks ties
+WORK_ORDER_LIST_KEY = ["wo_created_date", "no"]
+
+WORK_ORDER_LIST_FIELDS = [
+    "no",
+    "title",
+    "wo_created_date",
+    "wo_status",
+    "resource",
+    "wo_description",
+    "wo_type",
+    "wr_requestor",
+    "wo_actual_completion_date",
+    "actual_duration",
+    "year",
+    "month",
+    "week_of_month",
+]
+
+@conditional_on("main_data")
 def work_order_list(request):
+    try:
+        columnar = response_format(request)
+    except InvalidFormat as exc:
+        return JsonResponse({"error": str(exc)}, status=400)
+    if columnar:
+        return columnar_query_response(columnar, WORK_ORDER_LIST_SQL, WORK_ORDER_LIST_FIELDS)
+    fmt = stream_format(request)
+    if fmt:
+        return streaming_query_response(WORK_ORDER_LIST_SQL, WORK_ORDER_LIST_FIELDS, fmt)
+    if wants_pagination(request):
+        return keyset_response(request, WORK_ORDER_LIST_SELECT, WORK_ORDER_LIST_KEY, WORK_ORDER_LIST_FIELDS)
+
     # Raw SQL to query work orders
     with connection.cursor() as cursor:
-        cursor.execute("""
-            SELECT
-            no,
-            title,
-            wo_created_date,
-            wo_status,
-            resource,
-            wo_description,
-            wo_type,
-            wr_requestor,
-            wo_actual_completion_date,
-            actual_duration,
-            EXTRACT(YEAR FROM wo_created_date) AS year,
-            EXTRACT(MONTH FROM wo_created_date) AS month,
-            FLOOR((EXTRACT(DAY FROM wo_created_date) - 1) / 7) + 1 AS week_of_month
-        FROM main_data
-        ORDER BY wo_created_date DESC;
-        """)
+        cursor.execute(WORK_ORDER_LIST_SQL)
         rows = cursor.fetchall()
 
     # Return results as JSON
-    work_orders = [
-        {
-            "no": row[0],
-            "title": row[1],
-            "wo_created_date": row[2],
-            "wo_status": row[3],
-            "resource": row[4],
-            "wo_description": row[5],
-            "wo_type": row[6],
-            "wr_requestor": row[7],
-            "wo_actual_completion_date": row[8],
-            "actual_duration": row[9],
-            "year": row[10],
-            "month": row[11],
-            "week_of_month": row[12]
-        }
-        for row in rows
-    ]
+    work_orders = [dict(zip(WORK_ORDER_LIST_FIELDS, row)) for row in rows]
     return JsonResponse(work_orders, safe=False)
 
+WORK_REQUEST_LIST_SELECT = """
+    SELECT
+        wr_number,
+        title,
+        wo_description,
+        resource,
+        wr_type,
+        wr_request_by_date,
+        wr_requestor,
+        EXTRACT(YEAR FROM wr_request_by_date) AS year,
+        EXTRACT(MONTH FROM wr_request_by_date) AS month,
+        FLOOR((EXTRACT(DAY FROM wr_request_by_date) - 1) / 7) + 1 AS week_of_month,
+        no
+    FROM main_data
+    WHERE wr_request_by_date is not null
+"""
+
+WORK_REQUEST_LIST_SQL = WORK_REQUEST_LIST_SELECT + "ORDER BY wr_request_by_date DESC, no DESC"
+
+# no breaks ties between the work requests of one date: it is never null and
+# unique, where wr_number is neither
+WORK_REQUEST_LIST_KEY = ["wr_request_by_date", "no"]
+
+WORK_REQUEST_LIST_FIELDS = [
+    "wr_number",
+    "title",
+    "wo_description",
+    "resource",
+    "wr_type",
+    "wo_request_by_date",
+    "wr_requestor",
+    "year",
+    "month",
+    "week_of_month",
+    "no",
+]
+
+@conditional_on("main_data")
 def work_request_list(request):
+    try:
+        columnar = response_format(request)
+    except InvalidFormat as exc:
+        return JsonResponse({"error": str(exc)}, status=400)
+    if columnar:
+        return columnar_query_response(columnar, WORK_REQUEST_LIST_SQL, WORK_REQUEST_LIST_FIELDS)
+    fmt = stream_format(request)
+    if fmt:
+        return streaming_query_response(WORK_REQUEST_LIST_SQL, WORK_REQUEST_LIST_FIELDS, fmt)
+    if wants_pagination(request):
+        return keyset_response(request, WORK_REQUEST_LIST_SELECT, WORK_REQUEST_LIST_KEY, WORK_REQUEST_LIST_FIELDS)
+
     with connection.cursor() as cursor:
-        cursor.execute("""
-           SELECT
-                wr_number,
-                title,
-                wo_description,
-                resource,
-                wr_type,
-                wr_request_by_date,
-                wr_requestor,
-                EXTRACT(YEAR FROM wr_request_by_date) AS year,
-                EXTRACT(MONTH FROM wr_request_by_date) AS month,
-                FLOOR((EXTRACT(DAY FROM wr_request_by_date) - 1) / 7) + 1 AS week_of_month
-            FROM main_data
-            WHERE wr_request_by_date is not null
-            ORDER BY wr_request_by_date DESC;
-        """)
+        cursor.execute(WORK_REQUEST_LIST_SQL)
         rows = cursor.fetchall()
 
-    work_request = [
-        {
-            "wr_number": row[0],
-            "title": row[1],
-            "wo_description": row[2],
-            "resource": row[3],
-            "wr_type": row[4],
-            "wo_request_by_date": row[5],
-            "wr_requestor": row[6],
-            "year": row[7],
-            "month": row[8],
-            "week_of_month": row[9]
-        }
-        for row in rows
-    ]
+    work_request = [dict(zip(WORK_REQUEST_LIST_FIELDS, row)) for row in rows]
     return JsonResponse(work_request, safe=False)
 
+@conditional_on("water_daily", "cng_daily", "electricity_daily", "energy_daily_fact")
 def energy (request):
+    try:
+        columnar = response_format(request)
+    except InvalidFormat as exc:
+        return JsonResponse({"error": str(exc)}, status=400)
+    if columnar:
+        return columnar_query_response(columnar, queries.ENERGY_SQL, queries.ENERGY_FIELDS)
+
     with connection.cursor() as cursor:
-        cursor.execute("""
-           SELECT 
-                a.date, 
-                a.daily_consumption*100 AS water_consumption, 
-                b.daily_consumption AS cng_consumption, 
-                c.daily_consumption AS electricity_consumption,
-                EXTRACT(YEAR FROM a.date) AS year,
-                EXTRACT(MONTH FROM a.date) AS month,
-                FLOOR((EXTRACT(DAY FROM a.date) - 1) / 7) + 1 AS week_of_month,
-                EXTRACT(DAY FROM a.date) AS day
-            FROM 
-                water_daily a
-            LEFT JOIN 
-                cng_daily b ON a.date = b.date
-            LEFT JOIN 
-                electricity_daily c ON a.date = c.date
-            ORDER BY a.date DESC;
-        """)
+        cursor.execute(queries.ENERGY_SQL)
         rows = cursor.fetchall()
 
-    water_data = [
-        {"date": row[0], "water_consumption": row[1], "cng_consumption": row[2], "electricity_consumption": row[3], "year": row[4], "month": row[5], "week_of_month": row[6]}
-        for row in rows
-    ]
-    return JsonResponse(water_data, safe=False)
+    return JsonResponse(queries.energy_result(rows), safe=False)
 
+@conditional_on("water_daily", "cng_daily", "electricity_daily", "energy_daily_fact")
 def energyTrend(request):
     with connection.cursor() as cursor:
-        cursor.execute("""
-            SELECT  
-                TO_CHAR(a.date, 'FMMonth') AS month_name,
-                round(avg(a.daily_consumption*100)) AS water_monthly, 
-                round(avg(b.daily_consumption)) AS cng_monthly, 
-                round(avg(c.daily_consumption)) AS electricity_monthly,
-				EXTRACT(MONTH from a.date) as month_number
-            FROM 
-                water_daily a
-            LEFT JOIN 
-                cng_daily b ON a.date = b.date
-            LEFT JOIN 
-                electricity_daily c ON a.date = c.date
-			group by month_name, month_number
-            ORDER BY month_number 
-        """)
+        cursor.execute(queries.ENERGY_TREND_SQL)
         rows = cursor.fetchall()
 
-    energy_trend_data = [
-        {"month_name": row[0], "water_monthly": row[1], "cng_monthly": row[2], "electricity_monthly": row[3], "month_number": row[4]}
-        for row in rows
-    ]
-    return JsonResponse(energy_trend_data, safe=False)
+    return JsonResponse(queries.energy_trend_result(rows), safe=False)
 
-def analytic(request):
+@conditional_on("water_daily", "cng_daily", "electricity_daily", "energy_rollup")
+def energy_rollup(request):
+    try:
+        filters = parse_energy_rollup(request)
+    except InvalidFilter as exc:
+        return JsonResponse({"error": str(exc)}, status=400)
+
+    sql, params = queries.energy_rollup_query(filters)
     with connection.cursor() as cursor:
-        cursor.execute("""
-            WITH 
-            mttr_data AS (
-                SELECT 
-                    DATE(wo_scheduled_start_date) AS date,
-                    ROUND(AVG(EXTRACT(EPOCH FROM (wo_scheduled_completion_date - wo_scheduled_start_date)) / 3600), 2) AS mttr_hours
-                FROM main_data
-                WHERE wo_scheduled_start_date IS NOT NULL 
-                  AND wo_scheduled_completion_date IS NOT NULL
-                GROUP BY DATE(wo_scheduled_start_date)
-            ),
-            
-            failure_dates AS (
-                SELECT 
-                    MIN(actual_failure_date) AS failure_time
-                FROM main_data
-                WHERE actual_failure_date IS NOT NULL
-                GROUP BY DATE(actual_failure_date), no_asset_of_wo
-            ),
-            
-            failure_with_diff AS (
-                SELECT 
-                    failure_time,
-                    failure_time - LAG(failure_time) OVER (ORDER BY failure_time) AS diff
-                FROM failure_dates
-            ),
-            
-            mtbf_data AS (
-                SELECT 
-                    DATE(failure_time) AS date,
-                    ROUND(AVG(EXTRACT(EPOCH FROM diff) / 3600), 2) AS mtbf_hours,
-                    COUNT(*) AS failure_count
-                FROM failure_with_diff
-                WHERE diff IS NOT NULL
-                GROUP BY DATE(failure_time)
-            )
-            
-            SELECT 
-                COALESCE(mttr_data.date, mtbf_data.date) AS date,
-                mttr_data.mttr_hours,
-                mtbf_data.mtbf_hours,
-                mtbf_data.failure_count
-            FROM mttr_data
-            FULL OUTER JOIN mtbf_data ON mttr_data.date = mtbf_data.date
-            ORDER BY date;
-        """)
+        cursor.execute(sql, params)
         rows = cursor.fetchall()
 
-    result = [
-        {
-            "date": str(row[0]),
-            "mttr_hours": row[1],
-            "mtbf_hours": row[2],
-            "failure_count": row[3]
-        }
-        for row in rows
-    ]
+    return JsonResponse(queries.energy_rollup_result(rows), safe=False)
 
-    return JsonResponse(result, safe=False)
+@conditional_on("main_data")
+@cached_result("analytic")
+def analytic(request):
+    try:
+        filters = parse_filters(request)
+        columnar = response_format(request)
+    except (InvalidFilter, InvalidFormat) as exc:
+        return JsonResponse({"error": str(exc)}, status=400)
+
+    if reliability.engine_enabled():
+        frame = reliability.request_frame(request)
+        result = reliability.analytic_result(frame, filters)
+        if columnar:
+            return columnar_response(columnar, queries.ANALYTIC_FIELDS, columns_from_dicts(queries.ANALYTIC_FIELDS, result))
+        return JsonResponse(result, safe=False)
+
+    sql, params = queries.analytic_query(filters)
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        rows = cursor.fetchall()
 
+    if columnar:
+        return columnar_response(columnar, queries.ANALYTIC_FIELDS, queries.analytic_columns(rows))
+    return JsonResponse(queries.analytic_result(rows), safe=False)
+
+@conditional_on("main_data")
+@cached_result("category_analytics")
 def category_analytics(request):
-    with connection.cursor() as cursor:
-        cursor.execute("""
-            WITH valid_mttr AS (
-                SELECT
-                    resource,
-                    ROUND(AVG(EXTRACT(EPOCH FROM (wo_actual_completion_date - wo_actual_start_date)) / 3600), 1) AS avg_mttr_hours
-                FROM main_data
-                WHERE wo_actual_start_date IS NOT NULL
-                  AND wo_actual_completion_date IS NOT NULL
-                  AND wo_actual_completion_date >= wo_actual_start_date
-                  AND resource IN ('MTC', 'CAL', 'UTY')
-                GROUP BY resource
-            ),
-
-            valid_mtbf_raw AS (
-                SELECT
-                    resource,
-                    actual_failure_date,
-                    LAG(actual_failure_date) OVER (PARTITION BY resource ORDER BY actual_failure_date) AS prev_failure_date
-                FROM main_data
-                WHERE actual_failure_date IS NOT NULL
-                  AND resource IN ('MTC', 'CAL', 'UTY')
-            ),
-
-            valid_mtbf AS (
-                SELECT
-                    resource,
-                    ROUND(AVG(EXTRACT(EPOCH FROM (actual_failure_date - prev_failure_date)) / 3600), 1) AS avg_mtbf_hours
-                FROM valid_mtbf_raw
-                WHERE prev_failure_date IS NOT NULL
-                GROUP BY resource
-            ),
-
-            work_orders AS (
-                SELECT
-                    resource,
-                    COUNT(*) AS work_order_count
-                FROM main_data
-                WHERE resource IN ('MTC', 'CAL', 'UTY')
-                GROUP BY resource
-            )
+    try:
+        filters = parse_filters(request)
+    except InvalidFilter as exc:
+        return JsonResponse({"error": str(exc)}, status=400)
 
-            SELECT 
-                wo.resource,
-                wo.work_order_count,
-                COALESCE(mt.avg_mttr_hours, 0),
-                COALESCE(mb.avg_mtbf_hours, 0)
-            FROM work_orders wo
-            LEFT JOIN valid_mttr mt ON wo.resource = mt.resource
-            LEFT JOIN valid_mtbf mb ON wo.resource = mb.resource;
-        """)
+    if reliability.engine_enabled():
+        frame = reliability.request_frame(request)
+        return JsonResponse(reliability.category_analytics_result(frame, filters), safe=False)
 
+    sql, params = queries.category_analytics_query(filters)
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
         rows = cursor.fetchall()
 
-    result = [
-        {
-            "category": row[0],
-            "count": row[1],
-            "avgMttr": row[2],
-            "avgMtbf": row[3],
-        }
-        for row in rows
-    ]
-
-    return JsonResponse(result, safe=False)
+    return JsonResponse(queries.category_analytics_result(rows), safe=False)
 
+@conditional_on("main_data")
+@cached_result("equipment_analytics")
 def equipment_analytics(request):
-    with connection.cursor() as cursor:
-        cursor.execute("""
-                        WITH valid_mttr AS (
-            SELECT
-                asset_group,
-                ROUND(AVG(EXTRACT(EPOCH FROM (wo_actual_completion_date - wo_actual_start_date)) / 3600), 1) AS mttr
-            FROM main_data
-            WHERE wo_actual_start_date IS NOT NULL AND wo_actual_completion_date IS NOT NULL
-            GROUP BY asset_group
-            ),
-            valid_mtbf_raw AS (
-            SELECT
-                asset_group,
-                actual_failure_date,
-                LAG(actual_failure_date) OVER (PARTITION BY asset_group ORDER BY actual_failure_date) AS prev_failure
-            FROM main_data
-            WHERE actual_failure_date IS NOT NULL
-            ),
-            valid_mtbf AS (
-            SELECT
-                asset_group,
-                ROUND(AVG(EXTRACT(EPOCH FROM (actual_failure_date - prev_failure)) / 3600), 1) AS mtbf
-            FROM valid_mtbf_raw
-            WHERE prev_failure IS NOT NULL
-            GROUP BY asset_group
-            ),
-            failures AS (
-            SELECT asset_group, COUNT(*) AS failure_count
-            FROM main_data
-            WHERE actual_failure_date IS NOT NULL
-            GROUP BY asset_group
-            )
+    try:
+        filters = parse_filters(request)
+    except InvalidFilter as exc:
+        return JsonResponse({"error": str(exc)}, status=400)
 
-            SELECT 
-            f.asset_group,
-            COALESCE(m.mttr, 0) AS mttr,
-            COALESCE(b.mtbf, 0) AS mtbf,
-            f.failure_count
-            FROM failures f
-            LEFT JOIN valid_mttr m ON f.asset_group = m.asset_group
-            LEFT JOIN valid_mtbf b ON f.asset_group = b.asset_group
-            WHERE f.asset_group IS NOT NULL
-            ORDER BY f.failure_count DESC
-            LIMIT 10;
-
-        """)
-        rows = cursor.fetchall()
+    if reliability.engine_enabled():
+        frame = reliability.request_frame(request)
+        return JsonResponse(reliability.equipment_analytics_result(frame, filters), safe=False)
 
-    result = [
-        {
-            "equipment": row[0],       # asset_group
-            "mttr": row[1],            # avg_mttr
-            "mtbf": row[2],            # avg_mtbf
-            "failures": row[3],        # count
-        }
-        for row in rows
-    ]
+    sql, params = queries.equipment_analytics_query(filters)
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        rows = cursor.fetchall()
 
-    return JsonResponse(result, safe=False)
+    return JsonResponse(queries.equipment_analytics_result(rows), safe=False)
 
+@conditional_on("main_data")
+@cached_result("monthly_trend")
 def monthly_trend(request):
-    with connection.cursor() as cursor:
-        cursor.execute("""
-        WITH monthly_mttr AS (
-        SELECT 
-            TO_CHAR(wo_actual_start_date, 'YYYY-MM') AS month,
-            ROUND(AVG(EXTRACT(EPOCH FROM (wo_actual_completion_date - wo_actual_start_date)) / 3600), 1) AS avg_mttr,
-            COUNT(*) AS work_orders
-        FROM main_data
-        WHERE wo_actual_start_date IS NOT NULL AND wo_actual_completion_date IS NOT NULL
-        GROUP BY TO_CHAR(wo_actual_start_date, 'YYYY-MM')
-        ),
-
-        mtbf_raw AS (
-        SELECT 
-            actual_failure_date,
-            TO_CHAR(actual_failure_date, 'YYYY-MM') AS month,
-            LAG(actual_failure_date) OVER (ORDER BY actual_failure_date) AS prev_date
-        FROM main_data
-        WHERE actual_failure_date IS NOT NULL
-        ),
-
-        monthly_mtbf AS (
-        SELECT 
-            month,
-            ROUND(AVG(EXTRACT(EPOCH FROM (actual_failure_date - prev_date)) / 3600), 1) AS avg_mtbf
-        FROM mtbf_raw
-        WHERE prev_date IS NOT NULL
-        GROUP BY month
-        )
+    try:
+        filters = parse_filters(request)
+    except InvalidFilter as exc:
+        return JsonResponse({"error": str(exc)}, status=400)
 
-        SELECT 
-        mttr.month,
-        mttr.avg_mttr,
-        mtbf.avg_mtbf,
-        mttr.work_orders
-        FROM monthly_mttr mttr
-        LEFT JOIN monthly_mtbf mtbf ON mttr.month = mtbf.month
-        ORDER BY mttr.month;
+    if reliability.engine_enabled():
+        frame = reliability.request_frame(request)
+        return JsonResponse(reliability.monthly_trend_result(frame, filters), safe=False)
 
-        """)
+    sql, params = queries.monthly_trend_query(filters)
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
         rows = cursor.fetchall()
 
-    result = [
-        {
-            "month": row[0],  # Format 'YYYY-MM'
-            "mttr": row[1],
-            "mtbf": row[2],
-            "workOrders": row[3],
-        }
-        for row in rows
-    ]
-    return JsonResponse(result, safe=False)
+    return JsonResponse(queries.monthly_trend_result(rows), safe=False)
 
+@conditional_on("main_data")
+@cached_result("weekly_downtime")
 def weekly_downtime(request):
+    try:
+        filters = parse_filters(request)
+    except InvalidFilter as exc:
+        return JsonResponse({"error": str(exc)}, status=400)
+
+    if reliability.engine_enabled():
+        frame = reliability.request_frame(request)
+        return JsonResponse(reliability.weekly_downtime_result(frame, filters), safe=False)
+
+    sql, params = queries.weekly_downtime_query(filters)
     with connection.cursor() as cursor:
-        cursor.execute("""
-            SELECT
-              DATE_TRUNC('week', wo_actual_start_date) AS week,
-
-              ROUND(SUM(CASE 
-                WHEN wo_type IN (
-                  'Preventive Maintenance', 
-                  'Predictive Maintenance', 
-                  'Planned Maintenance', 
-                  'Calibration'
-                ) THEN actual_duration / 3600.0
-                ELSE 0
-              END)::numeric, 2) AS planned_hours,
-
-              ROUND(SUM(CASE 
-                WHEN wo_type IS NULL 
-                     OR wo_type NOT IN (
-                       'Preventive Maintenance', 
-                       'Predictive Maintenance', 
-                       'Planned Maintenance', 
-                       'Calibration'
-                     ) THEN actual_duration / 3600.0
-                ELSE 0
-              END)::numeric, 2) AS unplanned_hours,
-
-              ROUND(SUM(actual_duration / 3600.0)::numeric, 2) AS total_hours
-
-            FROM main_data
-            WHERE 
-              wo_actual_start_date IS NOT NULL
-              AND actual_duration IS NOT NULL
-              AND actual_duration BETWEEN 1 AND 10000000
-
-            GROUP BY DATE_TRUNC('week', wo_actual_start_date)
-            ORDER BY week;
-        """)
+        cursor.execute(sql, params)
         rows = cursor.fetchall()
 
-    result = [
-        {
-            "week": row[0].strftime("%Y-%m-%d"),
-            "planned": float(row[1]),
-            "unplanned": float(row[2]),
-            "total": float(row[3]),
-        }
-        for row in rows
-    ]
-
-    return JsonResponse(result, safe=False)
+    return JsonResponse(queries.weekly_downtime_result(rows), safe=False)
 
+@conditional_on("water_daily", "cng_daily", "electricity_daily", "energy_daily_fact")
 def energydaily(request):
     with connection.cursor() as cursor:
-        cursor.execute("""
-             SELECT *
-FROM (
-    SELECT 
-        a.date,
-        CASE 
-            WHEN TO_CHAR(a.date, 'DY') IN ('Mon', 'MON') THEN 'Sen'
-            WHEN TO_CHAR(a.date, 'DY') IN ('Tue', 'TUE') THEN 'Sel'
-            WHEN TO_CHAR(a.date, 'DY') IN ('Wed', 'WED') THEN 'Rab'
-            WHEN TO_CHAR(a.date, 'DY') IN ('Thu', 'THU') THEN 'Kam'
-            WHEN TO_CHAR(a.date, 'DY') IN ('Fri', 'FRI') THEN 'Jum'
-            WHEN TO_CHAR(a.date, 'DY') IN ('Sat', 'SAT') THEN 'Sab'
-            WHEN TO_CHAR(a.date, 'DY') IN ('Sun', 'SUN') THEN 'Min'
-            ELSE TO_CHAR(a.date, 'DY')
-        END AS name,
-        c.daily_consumption AS listrik,
-        a.daily_consumption * 100 AS air,
-        b.daily_consumption AS cng
-    FROM 
-        water_daily a
-    LEFT JOIN 
-        cng_daily b ON a.date = b.date
-    LEFT JOIN 
-        electricity_daily c ON a.date = c.date
-    ORDER BY a.date DESC
-    LIMIT 7
-) AS recent_data
-ORDER BY date ASC;
-
-        """)
+        cursor.execute(queries.ENERGY_DAILY_SQL)
         rows = cursor.fetchall()
 
-    result = [
-            {"name": row[1], "listrik": float(row[2]), "air": float(row[3]), "cng": float(row[4])}
-            for row in rows
-    ]
-
-    return JsonResponse(result, safe=False)
+    return JsonResponse(queries.energy_daily_result(rows), safe=False)
 
 from rest_framework.views import APIView
 from rest_framework.response import Response
@@ -698,24 +597,88 @@ from rest_framework.parsers import MultiPartParser, FormParser
 from .models import EnergyInput
 from .serializers import EnergyInputSerializer
 
+from .energy_photos import CappedUploadHandler
+
 class EnergyInputCreateView(APIView):
     permission_classes = [permissions.IsAuthenticated]
     parser_classes = [MultiPartParser, FormParser]
 
     def post(self, request):
-        serializer = EnergyInputSerializer(data=request.data, context={'request': request})
+        # the photo is streamed to disk and refused past ENERGY_PHOTOS['MAX_UPLOAD_BYTES']
+        upload = CappedUploadHandler(request)
+        request.upload_handlers = [upload]
+        data = request.data
+        if upload.too_large:
+            limit = upload.max_bytes / (1024 * 1024)
+            return Response(
+                {name: [f"File is larger than {limit:.3g} MB."] for name in upload.too_large},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        serializer = EnergyInputSerializer(data=data, context={'request': request})
         if serializer.is_valid():
             serializer.save()
             return Response(serializer.data, status=status.HTTP_201_CREATED)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
+from django.db import transaction
+from rest_framework.parsers import JSONParser
+from .energy_aggregation import schedule_aggregation
+from .energy_bulk import BULK_LOCK_ID, InvalidBatch, error_report, read_rows, validate_readings
+
+class EnergyInputBulkCreateView(APIView):
+    # A shift's readings or a spreadsheet backfill in one request: a JSON array
+    # or a CSV upload (`file`). Valid rows are stored, the others come back in
+    # the per-row error report.
+    permission_classes = [permissions.IsAuthenticated]
+    parser_classes = [JSONParser, MultiPartParser, FormParser]
+
+    def post(self, request):
+        try:
+            rows = read_rows(request)
+        except InvalidBatch as exc:
+            return Response({"error": str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+
+        with transaction.atomic():
+            with connection.cursor() as cursor:
+                cursor.execute("SELECT pg_advisory_xact_lock(%s)", [BULK_LOCK_ID])
+            valid, errors = validate_readings(rows)
+            created = EnergyInput.objects.bulk_create(
+                [EnergyInput(user=request.user, **reading) for _, reading in valid],
+                batch_size=1000,
+            )
+            if created:
+                # bulk_create sends no post_save
+                schedule_aggregation()
+
+        return Response(
+            {"created": len(created), "rejected": len(errors), "errors": error_report(rows, errors)},
+            status=status.HTTP_201_CREATED if created else status.HTTP_400_BAD_REQUEST,
+        )
+
+from .filters import filter_energy_inputs, parse_energy_input_filters
+from .pagination import InvalidPageRequest, keyset_queryset_page
+
+ENERGY_INPUT_KEY = ("created_at", "id")
+
+
+def energy_input_list_response(request, queryset):
+    # ?type=&meter_number=&user=&from=&to= filters, then a keyset page newest
+    # first (or the whole array with ?paginate=false)
+    try:
+        queryset = filter_energy_inputs(queryset, parse_energy_input_filters(request))
+        if wants_pagination(request):
+            return Response(keyset_queryset_page(request, queryset, ENERGY_INPUT_KEY, EnergyInputSerializer))
+    except (InvalidFilter, InvalidPageRequest) as exc:
+        return Response({"error": str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+    queryset = queryset.order_by(*("-" + field for field in ENERGY_INPUT_KEY))
+    return Response(EnergyInputSerializer(queryset, many=True).data)
+
+
 class UserEnergyInputListView(APIView):
     permission_classes = [permissions.IsAuthenticated]
 
     def get(self, request):
-        inputs = EnergyInput.objects.filter(user=request.user).order_by('-created_at')
-        serializer = EnergyInputSerializer(inputs, many=True)
-        return Response(serializer.data)
+        return energy_input_list_response(request, EnergyInput.objects.filter(user=request.user))
 
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.decorators import api_view, permission_classes
@@ -726,7 +689,12 @@ from .serializers import EnergyInputSerializer
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 def latest_energy_inputs(request):
-    latest_inputs = EnergyInput.objects.filter(user=request.user).order_by('-created_at')[:5]
+    try:
+        filters = parse_energy_input_filters(request)
+    except InvalidFilter as exc:
+        return Response({"error": str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+    latest_inputs = filter_energy_inputs(EnergyInput.objects.filter(user=request.user), filters)
+    latest_inputs = latest_inputs.order_by('-created_at', '-id')[:5]
     serializer = EnergyInputSerializer(latest_inputs, many=True)
     return Response(serializer.data)
 
@@ -830,14 +798,7 @@ class EnergyInputListView(APIView):
     permission_classes = [IsAuthenticated]
 
     def get(self, request):
-        status_param = request.query_params.get("status")
-        if status_param:
-            queryset = EnergyInput.objects.filter(status=status_param)
-        else:
-            queryset = EnergyInput.objects.all()
-
-        serializer = EnergyInputSerializer(queryset, many=True)
-        return Response(serializer.data)
+        return energy_input_list_response(request, EnergyInput.objects.all())
 
 class AuditTrailView(APIView):
     permission_classes = [IsAuthenticated, IsAdminUserProfile]
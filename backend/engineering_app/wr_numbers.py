@@ -0,0 +1,65 @@
+import threading
+from collections import deque
+
+from django.conf import settings
+from django.db import connection
+
+# Work request numbers come from a postgres sequence (created by migration
+# 0021), formatted as WR-00000042: unique without a retry, and zero-padded so
+# that they sort in the order they were handed out. The older random
+# WR-1A2B3C numbers are shorter and can never be produced again.
+#
+# With BLOCK_SIZE > 1 each process takes that many numbers per round trip and
+# hands them out from memory. Numbers stay unique, but a process that exits
+# leaves the rest of its block unused, and numbers from different processes
+# interleave.
+
+SEQUENCE = "work_request_number_seq"
+
+DEFAULTS = {
+    "PREFIX": "WR-",
+    "WIDTH": 8,
+    "BLOCK_SIZE": 1,
+}
+
+NEXT_VALUES_SQL = f"SELECT nextval('{SEQUENCE}') FROM generate_series(1, %s)"
+
+
+def number_setting(name):
+    return getattr(settings, "WR_NUMBERS", {}).get(name, DEFAULTS[name])
+
+
+def format_wr_number(value):
+    return f"{number_setting('PREFIX')}{value:0{number_setting('WIDTH')}d}"
+
+
+def reserve_wr_numbers(count):
+    """`count` new work request numbers, ascending, in one round trip."""
+    if count < 1:
+        return []
+    with connection.cursor() as cursor:
+        cursor.execute(NEXT_VALUES_SQL, [count])
+        values = sorted(row[0] for row in cursor.fetchall())
+    return [format_wr_number(value) for value in values]
+
+
+class _Block:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.numbers = deque()
+
+    def take(self):
+        with self.lock:
+            if not self.numbers:
+                self.numbers.extend(reserve_wr_numbers(number_setting("BLOCK_SIZE")))
+            return self.numbers.popleft()
+
+
+_block = _Block()
+
+
+def allocate_wr_number():
+    """The next work request number, from this process's block when enabled."""
+    if number_setting("BLOCK_SIZE") <= 1:
+        return reserve_wr_numbers(1)[0]
+    return _block.take()
@@ -272,7 +272,7 @@ useEffect(() => {
     let token = localStorage.getItem("accessToken");
 
     const fetchWithToken = async (tokenToUse: string) => {
-      const res = await fetch("http://localhost:8000/api/energy-input/my/", {
+      const res = await fetch("http://localhost:8000/api/energy-input/my/?page_size=5", {
         headers: {
           Authorization: `Bearer ${tokenToUse}`,
         },
@@ -293,7 +293,7 @@ useEffect(() => {
 
     if (res.ok) {
       const data = await res.json();
-      setLatestEntries(data.slice(0, 5)); // Ambil 5 entri terakhir
+      setLatestEntries(data.results); // 5 entri terakhir
     } else {
       console.error("Gagal fetch data energi terbaru");
     }
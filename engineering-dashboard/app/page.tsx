@@ -3,6 +3,7 @@
 import { act, use, useEffect, useState } from "react";
 import { useRouter } from "next/navigation";
 import supabase from "@/lib/supabase";
+import { fetchAllPages } from "@/lib/pagination";
 import { SidebarTrigger } from "@/components/ui/sidebar";
 import { Card, CardContent, CardDescription, CardHeader, CardTitle } from "@/components/ui/card";
 import { Badge } from "@/components/ui/badge";
@@ -153,8 +154,7 @@ export default function Dashboard() {
 
     // Fetch Work Orders data
     useEffect(() => {
-        fetch("http://localhost:8000/api/work-order-list/")
-          .then((response) => response.json())
+        fetchAllPages<any>("http://localhost:8000/api/work-order-list/")
           .then((data) => {
             setWorkOrders(data);
             setIsLoading(false);
@@ -23,6 +23,7 @@ import {
 } from "lucide-react";
 import { DropdownMenu, DropdownMenuContent, DropdownMenuItem, DropdownMenuTrigger } from "@/components/ui/dropdown-menu";
 import React, { useEffect, useState, ChangeEvent } from "react";
+import { fetchAllPages } from "@/lib/pagination";
 
 interface Asset {
   id: string;
@@ -219,9 +220,8 @@ const WorkRequestPage = () => {
 
   // Fetching data from API
   const fetchWorkRequests = () => {
-    fetch("http://localhost:8000/api/work-request/")
-      .then((response) => response.json())
-      .then((data: WorkRequest[]) => {
+    fetchAllPages<WorkRequest>("http://localhost:8000/api/work-request/")
+      .then((data) => {
         setWorkRequests(data);
         setIsLoading(false);
         if (data.length > 0) {
@@ -11,6 +11,7 @@ import { Tabs, TabsList, TabsTrigger, TabsContent } from "@/components/ui/tabs";
 import { Input } from "@/components/ui/input";
 import { Select, SelectTrigger, SelectValue, SelectContent, SelectItem } from "@/components/ui/select";
 import { Alert, AlertDescription } from "@/components/ui/alert";
+import { fetchAllPages } from "@/lib/pagination";
 
 const WorkOrdersPage = () => {
   const [isLoading, setIsLoading] = useState(true);
@@ -124,13 +125,7 @@ const WorkOrdersPage = () => {
   const fetchWorkRequests = async () => {
     try {
       setIsLoadingRequests(true);
-      const response = await fetch("http://localhost:8000/api/work-request/");
-      
-      if (!response.ok) {
-        throw new Error(`HTTP error! status: ${response.status}`);
-      }
-      
-      const data = await response.json();
+      const data = await fetchAllPages<any>("http://localhost:8000/api/work-request/");
       setWorkRequests(data);
     } catch (error) {
       console.error("Error fetching work requests:", error);
@@ -143,8 +138,7 @@ const WorkOrdersPage = () => {
 
   // Fetching data from API
   useEffect(() => {
-    fetch("http://localhost:8000/api/work-order-list/")
-      .then((response) => response.json())
+    fetchAllPages<any>("http://localhost:8000/api/work-order-list/")
       .then((data) => {
         setWorkOrders(data);
         setIsLoading(false);
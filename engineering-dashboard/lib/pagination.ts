@@ -0,0 +1,22 @@
+// The work order and work request lists are keyset paginated: each page has
+// the URL of the next one in `next`, null on the last page.
+interface Page<T> {
+  next: string | null;
+  results: T[];
+}
+
+// Every row of a paginated list endpoint, fetched page by page in its order.
+export async function fetchAllPages<T>(url: string, pageSize = 500): Promise<T[]> {
+  const rows: T[] = [];
+  let next: string | null = `${url}${url.includes("?") ? "&" : "?"}page_size=${pageSize}`;
+  while (next) {
+    const response = await fetch(next);
+    if (!response.ok) {
+      throw new Error(`HTTP error! status: ${response.status}`);
+    }
+    const page: Page<T> = await response.json();
+    rows.push(...page.results);
+    next = page.next;
+  }
+  return rows;
+}